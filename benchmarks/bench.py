@@ -0,0 +1,263 @@
+"""
+Microbenchmarks of the hot paths of the service and the Streamlit application.
+
+Every case runs at several input sizes and reports ops/sec, p50/p99 latency
+and the peak memory traced by tracemalloc during one call. Results are compared
+with benchmarks/baselines.json: a case whose p50 latency or peak memory grew by
+more than --threshold (default 20%), and by more than --min-delta-ms or
+--min-delta-mb, is a regression and the script exits with status 1, so a slower
+scoring path fails the benchmark run instead of reaching production. Without a
+baselines file, or with baselines recorded on another machine (unless
+--ignore-machine), the script fails at once, unless run with --save-baseline.
+
+Baselines are machine specific: record them on the reference machine with
+--save-baseline and commit benchmarks/baselines.json.
+
+Usage (from the repository root, after python -m training.train):
+    python benchmarks/bench.py
+    python benchmarks/bench.py --cases preprocess_data predict_data --sizes 1 50 1000
+    python benchmarks/bench.py --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'fastapi'))
+sys.path.append(os.path.join(ROOT, 'streamlit'))  # after fastapi/, both have a main.py
+# Keep benchmark results out of the service's result store
+os.environ.setdefault('RESULTS_DB', os.path.join(tempfile.mkdtemp(prefix='bench-'), 'results.db'))
+# Always serve the base pickles: no registry poll thread, no ACTIVE file written to fastapi/pickle/versions/,
+# and no bundle picked up just because it was exported
+os.environ['MODEL_VERSIONS_DIR'] = tempfile.mkdtemp(prefix='bench-versions-')
+os.environ['MODEL_POLL_SECONDS'] = '0'
+os.environ['ARTIFACT_FORMAT'] = 'pickle'
+
+import bundle  # noqa: E402
+import drift  # noqa: E402
+import main  # noqa: E402
+import mapping  # noqa: E402
+import scoring  # noqa: E402
+from fixtures import make_employees, make_excel_frame, make_results  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+SIZES = [1, 50, 1_000, 100_000]
+
+loop = asyncio.new_event_loop()
+
+
+def run(coroutine):
+    """Await an endpoint function on the benchmark's event loop"""
+    return loop.run_until_complete(coroutine)
+
+
+# Cases: setup(size) -> function to time (size is None for cases without an input size)
+def setup_preprocess_data(size):
+    employees = [main.EmployeeData(**record) for record in make_employees(size).to_dict('records')]
+    # model_construct skips the 50 employees limit of a request
+    data = main.MassInputData.model_construct(employees=employees)
+    return lambda: run(main.preprocess_data(data))
+
+
+def setup_predict_data(size):
+    employees = [main.EmployeeData(**record) for record in make_employees(size).to_dict('records')]
+    data = run(main.preprocess_data(main.MassInputData.model_construct(employees=employees)))
+    # Same result set and offset on every call, so the store doesn't grow
+    result_id = main.result_store.create_result_set()
+    return lambda: run(main.predict_data(data, result_id=result_id))
+
+
+def setup_generate_excel_template(size):
+    return main.generate_excel_template
+
+
+def setup_mass_mapping(size):
+    stream = BytesIO()
+    make_excel_frame(make_employees(size)).to_excel(stream, index=False, sheet_name='Mass Input')
+    content = stream.getvalue()
+    return lambda: mapping.mass_mapping(BytesIO(content))
+
+
+def setup_build_results_frame(size):
+    results = make_results(make_employees(size))
+    return lambda: mapping.build_results_frame(results)
+
+
+def setup_drift_update(size):
+    # Update cost of the drift monitor on /predict, with ten quantile bins per feature
+    artifacts = scoring.load_artifacts(artifact_format='pickle')
+    features = scoring.preprocess_frame(make_employees(size), artifacts)
+    probabilities = scoring.predict_frame(features, artifacts)[1]
+
+    def distribution(values):
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, 11)[1:-1]))
+        return {'edges': edges.tolist(), 'counts': [1] * (len(edges) + 1)}
+
+    reference = {
+        'rows': size,
+        'features': {column: distribution(features[column].to_numpy()) for column in features.columns},
+        'probability': distribution(probabilities),
+    }
+    monitor = drift.DriftMonitor(reference)
+    values = features.to_numpy(dtype=float)
+    return lambda: monitor.update(values, probabilities)
+
+
+def setup_load_bundle(size):
+    # The pickle-free bundle, exported from a copy of the pickles so fastapi/pickle/ is left as it is
+    pickle_dir = tempfile.mkdtemp(prefix='bench-bundle-')
+    for name in os.listdir(scoring.PICKLE_DIR):
+        if name.endswith('.pkl'):
+            shutil.copy2(os.path.join(scoring.PICKLE_DIR, name), pickle_dir)
+    bundle.export_bundle(pickle_dir, n_parity_rows=500)
+    return lambda: scoring.load_artifacts(pickle_dir, artifact_format='bundle')
+
+
+def setup_load_pickles(size):
+    return lambda: scoring.load_artifacts(artifact_format='pickle')
+
+
+CASES = {
+    'preprocess_data': (setup_preprocess_data, SIZES),
+    'predict_data': (setup_predict_data, SIZES),
+    'generate_excel_template': (setup_generate_excel_template, [None]),
+    'mass_mapping': (setup_mass_mapping, SIZES),
+    'build_results_frame': (setup_build_results_frame, SIZES),
+    'drift_update': (setup_drift_update, SIZES),
+    'load_bundle': (setup_load_bundle, [None]),
+    'load_pickles': (setup_load_pickles, [None]),
+}
+
+
+def measure(func, min_time=1.0, min_repeat=5, max_repeat=10_000):
+    """
+    Time a function until min_time has passed (at least min_repeat calls).
+
+    Returns
+    -------
+    dict
+        ops_per_sec, p50_ms, p99_ms, peak_mb and the number of calls
+    """
+    func()  # warm up caches and lazy imports
+    times = []
+    start = time.perf_counter()
+    while len(times) < max_repeat and (len(times) < min_repeat or time.perf_counter() - start < min_time):
+        call_start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - call_start)
+    # Memory is measured on a separate call, tracemalloc slows allocations down
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    times = np.array(times)
+    return {
+        'ops_per_sec': float(len(times) / times.sum()),
+        'p50_ms': float(np.percentile(times, 50) * 1000),
+        'p99_ms': float(np.percentile(times, 99) * 1000),
+        'peak_mb': peak / 2**20,
+        'calls': len(times),
+    }
+
+
+def benchmark_name(case, size):
+    return case if size is None else f'{case}[{size}]'
+
+
+def compare(results, baselines, threshold, min_delta):
+    """
+    Compare results with baselines.
+
+    A metric regresses when it grew by more than threshold and by more than its min_delta
+    ({metric: absolute slack}), so the noise of millisecond cases doesn't fail the run.
+
+    Returns
+    -------
+    dict
+        {benchmark name: list of regression messages}
+    """
+    regressions = {}
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        messages = []
+        for metric in ['p50_ms', 'peak_mb']:
+            limit = max(baseline[metric] * (1 + threshold), baseline[metric] + min_delta[metric])
+            if result[metric] > limit:
+                messages.append(f'{metric} {result[metric]:.3f} > {baseline[metric]:.3f} (+{threshold:.0%})')
+        if messages:
+            regressions[name] = messages
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the hot paths of the service")
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=None, help="Input sizes (default is 1 50 1000 100000)")
+    parser.add_argument('--min-time', type=float, default=1.0, help="Seconds spent timing each benchmark")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before a benchmark fails")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="p50 growth always allowed, in ms")
+    parser.add_argument('--min-delta-mb', type=float, default=0.1, help="Peak memory growth always allowed, in MB")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Write the results as the new baselines")
+    parser.add_argument('--ignore-machine', action='store_true',
+                        help="Compare with baselines recorded on another machine")
+    args = parser.parse_args()
+    if not args.save_baseline:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"No baselines at {args.baseline}, run with --save-baseline to record them")
+        with open(args.baseline) as f:
+            machine = json.load(f).get('machine')
+        if machine != platform.platform() and not args.ignore_machine:
+            sys.exit(f"Baselines were recorded on {machine}, not {platform.platform()}: record them on this machine "
+                     f"with --save-baseline, or compare anyway with --ignore-machine")
+
+    results = {}
+    print(f"{'benchmark':<32}{'ops/sec':>12}{'p50 ms':>12}{'p99 ms':>12}{'peak MB':>10}")
+    for case in args.cases:
+        setup, sizes = CASES[case]
+        if args.sizes and sizes != [None]:
+            sizes = args.sizes
+        for size in sizes:
+            name = benchmark_name(case, size)
+            result = measure(setup(size), min_time=args.min_time)
+            results[name] = result
+            print(f"{name:<32}{result['ops_per_sec']:>12.1f}{result['p50_ms']:>12.3f}"
+                  f"{result['p99_ms']:>12.3f}{result['peak_mb']:>10.2f}")
+
+    if args.save_baseline:
+        baselines = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baselines = json.load(f)['benchmarks']
+        baselines.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'benchmarks': baselines}, f, indent=2, sort_keys=True)
+        print(f"Wrote {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baselines = json.load(f)
+    regressions = compare(results, baselines['benchmarks'], args.threshold,
+                          {'p50_ms': args.min_delta_ms, 'peak_mb': args.min_delta_mb})
+    for name, messages in regressions.items():
+        print(f"REGRESSION {name}: {'; '.join(messages)}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regression above {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,72 @@
+"""
+Counterfactual search of /counterfactual (fastapi/counterfactual.py).
+
+Scores Data/aug_test.csv with the preprocessing of the service, takes the
+employees predicted to leave, and searches the fewest edits of enrollment,
+education level and relevant experience that bring them below the target, in
+batches of 50 like the endpoint. Reports the latency per employee, the share
+of employees with a solution, and the number of edits needed.
+
+Usage (from the repository root, after python -m training.train):
+    python benchmarks/bench_counterfactual.py
+    python benchmarks/bench_counterfactual.py --employees 500 --target 0.3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'fastapi'))
+sys.path.append(ROOT)  # for training.data
+import counterfactual  # noqa: E402
+import scoring  # noqa: E402
+from training.data import normalize  # noqa: E402
+
+FIELDS = ['enrolled_university', 'education_level', 'relevant_experience']
+BATCH_SIZE = 50  # max_items of the endpoint
+
+
+def field_values(artifacts, field):
+    """Known categories of an ordinal encoded field"""
+    categories = artifacts['ordinalencoder'].categories_[scoring.oe_columns.index(field)]
+    return [value for value in categories if not pd.isna(value)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the counterfactual search")
+    parser.add_argument('--data', default=os.path.join(ROOT, 'Data', 'aug_test.csv'))
+    parser.add_argument('--employees', type=int, default=200, help="Employees predicted to leave searched")
+    parser.add_argument('--target', type=float, default=0.5)
+    parser.add_argument('--max-edits', type=int, default=3)
+    parser.add_argument('--pickle-dir', default=scoring.PICKLE_DIR)
+    args = parser.parse_args()
+
+    artifacts = scoring.load_artifacts(args.pickle_dir)
+    df = normalize(pd.read_csv(args.data))
+    _, probabilities = scoring.predict_frame(scoring.preprocess_frame(df, artifacts), artifacts)
+    df = df[probabilities >= args.target].head(args.employees).reset_index(drop=True)
+    domains = {field: field_values(artifacts, field) for field in FIELDS}
+    print(f"{len(df)} employees at or above {args.target}, domains: {domains}")
+
+    start = time.perf_counter()
+    results = []
+    for offset in range(0, len(df), BATCH_SIZE):
+        results += counterfactual.search(df.iloc[offset:offset + BATCH_SIZE], artifacts, domains,
+                                         target=args.target, max_edits=args.max_edits)
+    seconds = time.perf_counter() - start
+
+    edits_needed = np.array([result['edits_needed'] or 0 for result in results])
+    found = np.array([result['edits_needed'] is not None for result in results])
+    evaluated = np.array([result['evaluated'] for result in results])
+    print(f"{seconds / max(len(df), 1) * 1000:.2f} ms per employee, {evaluated.mean():.1f} candidates evaluated per employee")
+    print(f"solution found for {found.mean():.1%}")
+    for n in range(1, args.max_edits + 1):
+        print(f"  {n} edit(s): {int((edits_needed == n).sum())}")
+
+
+if __name__ == '__main__':
+    main()
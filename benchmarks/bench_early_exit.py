@@ -0,0 +1,71 @@
+"""
+Early exit label predictions of /predict_label (fastapi/early_exit.py) against the full model.
+
+Scores Data/aug_train.csv and Data/aug_test.csv with the preprocessing of the
+service, then predicts labels with every tree (scoring.predict_frame) and with
+early exit, checking that the labels are identical and reporting the average
+fraction of trees evaluated and the speedup at each threshold.
+
+Usage (from the repository root, after python -m training.train):
+    python benchmarks/bench_early_exit.py
+    python benchmarks/bench_early_exit.py --thresholds 0.3 0.5 --stage-trees 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'fastapi'))
+sys.path.append(ROOT)  # for training.data
+import early_exit  # noqa: E402
+import scoring  # noqa: E402
+from training.data import normalize  # noqa: E402
+
+
+def best_of(func, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark early exit label predictions")
+    parser.add_argument('--data', nargs='+', default=[os.path.join(ROOT, 'Data', 'aug_train.csv'), os.path.join(ROOT, 'Data', 'aug_test.csv')])
+    parser.add_argument('--thresholds', nargs='+', type=float, default=[0.5])
+    parser.add_argument('--stage-trees', type=int, default=early_exit.STAGE_TREES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pickle-dir', default=scoring.PICKLE_DIR)
+    args = parser.parse_args()
+
+    artifacts = scoring.load_artifacts(args.pickle_dir)
+    estimator = artifacts['model']
+    booster = getattr(estimator, 'booster', None) or estimator.booster_
+    model = early_exit.EarlyExitModel(booster, estimator.classes_, args.stage_trees)
+    print(f"trees: {model.n_trees}, stages of {args.stage_trees} trees")
+
+    failed = False
+    for path in args.data:
+        features = scoring.preprocess_frame(normalize(pd.read_csv(path)), artifacts)
+        X = features.to_numpy(dtype=float)
+        full_seconds, (_, probabilities) = best_of(lambda: scoring.predict_frame(features, artifacts), args.repeat)
+        for threshold in args.thresholds:
+            expected = estimator.classes_[(probabilities > threshold).astype(int)]
+            seconds, (labels, trees, rescored) = best_of(lambda: model.predict_labels(X, threshold), args.repeat)
+            mismatches = int((labels != expected).sum())
+            failed = failed or mismatches > 0
+            print(f"{os.path.basename(path)} ({len(X)} rows) threshold {threshold}: "
+                  f"trees evaluated {trees.mean() / model.n_trees:.1%} (+{int(rescored.sum())} rows rescored), "
+                  f"full {full_seconds * 1000:.2f} ms, early exit {seconds * 1000:.2f} ms, "
+                  f"speedup {full_seconds / seconds:.2f}x, label mismatches {mismatches}")
+    if failed:
+        sys.exit("Early exit labels differ from the full model")
+
+
+if __name__ == '__main__':
+    main()
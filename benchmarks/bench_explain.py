@@ -0,0 +1,86 @@
+"""
+Latency of the TreeSHAP explanations of /explain (fastapi/explain.py).
+
+Explains 10k synthetic employees with an empty cache (every row computed in one
+vectorized call), again with a warm cache, as a roster where most rows repeat,
+and in batches of 50 (the request size of the service), reporting ms per row
+against the budget of a few milliseconds per row at batch size 50.
+
+Usage (from the repository root):
+    python benchmarks/bench_explain.py
+    python benchmarks/bench_explain.py --rows 10000 --unique 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fastapi'))
+import explain  # noqa: E402
+import registry  # noqa: E402
+import scoring  # noqa: E402
+from fixtures import make_employees  # noqa: E402
+
+BATCH_SIZE = 50
+
+
+def fresh_cache(model):
+    model.cache['contributions'] = explain.ContributionCache()
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /explain TreeSHAP contributions")
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--unique', type=int, default=500, help="Distinct employees of the repeated roster")
+    parser.add_argument('--budget-ms', type=float, default=3.0, help="Budget per row at batch size 50")
+    parser.add_argument('--pickle-dir', default=scoring.PICKLE_DIR)
+    args = parser.parse_args()
+
+    model = registry.ModelVersion('benchmark', args.pickle_dir)
+    start = time.perf_counter()
+    explain.warm(model)
+    print(f"explainer build:       {(time.perf_counter() - start) * 1000:8.2f} ms")
+
+    features = scoring.preprocess_frame(make_employees(args.rows), model.artifacts).to_numpy()
+    roster = features[np.random.default_rng(1).integers(0, min(args.unique, args.rows), args.rows)]
+
+    fresh_cache(model)
+    cold = timed(lambda: explain.explain_features(features, model))
+    warm = timed(lambda: explain.explain_features(features, model))
+    fresh_cache(model)
+    repeated = timed(lambda: explain.explain_features(roster, model))
+
+    fresh_cache(model)
+    batch_seconds = []
+    for offset in range(0, args.rows, BATCH_SIZE):
+        batch = features[offset:offset + BATCH_SIZE]
+        batch_seconds.append(timed(lambda: explain.explain_features(batch, model)) / len(batch))
+    batch_ms = np.array(batch_seconds) * 1000
+
+    # Contributions add up to the raw score of the model
+    contributions, base_value = explain.explain_features(features[:100], model)
+    probabilities = scoring.predict_frame(pd.DataFrame(features[:100], columns=scoring.features_columns), model.artifacts)[1]
+    error = np.abs(1 / (1 + np.exp(-(contributions.sum(axis=1) + base_value))) - probabilities).max()
+
+    print(f"rows: {args.rows}")
+    print(f"cold cache:            {cold * 1000:8.2f} ms ({cold / args.rows * 1000:.4f} ms per row)")
+    print(f"warm cache:            {warm * 1000:8.2f} ms ({warm / args.rows * 1000:.4f} ms per row)")
+    print(f"roster ({args.unique} unique):    {repeated * 1000:8.2f} ms ({repeated / args.rows * 1000:.4f} ms per row)")
+    print(f"batch {BATCH_SIZE} (cold):         p50 {np.percentile(batch_ms, 50):.4f} ms per row, "
+          f"p99 {np.percentile(batch_ms, 99):.4f} ms per row (budget {args.budget_ms} ms)")
+    print(f"additivity error:      {error:.2e}")
+    if np.percentile(batch_ms, 99) > args.budget_ms:
+        sys.exit("Over budget")
+
+
+if __name__ == '__main__':
+    main()
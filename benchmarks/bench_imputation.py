@@ -0,0 +1,58 @@
+"""
+Latency of serve-time MICE imputation in scoring.preprocess_frame().
+
+Scores the same 10k synthetic employees twice, once complete and once with
+about half of the rows missing one to three fields (like the 53% incomplete
+rows of aug_train.csv), and reports the extra latency of the imputation.
+
+Usage (from the repository root, after python -m training.train):
+    python benchmarks/bench_imputation.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fastapi'))
+import scoring  # noqa: E402
+from fixtures import drop_fields, make_employees  # noqa: E402
+
+def timeit(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serve-time MICE imputation")
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--pickle-dir', default=scoring.PICKLE_DIR)
+    args = parser.parse_args()
+
+    artifacts = scoring.load_artifacts(args.pickle_dir)
+    if artifacts['imputer'] is None:
+        raise SystemExit("iterativeimputer.pkl not found, run python -m training.train first")
+    complete = make_employees(args.rows)
+    incomplete = drop_fields(complete)
+    n_missing_rows = int(incomplete.isna().any(axis=1).sum())
+
+    complete_seconds = timeit(lambda: scoring.preprocess_frame(complete, artifacts), args.repeat)
+    incomplete_seconds = timeit(lambda: scoring.preprocess_frame(incomplete, artifacts), args.repeat)
+    predict_seconds = timeit(lambda: scoring.predict_frame(scoring.preprocess_frame(complete, artifacts), artifacts), args.repeat)
+
+    print(f"rows: {args.rows} ({n_missing_rows} incomplete)")
+    print(f"preprocess complete:   {complete_seconds * 1000:8.2f} ms")
+    print(f"preprocess incomplete: {incomplete_seconds * 1000:8.2f} ms")
+    print(f"imputation overhead:   {(incomplete_seconds - complete_seconds) * 1000:8.2f} ms "
+          f"({(incomplete_seconds - complete_seconds) / args.rows * 1e6:.2f} us per row)")
+    print(f"preprocess + predict:  {predict_seconds * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
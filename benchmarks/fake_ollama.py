@@ -0,0 +1,169 @@
+"""
+Local stand-in for the Ollama HTTP API, for load tests of /ai_ask.
+
+Answers /api/generate and /api/chat (streamed or not) for any model name with
+canned ReAct steps that the pandas dataframe agent can parse: the first
+--steps calls of a question return an Action on the python_repl_ast tool, the
+next one returns a Final Answer. A fraction of the questions (--stall-rate)
+never reach a Final Answer, so the agent hits its time limit and /ai_ask falls
+back to llama3.1 like it does with a slow real model.
+
+Usage (from the repository root):
+    python benchmarks/fake_ollama.py --port 11435 --latency 0.8 --jitter 0.3
+    OLLAMA_HOST=http://127.0.0.1:11435 uvicorn main:app   (from fastapi/)
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Tool calls on the dataframe described in get_prefix() (fastapi/main.py)
+ACTIONS = [
+    ("I should look at the average probability of leaving.", "df['Probability of Leaving'].mean()"),
+    ("I should count the predictions.", "df['Prediction'].value_counts()"),
+    ("I should find the employees least likely to leave.", "df.nsmallest(5, 'Probability of Leaving')['Full Name'].tolist()"),
+    ("I should compare education levels.", "df.groupby('Education Level')['Probability of Leaving'].mean()"),
+]
+FINAL_ANSWER = (
+    "Thought: I now know the final answer\n"
+    "Final Answer: Employees with the lowest probability of leaving should be prioritized for the data science "
+    "course. The next step is to confirm their availability with their managers."
+)
+MODELS = ['qwen2.5', 'llama3.1']
+
+
+def scratchpad_steps(prompt):
+    """Number of tool calls already made for the question in the prompt"""
+    # The format instructions of the ReAct prompt contain one "Observation:" line
+    return prompt.count('Observation:') - prompt.count('Observation: the result of the action')
+
+
+def completion(prompt, steps, stall_rate):
+    """Next ReAct step for a prompt"""
+    done = scratchpad_steps(prompt)
+    # Stalled questions are chosen by the question text, so every step of a question agrees
+    question = prompt.rsplit('Question:', 1)[-1].split('\n', 1)[0]
+    stalled = (zlib.crc32(question.encode()) % 1000) < stall_rate * 1000
+    if done >= steps and not stalled:
+        return FINAL_ANSWER
+    thought, action_input = ACTIONS[done % len(ACTIONS)]
+    return f"Thought: {thought}\nAction: python_repl_ast\nAction Input: {action_input}"
+
+
+class OllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None  # set by make_server()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, body, status=200):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self.send_json({'models': [{'name': f'{m}:latest', 'model': f'{m}:latest'} for m in MODELS]})
+        elif self.path == '/api/version':
+            self.send_json({'version': '0.0.0-fake'})
+        elif self.path == '/':
+            self.send_json('Ollama is running')
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if self.path == '/api/generate':
+            prompt = request.get('prompt', '')
+        elif self.path == '/api/chat':
+            prompt = '\n'.join(message.get('content', '') for message in request.get('messages', []))
+        elif self.path == '/api/show':
+            self.send_json({'modelfile': '', 'parameters': '', 'template': '', 'details': {}})
+            return
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+            return
+
+        config = self.config
+        time.sleep(max(0.0, random.gauss(config['latency'], config['jitter'])))
+        text = completion(prompt, config['steps'], config['stall_rate'])
+        if self.path == '/api/generate':
+            chunk = {'response': text}
+            last = {'response': ''}
+        else:
+            chunk = {'message': {'role': 'assistant', 'content': text}}
+            last = {'message': {'role': 'assistant', 'content': ''}}
+        common = {'model': request.get('model', MODELS[0]), 'created_at': datetime.now(timezone.utc).isoformat()}
+        stats = {'done': True, 'done_reason': 'stop', 'total_duration': 0, 'prompt_eval_count': len(prompt) // 4,
+                 'eval_count': len(text) // 4}
+
+        if not request.get('stream', True):
+            self.send_json({**common, **chunk, **stats})
+            return
+        # Streamed responses are newline-delimited JSON
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for body in [{**common, **chunk, 'done': False}, {**common, **last, **stats}]:
+            line = json.dumps(body).encode() + b'\n'
+            self.wfile.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def make_server(host='127.0.0.1', port=11435, latency=0.5, jitter=0.1, steps=1, stall_rate=0.0):
+    """
+    Create the fake Ollama server (call serve_forever(), or start_in_thread()).
+
+    Parameters
+    ----------
+    latency, jitter : float
+        Mean and standard deviation of the seconds spent on each completion
+    steps : int
+        Tool calls before the Final Answer
+    stall_rate : float
+        Fraction of questions that never reach a Final Answer
+    """
+    handler = type('ConfiguredOllamaHandler', (OllamaHandler,), {
+        'config': {'latency': latency, 'jitter': jitter, 'steps': steps, 'stall_rate': stall_rate}})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start the fake Ollama server in a daemon thread and return it"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama API with canned ReAct answers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=0.5, help="Mean seconds per completion")
+    parser.add_argument('--jitter', type=float, default=0.1, help="Standard deviation of the latency")
+    parser.add_argument('--steps', type=int, default=1, help="Tool calls before the Final Answer")
+    parser.add_argument('--stall-rate', type=float, default=0.0, help="Fraction of questions without a Final Answer")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.jitter, args.steps, args.stall_rate)
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Synthetic employees shared by the benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+FIELD_VALUES = {
+    'gender': ['Male', 'Female', 'Other'],
+    'relevant_experience': [True, False],
+    'enrolled_university': ['No Enroll', 'Part Time', 'Full Time'],
+    'education_level': ['Primary School', 'High School', 'Graduate', 'Masters', 'Phd'],
+    'major_discipline': ['STEM', 'Humanities', 'Business Degree', 'Arts', 'No Major', 'Other'],
+    'experience': ['<1'] + [str(i) for i in range(1, 21)] + ['>20'],
+    'company_size': ['<10', '10-49', '50-99', '100-500', '500-999', '1000-4999', '5000-9999', '10000+'],
+    'company_type': ['Pvt Ltd', 'Public Sector', 'Funded Startup', 'Early Startup', 'NGO', 'Other'],
+    'last_new_job': ['never', '1', '2', '3', '4', '>4'],
+}
+
+# Excel template header -> EmployeeData field, and the template's labels of API values
+EXCEL_COLUMNS = {
+    'Full Name': 'full_name',
+    'Gender': 'gender',
+    'Enrolled University': 'enrolled_university',
+    'Work Experience': 'experience',
+    'Data Science Experience': 'relevant_experience',
+    'Duration of Last New Job': 'last_new_job',
+    'Education Level': 'education_level',
+    'Major Discipline': 'major_discipline',
+    'City Development Index': 'city_development_index',
+    'Company Size': 'company_size',
+    'Company Type': 'company_type',
+}
+EXCEL_LABELS = {
+    'experience': {'<1': 0, '>20': 21, **{str(i): i for i in range(1, 21)}},
+    'relevant_experience': {True: 'Yes', False: 'No'},
+    'last_new_job': {'never': 'Never', '>4': 'More than 4', **{str(i): i for i in range(1, 5)}},
+    'company_size': {
+        '<10': 'Less than 10', '10-49': '10 to 49', '50-99': '50 to 99', '100-500': '100 to 499',
+        '500-999': '500 to 999', '1000-4999': '1000 to 4999', '5000-9999': '5000 to 9999', '10000+': 'More than 9999',
+    },
+}
+
+
+def make_employees(n_rows, seed=1):
+    """Random complete employees with the EmployeeData fields"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({field: rng.choice(np.array(values, dtype=object), n_rows) for field, values in FIELD_VALUES.items()})
+    df['city_development_index'] = rng.uniform(0.4, 0.95, n_rows).round(3)
+    df['full_name'] = [f'Employee {i}' for i in range(n_rows)]
+    return df
+
+
+def drop_fields(df, fraction=0.5, seed=1):
+    """Blank one to three fields in a fraction of the rows"""
+    rng = np.random.default_rng(seed)
+    df = df.astype(object).copy()
+    fields = list(FIELD_VALUES) + ['city_development_index']
+    for i in np.flatnonzero(rng.random(len(df)) < fraction):
+        for field in rng.choice(fields, rng.integers(1, 4), replace=False):
+            df.at[i, field] = None
+    return df
+
+
+def make_excel_frame(df):
+    """Employees as filled in the mass input Excel template"""
+    df = df.copy()
+    for field, labels in EXCEL_LABELS.items():
+        df[field] = df[field].map(labels)
+    return df[list(EXCEL_COLUMNS.values())].set_axis(list(EXCEL_COLUMNS), axis=1)
+
+
+def make_results(df, seed=1):
+    """Results as returned by /predict for the employees"""
+    rng = np.random.default_rng(seed)
+    probabilities = rng.random(len(df))
+    return [
+        {'original_data': original, 'prediction': int(probability > 0.5), 'probability': float(probability)}
+        for original, probability in zip(df.to_dict('records'), probabilities)
+    ]
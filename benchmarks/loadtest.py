@@ -0,0 +1,265 @@
+"""
+End-to-end load test of the FastAPI service with concurrent HR users.
+
+Starts the fake Ollama server (benchmarks/fake_ollama.py) and the app with
+uvicorn (OLLAMA_HOST pointing at the fake, results in a temporary database),
+then runs --concurrency simulated users for --duration seconds. Each user picks
+a scenario from the traffic mix and runs it the way Streamlit does:
+
+- single: POST /preprocess and POST /predict with one employee
+- mass: POST /results, then /preprocess and /predict per chunk of 50 employees
+- template: GET /create_excel_template
+- ai: POST /ai_ask about a stored result set
+
+Throughput, p50/p95/p99 latency and error rates are reported per endpoint.
+
+Usage (from the repository root, after python -m training.train):
+    python benchmarks/loadtest.py --concurrency 16 --duration 60
+    python benchmarks/loadtest.py --mix single=50,mass=20,template=10,ai=20 --ollama-latency 2
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000   (an app already running)
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+import fake_ollama
+from fixtures import make_employees
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CHUNK_SIZE = 50  # max_items of MassInputData
+QUESTIONS = [
+    "Which 5 employees should we choose for the data science course?",
+    "What is the average probability of leaving?",
+    "How many employees are predicted to leave?",
+    "Which education level has the lowest probability of leaving?",
+]
+
+
+class Recorder:
+    """Thread-safe latency and outcome log per endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+
+    def add(self, endpoint, seconds, outcome):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.outcomes[endpoint][outcome] += 1
+
+    def report(self, elapsed):
+        """Per-endpoint statistics"""
+        report = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = np.array(latencies) * 1000
+            outcomes = dict(self.outcomes[endpoint])
+            errors = sum(count for outcome, count in outcomes.items() if outcome != 'ok')
+            report[endpoint] = {
+                'requests': len(latencies),
+                'throughput_rps': len(latencies) / elapsed,
+                'p50_ms': float(np.percentile(latencies, 50)),
+                'p95_ms': float(np.percentile(latencies, 95)),
+                'p99_ms': float(np.percentile(latencies, 99)),
+                'error_rate': errors / len(latencies),
+                'outcomes': outcomes,
+            }
+        return report
+
+
+def call(session, recorder, endpoint, method, url, **kwargs):
+    """Send one request and record its latency and outcome"""
+    start = time.perf_counter()
+    try:
+        response = session.request(method, url, **kwargs)
+    except requests.RequestException as e:
+        recorder.add(endpoint, time.perf_counter() - start, type(e).__name__)
+        return None
+    seconds = time.perf_counter() - start
+    if response.status_code != 200:
+        recorder.add(endpoint, seconds, f'http_{response.status_code}')
+        return None
+    # /ai_ask returns 200 with status "error" when both models time out
+    if endpoint == 'POST /ai_ask' and response.json().get('status') == 'error':
+        recorder.add(endpoint, seconds, 'timeout')
+        return None
+    recorder.add(endpoint, seconds, 'ok')
+    return response
+
+
+def score(session, recorder, url, employees, result_id=None, offset=0):
+    """Preprocess and predict one chunk, like predict_chunk() in Streamlit"""
+    response = call(session, recorder, 'POST /preprocess', 'POST', f'{url}/preprocess', json={'employees': employees})
+    if response is None:
+        return None
+    params = {'offset': offset}
+    if result_id is not None:
+        params['result_id'] = result_id
+    response = call(session, recorder, 'POST /predict', 'POST', f'{url}/predict', json=response.json(), params=params)
+    return None if response is None else response.json()['result_id']
+
+
+## Scenarios: (session, recorder, url, context) -> None
+def scenario_single(session, recorder, url, context):
+    score(session, recorder, url, [random.choice(context['employees'])])
+
+
+def scenario_mass(session, recorder, url, context):
+    response = call(session, recorder, 'POST /results', 'POST', f'{url}/results')
+    if response is None:
+        return
+    result_id = response.json()['result_id']
+    employees = random.sample(context['employees'], context['mass_rows'])
+    for offset in range(0, len(employees), CHUNK_SIZE):
+        score(session, recorder, url, employees[offset:offset + CHUNK_SIZE], result_id, offset)
+
+
+def scenario_template(session, recorder, url, context):
+    call(session, recorder, 'GET /create_excel_template', 'GET', f'{url}/create_excel_template')
+
+
+def scenario_ai(session, recorder, url, context):
+    request = {'question': random.choice(QUESTIONS), 'result_id': context['result_id']}
+    call(session, recorder, 'POST /ai_ask', 'POST', f'{url}/ai_ask', json=request, timeout=context['ai_timeout'])
+
+
+SCENARIOS = {
+    'single': scenario_single,
+    'mass': scenario_mass,
+    'template': scenario_template,
+    'ai': scenario_ai,
+}
+
+
+def parse_mix(mix):
+    """'single=60,mass=25' -> {'single': 60.0, 'mass': 25.0}"""
+    weights = {}
+    for item in mix.split(','):
+        name, weight = item.split('=')
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name} (choose from {', '.join(SCENARIOS)})")
+        weights[name] = float(weight)
+    return weights
+
+
+def user(url, weights, context, recorder, deadline, think_time, seed):
+    """One simulated HR user running scenarios until the deadline"""
+    rng = random.Random(seed)
+    names, probabilities = list(weights), list(weights.values())
+    with requests.Session() as session:
+        while time.perf_counter() < deadline:
+            SCENARIOS[rng.choices(names, probabilities)[0]](session, recorder, url, context)
+            if think_time:
+                time.sleep(rng.expovariate(1 / think_time))
+
+
+def start_app(port, ollama_url, workers):
+    """Start the app with uvicorn and wait until it answers"""
+    env = {
+        **os.environ,
+        'OLLAMA_HOST': ollama_url,
+        'RESULTS_DB': os.path.join(tempfile.mkdtemp(prefix='loadtest-'), 'results.db'),
+    }
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=os.path.join(ROOT, 'fastapi'), env=env)
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(120):
+        if process.poll() is not None:
+            raise SystemExit(f"uvicorn exited with status {process.returncode}")
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("The app did not start in 60 seconds")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the FastAPI service")
+    parser.add_argument('--url', default=None, help="Test an app that is already running instead of starting one")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--concurrency', type=int, default=8, help="Simulated users")
+    parser.add_argument('--duration', type=float, default=30, help="Seconds of load")
+    parser.add_argument('--mix', default='single=60,mass=25,template=10,ai=5', help="Scenario weights")
+    parser.add_argument('--mass-rows', type=int, default=200, help="Employees per mass upload")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Mean seconds between scenarios of a user")
+    parser.add_argument('--ollama-port', type=int, default=11435)
+    parser.add_argument('--ollama-latency', type=float, default=0.5, help="Mean seconds per LLM completion")
+    parser.add_argument('--ollama-jitter', type=float, default=0.1)
+    parser.add_argument('--ollama-steps', type=int, default=1, help="Tool calls before the Final Answer")
+    parser.add_argument('--ollama-stall-rate', type=float, default=0.0, help="Fraction of questions that time out")
+    parser.add_argument('--ai-timeout', type=float, default=300, help="Client timeout of /ai_ask in seconds")
+    parser.add_argument('--out', default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    process = None
+    ollama = None
+    if args.url:
+        url = args.url.rstrip('/')
+    else:
+        ollama = fake_ollama.start_in_thread(port=args.ollama_port, latency=args.ollama_latency,
+                                             jitter=args.ollama_jitter, steps=args.ollama_steps,
+                                             stall_rate=args.ollama_stall_rate)
+        process, url = start_app(args.port, f'http://127.0.0.1:{args.ollama_port}', args.workers)
+
+    try:
+        employees = make_employees(max(args.mass_rows, 1000)).to_dict('records')
+        context = {'employees': employees, 'mass_rows': args.mass_rows, 'ai_timeout': args.ai_timeout}
+        # Result set asked about by the ai scenario
+        with requests.Session() as session:
+            context['result_id'] = score(session, Recorder(), url, employees[:CHUNK_SIZE])
+        if context['result_id'] is None and 'ai' in weights:
+            raise SystemExit("Could not create the result set for the ai scenario")
+
+        recorder = Recorder()
+        start = time.perf_counter()
+        deadline = start + args.duration
+        users = [
+            threading.Thread(target=user, args=(url, weights, context, recorder, deadline, args.think_time, seed))
+            for seed in range(args.concurrency)
+        ]
+        for thread in users:
+            thread.start()
+        for thread in users:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if ollama is not None:
+            ollama.shutdown()
+
+    report = recorder.report(elapsed)
+    print(f"{args.concurrency} users, {elapsed:.1f}s, mix {args.mix}")
+    print(f"{'endpoint':<30}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for endpoint, stats in report.items():
+        print(f"{endpoint:<30}{stats['requests']:>10}{stats['throughput_rps']:>10.1f}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['error_rate']:>9.1%}")
+        failures = {outcome: count for outcome, count in stats['outcomes'].items() if outcome != 'ok'}
+        if failures:
+            print(f"{'':<30}{failures}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'concurrency': args.concurrency, 'duration': elapsed, 'mix': weights, 'endpoints': report}, f, indent=2)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from fastapi.responses import JSONResponse
+import metrics
+
+# Config
+ADMISSION = os.getenv('ADMISSION', 'on') # 'off' admits every request
+SINGLE_MAX_BYTES = int(os.getenv('ADMISSION_SINGLE_MAX_BYTES', '4096')) # scoring bodies up to this size are single predictions
+DEADLINE_HEADER = b'x-request-deadline-ms' # a client can ask for a shorter deadline than its class
+EWMA_ALPHA = 0.2 # weight of the last request in the average service time
+## Endpoint classes (other paths are not limited)
+scoring_paths = {'/preprocess', '/predict', '/predict_label', '/explain', '/counterfactual', '/sensitivity'}
+roster_paths = {'/sensitivity'} # a small body without 'employees' scores a stored result set or the holdout pool
+class_paths = {'/create_excel_template': 'template', '/ai_ask': 'ai', '/simulate_guarantee': 'analysis', '/select_cohort': 'analysis'}
+
+## Limits per class: concurrency, queue depth, and deadline (seconds a request may wait to start),
+## overridden with ADMISSION_<CLASS>=concurrency:queue:deadline, e.g. ADMISSION_AI=1:4:20
+def class_limits(name, concurrency, queue, deadline):
+  value = os.getenv(f'ADMISSION_{name.upper()}')
+  if value:
+    concurrency, queue, deadline = value.split(':')
+  return int(concurrency), int(queue), float(deadline)
+
+default_limits = {
+  'single': class_limits('single', 32, 256, 2), # single predictions first: own slots, short deadline
+  'mass': class_limits('mass', 4, 32, 10),
+  'template': class_limits('template', 2, 8, 10),
+  'ai': class_limits('ai', 2, 8, 30),
+  'analysis': class_limits('analysis', 2, 16, 10) # guarantee simulation and cohort LP
+}
+
+# Class
+## Class: Concurrency limit with a bounded FIFO queue
+class Limiter:
+  """
+  Admit up to `concurrency` requests at once and queue up to `queue` more. A request is rejected
+  at once when the queue is full (429) or when the average service time says it can't start within
+  its deadline (503), and also when it is still queued at its deadline (503).
+  """
+
+  def __init__(self, name, concurrency, queue, deadline):
+    self.name = name
+    self.concurrency = concurrency
+    self.queue = queue
+    self.deadline = deadline
+    self.active = 0
+    self.waiters = deque()
+    self.service_seconds = None # moving average of the time a request holds its slot
+
+  def estimated_wait(self, position):
+    """Seconds until the request at this queue position starts"""
+    if self.service_seconds is None:
+      return 0.0
+    return (position // self.concurrency + 1) * self.service_seconds
+
+  async def acquire(self, deadline):
+    """Return None once admitted, or (status, reason, retry_after) when rejected"""
+    if self.active < self.concurrency and not self.waiters:
+      self.active += 1
+      return None
+    position = len(self.waiters)
+    wait = self.estimated_wait(position)
+    if position >= self.queue:
+      return 429, 'queue_full', wait
+    if wait > deadline:
+      return 503, 'deadline', wait
+    future = asyncio.get_running_loop().create_future()
+    self.waiters.append(future)
+    start = time.perf_counter()
+    try:
+      await asyncio.wait_for(asyncio.shield(future), deadline)
+    except asyncio.TimeoutError:
+      if future.done():
+        # Admitted just as the deadline passed
+        metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, self.name)
+        return None
+      future.cancel()
+      self.waiters.remove(future)
+      return 503, 'deadline', self.estimated_wait(len(self.waiters))
+    except BaseException:
+      # Client gone while queued: give the slot on if it was already handed over
+      if future.done() and not future.cancelled():
+        self.release(None)
+      else:
+        future.cancel()
+        if future in self.waiters:
+          self.waiters.remove(future)
+      raise
+    metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start, self.name)
+    return None
+
+  def release(self, seconds):
+    if seconds is not None:
+      self.service_seconds = seconds if self.service_seconds is None else (1 - EWMA_ALPHA) * self.service_seconds + EWMA_ALPHA * seconds
+    # Hand the slot to the oldest waiter still queued
+    while self.waiters:
+      future = self.waiters.popleft()
+      if not future.done():
+        future.set_result(None)
+        return
+    self.active -= 1
+
+# Func: Admission control
+## Sub-Func: Body size from Content-Length (None when missing, e.g. a chunked body)
+def content_length(scope):
+  try:
+    return int(dict(scope['headers'])[b'content-length'])
+  except (KeyError, ValueError):
+    return None
+
+## Sub-Func: Read a small body ahead of the app, which gets the same messages replayed
+async def read_body(receive):
+  messages, body = [], b''
+  while True:
+    message = await receive()
+    messages.append(message)
+    if message['type'] != 'http.request':
+      break
+    body += message.get('body', b'')
+    if not message.get('more_body'):
+      break
+
+  async def replay():
+    return messages.pop(0) if messages else await receive()
+
+  return body, replay
+
+## Sub-Func: Endpoint class of a request (payload is the parsed body of roster_paths)
+def request_class(scope, payload=None):
+  path = scope['path']
+  if path in scoring_paths:
+    size = content_length(scope)
+    if size is None or size > SINGLE_MAX_BYTES:
+      return 'mass'
+    if path in roster_paths and not (isinstance(payload, dict) and payload.get('employees')):
+      return 'mass'
+    return 'single'
+  return class_paths.get(path)
+
+## Main-Func: ASGI middleware
+class AdmissionMiddleware:
+  """Limit concurrent requests per endpoint class and shed load with 429/503 and Retry-After"""
+
+  def __init__(self, app, limits=None):
+    self.app = app
+    self.limiters = {name: Limiter(name, *values) for name, values in (limits or default_limits).items()}
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] != 'http' or ADMISSION == 'off':
+      await self.app(scope, receive, send)
+      return
+    payload = None
+    size = content_length(scope)
+    if scope['path'] in roster_paths and size is not None and size <= SINGLE_MAX_BYTES:
+      body, receive = await read_body(receive)
+      try:
+        payload = json.loads(body)
+      except ValueError:
+        pass # the app answers 422
+    name = request_class(scope, payload)
+    limiter = self.limiters.get(name)
+    if limiter is None:
+      await self.app(scope, receive, send)
+      return
+    deadline = limiter.deadline
+    requested = dict(scope['headers']).get(DEADLINE_HEADER)
+    if requested:
+      try:
+        deadline = min(deadline, max(float(requested) / 1000, 0))
+      except ValueError:
+        pass
+    rejection = await limiter.acquire(deadline)
+    if rejection is not None:
+      status, reason, retry_after = rejection
+      metrics.ADMISSION_REJECTIONS.inc(name, reason)
+      response = JSONResponse(
+        {'detail': f"Too many {name} requests, retry later"},
+        status_code=status,
+        headers={'Retry-After': str(max(math.ceil(retry_after), 1))}
+      )
+      await response(scope, receive, send)
+      return
+    metrics.request_admitted()
+    start = time.perf_counter()
+    try:
+      await self.app(scope, receive, send)
+    finally:
+      limiter.release(time.perf_counter() - start)
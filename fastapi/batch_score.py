@@ -0,0 +1,216 @@
+"""
+Offline batch scoring of large files, outside the web service.
+
+Reads a CSV or Parquet file in chunks, scores the chunks in a process pool with the preprocessing and
+model of the service (scoring.preprocess_frame and scoring.predict_frame of a registry version), and
+appends the probabilities of leaving to a CSV in the shape of Data/sample_submission.csv
+(enrollee_id,target) as the chunks finish, in input order.
+
+Inputs can be raw files like Data/aug_test.csv (normalized like the training data, see
+training/data.py) or files with the EmployeeData fields of the service. Missing values are imputed
+like in the service, so the model version needs an imputer if the file has any.
+
+After every chunk the output is flushed and <output>.checkpoint.json records the rows written and the
+output size, so a killed job started again with the same arguments resumes after the last complete
+chunk (the output is truncated to the checkpoint). The checkpoint is removed when the job finishes.
+
+Usage (from the repository root):
+    python fastapi/batch_score.py Data/aug_test.csv submission.csv
+    python fastapi/batch_score.py clients.parquet scores.csv --workers 8 --chunk-size 50000 --version 2026-10-19
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import registry
+import scoring
+
+# Config
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CHUNK_SIZE = 50_000
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+## Columns read as text (numbers like experience 5 and '>20' share a column)
+text_columns = scoring.oe_columns + scoring.ohe_columns + ['full_name']
+relevant_experience_values = {True: True, False: False, 'True': True, 'False': False, 'true': True, 'false': False, 1: True, 0: False}
+
+# Func: Read input
+## Sub-Func: Number of rows, when the format stores it
+def count_rows(path):
+  if path.endswith('.parquet'):
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+  return None
+
+## Main-Func: Chunks of the input, after the rows already scored
+def read_chunks(path, chunk_size, skip_rows=0):
+  if path.endswith('.parquet'):
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+      if skip_rows >= batch.num_rows:
+        skip_rows -= batch.num_rows
+        continue
+      yield batch.slice(skip_rows).to_pandas()
+      skip_rows = 0
+  else:
+    header = pd.read_csv(path, nrows=0).columns
+    dtype = {column: str for column in text_columns + ['relevent_experience'] if column in header}
+    yield from pd.read_csv(path, chunksize=chunk_size, dtype=dtype, skiprows=range(1, skip_rows + 1))
+
+# Func: Score chunks (in the worker processes)
+_worker = {}
+
+## Sub-Func: Load the artifacts once per worker
+def init_worker(model_path, threads):
+  # One LightGBM thread per worker by default, the pool already uses every core
+  os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+  _worker['artifacts'] = scoring.load_artifacts(model_path)
+
+## Sub-Func: Raw Kaggle files to EmployeeData fields
+def prepare(df):
+  if 'relevent_experience' in df.columns:
+    if REPO_DIR not in sys.path:
+      sys.path.insert(0, REPO_DIR)
+    from training.data import normalize
+    return normalize(df)
+  df = df.copy()
+  df['relevant_experience'] = df['relevant_experience'].map(relevant_experience_values).astype('boolean')
+  return df
+
+## Main-Func: Score one chunk and format its output rows
+def score_chunk(df, id_column, first_row):
+  df = prepare(df)
+  features = scoring.preprocess_frame(df, _worker['artifacts'])
+  _, probabilities = scoring.predict_frame(features, _worker['artifacts'])
+  ids = df[id_column].to_numpy() if id_column in df.columns else np.arange(first_row, first_row + len(df))
+  return len(df), pd.DataFrame({id_column: ids, 'target': probabilities}).to_csv(header=False, index=False)
+
+# Func: Checkpoint
+## Sub-Func: Identity of a job (a checkpoint only resumes the same input, output, and model)
+def job_identity(input_path, output_path, model_version, id_column, chunk_size):
+  stat = os.stat(input_path)
+  return {
+    'input': os.path.abspath(input_path),
+    'input_size': stat.st_size,
+    'input_mtime_ns': stat.st_mtime_ns,
+    'output': os.path.abspath(output_path),
+    'model_version': model_version,
+    'id_column': id_column,
+    'chunk_size': chunk_size
+  }
+
+def load_checkpoint(path):
+  try:
+    with open(path) as f:
+      return json.load(f)
+  except (OSError, ValueError):
+    return None
+
+def save_checkpoint(path, checkpoint):
+  tmp_path = f'{path}.tmp'
+  with open(tmp_path, 'w') as f:
+    json.dump(checkpoint, f, indent=2)
+  os.replace(tmp_path, path)
+
+# Func: Batch scoring
+## Sub-Func: Model version to score with (the version the service would serve by default)
+def resolve_version(version=None):
+  models = registry.ModelRegistry()
+  versions = models.available()
+  if version is None:
+    version = models.saved_active()
+    if version not in versions:
+      version = models.latest(versions)
+  if version not in versions:
+    raise ValueError(f"Model version {version} not found in {models.base_dir} or {models.versions_dir}")
+  return version, versions[version]
+
+## Main-Func: Score a file
+def batch_score(input_path, output_path, version=None, workers=None, chunk_size=CHUNK_SIZE, id_column='enrollee_id',
+                threads_per_worker=1, restart=False, log=print):
+  """Score input_path into output_path, resuming from its checkpoint if there is one. Return the run statistics"""
+  version, model_path = resolve_version(version)
+  workers = workers or os.cpu_count() or 1
+  checkpoint_path = output_path + CHECKPOINT_SUFFIX
+  identity = job_identity(input_path, output_path, version, id_column, chunk_size)
+  checkpoint = None if restart else load_checkpoint(checkpoint_path)
+  if checkpoint is not None and checkpoint['job'] != identity:
+    raise ValueError(f"{checkpoint_path} belongs to another job (input, model version, or options changed), use --restart")
+  if checkpoint is None or not os.path.exists(output_path):
+    checkpoint = {'job': identity, 'rows_done': 0, 'output_bytes': 0}
+  elif checkpoint['rows_done']:
+    log(f"Resuming after {checkpoint['rows_done']} rows")
+
+  total_rows = count_rows(input_path)
+  resumed_rows = rows_done = checkpoint['rows_done']
+  start = time.perf_counter()
+  with open(output_path, 'r+b' if checkpoint['output_bytes'] else 'wb') as output, \
+       ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(model_path, threads_per_worker)) as pool:
+    # Drop rows written after the last checkpoint
+    output.truncate(checkpoint['output_bytes'])
+    output.seek(checkpoint['output_bytes'])
+    if not checkpoint['output_bytes']:
+      output.write(f'{id_column},target\n'.encode())
+    # Keep a bounded window of chunks in flight, written back in input order
+    pending = deque()
+    chunks = read_chunks(input_path, chunk_size, skip_rows=rows_done)
+    first_row = rows_done
+    try:
+      while True:
+        while len(pending) < 2 * workers:
+          df = next(chunks, None)
+          if df is None:
+            break
+          pending.append(pool.submit(score_chunk, df, id_column, first_row))
+          first_row += len(df)
+        if not pending:
+          break
+        n_rows, text = pending.popleft().result()
+        output.write(text.encode())
+        output.flush()
+        os.fsync(output.fileno())
+        rows_done += n_rows
+        checkpoint.update(rows_done=rows_done, output_bytes=output.tell())
+        save_checkpoint(checkpoint_path, checkpoint)
+        rate = (rows_done - resumed_rows) / (time.perf_counter() - start)
+        log(f"{rows_done}{'' if total_rows is None else f'/{total_rows}'} rows, {rate:,.0f} rows/sec")
+    except BaseException:
+      # Stop queued chunks, the checkpoint already covers every row written
+      pool.shutdown(wait=False, cancel_futures=True)
+      raise
+
+  seconds = time.perf_counter() - start
+  if os.path.exists(checkpoint_path):
+    os.remove(checkpoint_path)
+  return {
+    'model_version': version,
+    'rows': rows_done,
+    'resumed_rows': resumed_rows,
+    'seconds': round(seconds, 3),
+    'rows_per_second': round((rows_done - resumed_rows) / seconds, 1) if seconds > 0 else None
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description="Score a CSV or Parquet file with the service model")
+  parser.add_argument('input', help="CSV or Parquet file (raw like Data/aug_test.csv, or EmployeeData fields)")
+  parser.add_argument('output', help="CSV with the id column and the probability of leaving (target)")
+  parser.add_argument('--version', default=None, help="Model version (default: the version the service serves)")
+  parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: every core)")
+  parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+  parser.add_argument('--threads-per-worker', type=int, default=1, help="LightGBM threads of each worker")
+  parser.add_argument('--id-column', default='enrollee_id', help="Copied to the output (row numbers if absent)")
+  parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and score from the start")
+  args = parser.parse_args()
+  try:
+    stats = batch_score(args.input, args.output, args.version, args.workers, args.chunk_size, args.id_column,
+                        args.threads_per_worker, args.restart, log=lambda message: print(message, file=sys.stderr))
+  except (ValueError, FileNotFoundError) as e:
+    sys.exit(str(e))
+  print(json.dumps(stats))
+
+if __name__ == "__main__":
+  main()
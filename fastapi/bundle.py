@@ -0,0 +1,283 @@
+"""
+Pickle-free artifact bundle.
+
+Exports the pickles in a pickle directory to <pickle dir>/bundle/:
+- model.txt: the booster in LightGBM's native text format
+- preprocessing.json: OrdinalEncoder categories, MinMaxScaler min_/scale_ (and data_min_/data_max_),
+  and the fitted IterativeImputer (initial means and the linear model of every imputation step)
+- bundle.json: format version and sha256 of both files, checked when the bundle is loaded
+
+Loading the bundle only needs numpy and lightgbm (no sklearn, no matching pickle versions), and
+scoring.load_artifacts() prefers it over the pickles. The export scores synthetic rows with both
+artifact sets and refuses to write a bundle whose predictions differ from the pickles.
+
+Usage (from the repository root):
+    python fastapi/bundle.py
+    python fastapi/bundle.py --pickle-dir fastapi/pickle/versions/2026-10-19
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import scoring
+
+# Config
+FORMAT_VERSION = 1
+BUNDLE_DIR = 'bundle'
+MANIFEST_FILE = 'bundle.json'
+MODEL_FILE = 'model.txt'
+PREPROCESSING_FILE = 'preprocessing.json'
+
+# Class
+## Class: OrdinalEncoder
+class BundleOrdinalEncoder:
+  """OrdinalEncoder.transform from the categories (missing values stay NaN)"""
+
+  def __init__(self, columns, categories, handle_unknown, unknown_value):
+    self.columns = columns
+    self.categories_ = [np.array(cats, dtype=object) for cats in categories]
+    self.handle_unknown = handle_unknown
+    self.unknown_value = np.nan if unknown_value is None else unknown_value # None stands for NaN in JSON
+    self.lookups = [{cat: float(i) for i, cat in enumerate(cats)} for cats in categories]
+
+  def transform(self, df):
+    df = pd.DataFrame(df)
+    encoded = np.empty(df.shape, dtype=float)
+    for j, lookup in enumerate(self.lookups):
+      column = df.iloc[:, j].astype(object)
+      codes = column.map(lookup).to_numpy(dtype=float)
+      unknown = np.isnan(codes) & column.notna().to_numpy()
+      if unknown.any():
+        if self.handle_unknown != 'use_encoded_value':
+          raise ValueError(f"Found unknown categories {sorted(set(column[unknown]), key=str)} in column {j} during transform")
+        codes[unknown] = self.unknown_value
+      encoded[:, j] = codes
+    return encoded
+
+## Class: MinMaxScaler
+class BundleMinMaxScaler:
+  """MinMaxScaler.transform (X * scale_ + min_, the same operations as sklearn)"""
+
+  def __init__(self, min_, scale_, data_min_, data_max_, clip, feature_range):
+    self.min_ = np.array(min_, dtype=float)
+    self.scale_ = np.array(scale_, dtype=float)
+    self.data_min_ = np.array(data_min_, dtype=float)
+    self.data_max_ = np.array(data_max_, dtype=float)
+    self.clip = clip
+    self.feature_range = tuple(feature_range)
+
+  def transform(self, X):
+    X = np.array(X, dtype=float)
+    X *= self.scale_
+    X += self.min_
+    if self.clip:
+      np.clip(X, self.feature_range[0], self.feature_range[1], out=X)
+    return X
+
+## Class: IterativeImputer with linear estimators
+class BundleIterativeImputer:
+  """IterativeImputer.transform replaying the fitted imputation sequence of linear models"""
+
+  def __init__(self, initial_statistics, sequence, min_value, max_value):
+    self.initial_statistics = np.array(initial_statistics, dtype=float)
+    self.sequence = [
+      (step['feat_idx'], np.array(step['neighbor_feat_idx'], dtype=int), np.array(step['coef'], dtype=float), step['intercept'])
+      for step in sequence
+    ]
+    self.min_value = np.array(min_value, dtype=float)
+    self.max_value = np.array(max_value, dtype=float)
+
+  def transform(self, X):
+    X = np.array(X, dtype=float)
+    mask = np.isnan(X)
+    filled = np.where(mask, self.initial_statistics, X)
+    if not self.sequence or mask.all():
+      return filled
+    for feat_idx, neighbor_feat_idx, coef, intercept in self.sequence:
+      rows = mask[:, feat_idx]
+      if not rows.any():
+        continue
+      imputed = filled[:, neighbor_feat_idx][rows] @ coef + intercept
+      filled[rows, feat_idx] = np.clip(imputed, self.min_value[feat_idx], self.max_value[feat_idx])
+    return filled
+
+## Class: LightGBM model
+class BundleModel:
+  """predict_proba of LGBMClassifier on a native Booster"""
+
+  def __init__(self, booster, classes):
+    self.booster = booster
+    self.classes_ = np.array(classes)
+
+  def predict_proba(self, X):
+    probabilities = self.booster.predict(np.asarray(X, dtype=float))
+    return np.vstack((1. - probabilities, probabilities)).transpose()
+
+# Func: Load
+## Sub-Func: sha256 of a file
+def file_hash(path):
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for block in iter(lambda: f.read(1 << 20), b''):
+      digest.update(block)
+  return digest.hexdigest()
+
+## Main-Func: Load a bundle directory into the artifacts used by scoring.py
+def load_bundle(bundle_dir):
+  import lightgbm
+
+  with open(os.path.join(bundle_dir, MANIFEST_FILE)) as f:
+    manifest = json.load(f)
+  if manifest['format_version'] != FORMAT_VERSION:
+    raise ValueError(f"Unsupported bundle format {manifest['format_version']}")
+  for name, digest in manifest['files'].items():
+    if file_hash(os.path.join(bundle_dir, name)) != digest:
+      raise ValueError(f"Checksum mismatch for {name} in {bundle_dir}")
+  with open(os.path.join(bundle_dir, PREPROCESSING_FILE)) as f:
+    preprocessing = json.load(f)
+  if preprocessing['features_columns'] != scoring.features_columns:
+    raise ValueError("The bundle was exported for other model features")
+  imputer = preprocessing['imputer']
+  return {
+    'ordinalencoder': BundleOrdinalEncoder(**preprocessing['ordinalencoder']),
+    'minmaxscaler': BundleMinMaxScaler(**preprocessing['minmaxscaler']),
+    'model': BundleModel(lightgbm.Booster(model_file=os.path.join(bundle_dir, MODEL_FILE)), preprocessing['classes']),
+    'imputer': BundleIterativeImputer(**imputer) if imputer is not None else None
+  }
+
+# Func: Export
+## Sub-Func: Parameters of each pickled object
+def export_ordinalencoder(oe):
+  handle_unknown = getattr(oe, 'handle_unknown', 'error')
+  unknown_value = None
+  if handle_unknown == 'use_encoded_value' and not np.isnan(oe.unknown_value):
+    unknown_value = float(oe.unknown_value)
+  categories = []
+  for cats in oe.categories_:
+    categories.append([cat.item() if hasattr(cat, 'item') else cat for cat in cats if not pd.isna(cat)])
+  return {'columns': scoring.oe_columns, 'categories': categories, 'handle_unknown': handle_unknown, 'unknown_value': unknown_value}
+
+def export_minmaxscaler(scaler):
+  return {
+    'min_': scaler.min_.tolist(),
+    'scale_': scaler.scale_.tolist(),
+    'data_min_': scaler.data_min_.tolist(),
+    'data_max_': scaler.data_max_.tolist(),
+    'clip': bool(getattr(scaler, 'clip', False)),
+    'feature_range': list(scaler.feature_range)
+  }
+
+def export_imputer(imputer):
+  if imputer.sample_posterior or imputer.add_indicator:
+    raise ValueError("Only IterativeImputer without sample_posterior and add_indicator can be exported")
+  statistics = imputer.initial_imputer_.statistics_
+  if np.isnan(statistics).any():
+    raise ValueError("IterativeImputer fitted with empty features can't be exported")
+  sequence = []
+  for triplet in imputer.imputation_sequence_:
+    estimator = triplet.estimator
+    if not hasattr(estimator, 'coef_') or np.ndim(estimator.coef_) != 1:
+      raise ValueError(f"Only linear MICE estimators can be exported, not {type(estimator).__name__}")
+    sequence.append({
+      'feat_idx': int(triplet.feat_idx),
+      'neighbor_feat_idx': [int(i) for i in triplet.neighbor_feat_idx],
+      'coef': estimator.coef_.tolist(),
+      'intercept': float(estimator.intercept_)
+    })
+  return {
+    'initial_statistics': statistics.tolist(),
+    'sequence': sequence,
+    'min_value': np.broadcast_to(imputer._min_value, statistics.shape).tolist(),
+    'max_value': np.broadcast_to(imputer._max_value, statistics.shape).tolist()
+  }
+
+## Sub-Func: Synthetic rows covering every category (and missing values when the imputer exists)
+def parity_rows(artifacts, n_rows=5000, seed=1):
+  rng = np.random.default_rng(seed)
+  df = pd.DataFrame({'full_name': [f'Employee {i}' for i in range(n_rows)]})
+  df['city_development_index'] = rng.uniform(0.3, 0.95, n_rows).round(3)
+  for column, cats in zip(scoring.oe_columns, artifacts['ordinalencoder'].categories_):
+    cats = np.array([cat for cat in cats if not pd.isna(cat)], dtype=object)
+    df[column] = rng.choice(cats, n_rows)
+  for column, columns in scoring.ohe_feature_columns.items():
+    cats = np.array([col[len(column) + 1:] for col in columns] + ['Other'], dtype=object)
+    df[column] = rng.choice(cats, n_rows)
+  if artifacts['imputer'] is not None:
+    df = df.astype(object)
+    fields = scoring.numerical_columns + scoring.oe_columns + scoring.ohe_columns
+    missing = rng.random((n_rows, len(fields))) < 0.1
+    for j, field in enumerate(fields):
+      df.loc[missing[:, j], field] = None
+  return df
+
+## Sub-Func: Compare predictions of the pickles and the bundle
+def check_parity(pickle_artifacts, bundle_artifacts, n_rows=5000):
+  df = parity_rows(pickle_artifacts, n_rows)
+  expected = scoring.predict_frame(scoring.preprocess_frame(df, pickle_artifacts), pickle_artifacts)
+  actual = scoring.predict_frame(scoring.preprocess_frame(df, bundle_artifacts), bundle_artifacts)
+  return {
+    'rows': n_rows,
+    'label_mismatches': int((expected[0] != actual[0]).sum()),
+    'max_abs_probability_diff': float(np.abs(expected[1] - actual[1]).max())
+  }
+
+## Main-Func: Export the pickles of a directory to <dir>/bundle/
+def export_bundle(pickle_dir, n_parity_rows=5000, tolerance=1e-12):
+  pickle_artifacts = scoring.load_artifacts(pickle_dir, artifact_format='pickle')
+  model = pickle_artifacts['model']
+  preprocessing = {
+    'features_columns': scoring.features_columns,
+    'classes': model.classes_.tolist(),
+    'ordinalencoder': export_ordinalencoder(pickle_artifacts['ordinalencoder']),
+    'minmaxscaler': export_minmaxscaler(pickle_artifacts['minmaxscaler']),
+    'imputer': export_imputer(pickle_artifacts['imputer']) if pickle_artifacts['imputer'] is not None else None
+  }
+  # Write to a temporary directory, moved in place only if the parity check passes
+  tmp_dir = tempfile.mkdtemp(dir=pickle_dir, prefix='.bundle-')
+  try:
+    model.booster_.save_model(os.path.join(tmp_dir, MODEL_FILE))
+    with open(os.path.join(tmp_dir, PREPROCESSING_FILE), 'w') as f:
+      json.dump(preprocessing, f, indent=1)
+    manifest = {
+      'format_version': FORMAT_VERSION,
+      'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+      'files': {name: file_hash(os.path.join(tmp_dir, name)) for name in (MODEL_FILE, PREPROCESSING_FILE)}
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+      json.dump(manifest, f, indent=2)
+    parity = check_parity(pickle_artifacts, load_bundle(tmp_dir), n_parity_rows)
+    if parity['label_mismatches'] or parity['max_abs_probability_diff'] > tolerance:
+      raise ValueError(f"Bundle predictions differ from the pickles: {parity}")
+    manifest['parity'] = parity
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+      json.dump(manifest, f, indent=2)
+    out_dir = os.path.join(pickle_dir, BUNDLE_DIR)
+    if os.path.exists(out_dir):
+      shutil.rmtree(out_dir)
+    os.replace(tmp_dir, out_dir)
+  except Exception:
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    raise
+  return out_dir, manifest
+
+def main():
+  parser = argparse.ArgumentParser(description="Export the pickles to a pickle-free bundle")
+  parser.add_argument('--pickle-dir', default=scoring.PICKLE_DIR)
+  parser.add_argument('--parity-rows', type=int, default=5000, help="Synthetic rows compared with the pickles")
+  args = parser.parse_args()
+  try:
+    out_dir, manifest = export_bundle(args.pickle_dir, args.parity_rows)
+  except ValueError as e:
+    sys.exit(str(e))
+  sizes = {name: os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir)}
+  print(f"Wrote {out_dir}: {sizes}")
+  print(f"Parity: {manifest['parity']}")
+
+if __name__ == "__main__":
+  main()
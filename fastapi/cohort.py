@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Func: Course cohort selection
+## Sub-Func: Cheapest candidates of every (education level, company type) cell
+def reduce_candidates(probabilities, cells, seats):
+  """
+  At most `seats` employees of a cell can be selected and employees of the same cell are bound by
+  the same constraints, so only the `seats` lowest probabilities of each cell can be in an optimal cohort.
+  """
+  order = np.lexsort((probabilities, cells))
+  sorted_cells = cells[order]
+  starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+  rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+  return np.sort(order[rank < seats])
+
+## Sub-Func: Exact solution of the linear program
+def solve_lp(probabilities, company_types, education_levels, seats, max_per_company_type, min_per_education_level):
+  """
+  Minimize the expected number of leavers. The constraint rows (seat total and company type caps
+  on one side, education minimums on the other) are two laminar families, so the constraint matrix
+  is totally unimodular and the simplex vertex solution is integral.
+  """
+  from scipy.optimize import linprog
+  from scipy.sparse import csr_matrix
+
+  rows, bounds = [], []
+  for company_type, cap in max_per_company_type.items():
+    rows.append((company_types == company_type).astype(float))
+    bounds.append(cap)
+  for education_level, minimum in min_per_education_level.items():
+    rows.append(-(education_levels == education_level).astype(float))
+    bounds.append(-minimum)
+  result = linprog(
+    probabilities,
+    A_ub=csr_matrix(np.vstack(rows)) if rows else None,
+    b_ub=np.array(bounds, dtype=float) if rows else None,
+    A_eq=np.ones((1, len(probabilities))),
+    b_eq=[seats],
+    bounds=(0, 1),
+    method='highs'
+  )
+  if result.status == 2:
+    raise ValueError("No cohort satisfies the constraints")
+  if result.status != 0:
+    raise ValueError(f"The solver failed: {result.message}")
+  # Vertex solutions are 0/1, keep the largest values in case of rounding noise
+  return np.sort(np.argsort(-result.x, kind='stable')[:seats])
+
+## Main-Func: Select the cohort
+def select_cohort(probabilities, company_types, education_levels, seats, max_per_company_type=None,
+                  min_per_education_level=None, max_expected_attrition=None):
+  """
+  Choose `seats` employees with the lowest expected attrition (mean probability of leaving) such that
+  no company type has more than its cap and every education level has at least its minimum.
+  max_expected_attrition (%) is the guarantee target: the cohort is optimal, so if it misses the
+  target no cohort meets it, and meets_attrition_target is False.
+  """
+  probabilities = np.asarray(probabilities, dtype=float)
+  company_types = pd.Series(company_types, dtype=object).fillna('missing').to_numpy()
+  education_levels = pd.Series(education_levels, dtype=object).fillna('missing').to_numpy()
+  max_per_company_type = max_per_company_type or {}
+  min_per_education_level = min_per_education_level or {}
+  n = len(probabilities)
+  if seats < 1 or seats > n:
+    raise ValueError(f"seats must be between 1 and the number of candidates ({n})")
+  if sum(min_per_education_level.values()) > seats:
+    raise ValueError("The education level minimums need more seats than available")
+  for education_level, minimum in min_per_education_level.items():
+    if (education_levels == education_level).sum() < minimum:
+      raise ValueError(f"Not enough candidates with education level {education_level}")
+
+  if not max_per_company_type and not min_per_education_level:
+    solver = 'partition'
+    selected = np.sort(np.argpartition(probabilities, seats - 1)[:seats])
+  else:
+    solver = 'lp'
+    education_codes, _ = pd.factorize(education_levels)
+    company_codes, company_uniques = pd.factorize(company_types)
+    cells = education_codes * len(company_uniques) + company_codes
+    candidates = reduce_candidates(probabilities, cells, seats)
+    chosen = solve_lp(probabilities[candidates], company_types[candidates], education_levels[candidates], seats,
+                      max_per_company_type, min_per_education_level)
+    selected = candidates[chosen]
+
+  selected = selected[np.argsort(probabilities[selected], kind='stable')]
+  expected_attrition = float(probabilities[selected].mean() * 100)
+  return {
+    'indices': selected,
+    'expected_attrition': expected_attrition,
+    'expected_leavers': float(probabilities[selected].sum()),
+    'meets_attrition_target': None if max_expected_attrition is None else expected_attrition <= max_expected_attrition,
+    'company_type_counts': pd.Series(company_types[selected]).value_counts().to_dict(),
+    'education_level_counts': pd.Series(education_levels[selected]).value_counts().to_dict(),
+    'solver': solver,
+    'candidates': n
+  }
@@ -0,0 +1,69 @@
+import os
+import pandas as pd
+import scoring
+
+# Config
+BEAM_WIDTH = int(os.getenv('COUNTERFACTUAL_BEAM', '64')) # states per employee expanded to the next edit count
+
+# Func: Counterfactual search
+## Sub-Func: Score many edited copies of employees in one batch
+def score_rows(rows, artifacts):
+  features = scoring.preprocess_frame(pd.DataFrame(rows), artifacts)
+  return scoring.predict_frame(features, artifacts)[1]
+
+## Main-Func: Fewest edits that bring the probability of leaving below target
+def search(df, artifacts, domains, target=0.5, max_edits=3, max_results=3, beam=BEAM_WIDTH):
+  """
+  Best-first search over edits of the changeable fields ({field: allowed values} in domains),
+  one more edited field per round. Every candidate of every employee in a round is scored in one
+  batch; candidates below target end the search of their employee at that number of edits, and only
+  the `beam` lowest probability candidates still above it are expanded. Return one dict per row of df
+  with its probability, the number of edits needed (None if not found), the solutions of that size
+  (lowest probability first), and the number of candidates evaluated.
+  """
+  fields = list(domains)
+  records = df.astype(object).where(df.notna(), None).to_dict('records')
+  probabilities = score_rows(records, artifacts) if records else []
+  results = [
+    {'probability': float(probability), 'edits_needed': 0 if probability < target else None, 'edits': [], 'evaluated': 0}
+    for probability in probabilities
+  ]
+  # Per employee, states still above target: (positions of the edited fields in increasing order, {field: value})
+  frontier = {i: [((), {})] for i, probability in enumerate(probabilities) if probability >= target}
+  for n_edits in range(1, min(max_edits, len(fields)) + 1):
+    owners, rows = [], []
+    for i, states in frontier.items():
+      for edited, change in states:
+        # Only fields after the last edited one, so every set of edits is generated once
+        for j in range(edited[-1] + 1 if edited else 0, len(fields)):
+          field = fields[j]
+          for value in domains[field]:
+            if records[i][field] is not None and value == records[i][field]:
+              continue
+            owners.append((i, edited + (j,), {**change, field: value}))
+            rows.append({**records[i], field: value, **change})
+    if not rows:
+      break
+    candidate_probabilities = score_rows(rows, artifacts)
+    found, expand = {}, {}
+    for (i, edited, change), probability in zip(owners, candidate_probabilities):
+      results[i]['evaluated'] += 1
+      if probability < target:
+        found.setdefault(i, []).append((probability, change))
+      else:
+        expand.setdefault(i, []).append((probability, edited, change))
+    for i, solutions in found.items():
+      solutions.sort(key=lambda solution: solution[0])
+      results[i]['edits_needed'] = n_edits
+      results[i]['edits'] = [
+        {
+          'changes': {field: {'from': records[i][field], 'to': value} for field, value in change.items()},
+          'probability': float(probability)
+        }
+        for probability, change in solutions[:max_results]
+      ]
+    frontier = {
+      i: [(edited, change) for _, edited, change in sorted(states, key=lambda state: state[0])[:beam]]
+      for i, states in expand.items() if i not in found
+    }
+  return results
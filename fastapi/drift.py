@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from threading import Lock
+import numpy as np
+import metrics
+
+# Config
+REFERENCE_FILE = 'reference.json' # training distributions written by python -m training.train
+BUCKET_SECONDS = float(os.getenv('DRIFT_BUCKET_SECONDS', '60'))
+BUCKETS = int(os.getenv('DRIFT_BUCKETS', '1440')) # 24 hours of 1 minute buckets
+WINDOWS = [300, 3600, 86400] # default windows of GET /drift (seconds)
+EPSILON = 1e-4 # floor of bin proportions, empty bins would make PSI and KL infinite
+## PSI rule of thumb: < 0.1 no drift, 0.1 to 0.25 moderate, > 0.25 major
+PSI_MODERATE = 0.1
+PSI_MAJOR = 0.25
+
+# Class
+## Class: Bin counts of the model features and probabilities in a ring of time buckets
+class DriftMonitor:
+  """
+  Every feature (and the predicted probability) is binned with the fixed edges of its training
+  reference, so memory is BUCKETS x bins whatever the traffic, and an update is one searchsorted
+  per feature plus one bincount.
+  """
+
+  def __init__(self, reference, bucket_seconds=BUCKET_SECONDS, n_buckets=BUCKETS):
+    distributions = {**reference['features'], 'probability': reference['probability']}
+    self.names = list(distributions)
+    self.reference_rows = reference['rows']
+    self.edges = [np.asarray(distribution['edges'], dtype=float) for distribution in distributions.values()]
+    self.expected = [proportions(distribution['counts']) for distribution in distributions.values()]
+    sizes = [len(edges) + 1 for edges in self.edges]
+    self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+    self.total_bins = int(sum(sizes))
+    self.bucket_seconds = bucket_seconds
+    self.counts = np.zeros((n_buckets, self.total_bins), dtype=np.int64)
+    self.bucket_ids = np.full(n_buckets, -1, dtype=np.int64) # absolute bucket number held by each slot
+    self._lock = Lock()
+
+  def update(self, features, probabilities, now=None):
+    X = np.column_stack([np.asarray(features, dtype=float), np.asarray(probabilities, dtype=float)])
+    bins = np.empty(X.shape, dtype=np.intp)
+    for j, edges in enumerate(self.edges):
+      bins[:, j] = np.searchsorted(edges, X[:, j], side='right')
+    counts = np.bincount((bins + self.offsets).ravel(), minlength=self.total_bins)
+    bucket = int((time.time() if now is None else now) // self.bucket_seconds)
+    slot = bucket % len(self.bucket_ids)
+    with self._lock:
+      if self.bucket_ids[slot] != bucket:
+        self.counts[slot] = 0
+        self.bucket_ids[slot] = bucket
+      self.counts[slot] += counts
+
+  def window_counts(self, seconds, now=None):
+    """Summed bin counts of the buckets of the last `seconds`"""
+    bucket = int((time.time() if now is None else now) // self.bucket_seconds)
+    first = bucket - max(int(np.ceil(seconds / self.bucket_seconds)), 1) + 1
+    with self._lock:
+      live = (self.bucket_ids >= first) & (self.bucket_ids <= bucket)
+      return self.counts[live].sum(axis=0)
+
+  def report(self, windows=WINDOWS, now=None):
+    reports = []
+    for seconds in windows:
+      counts = self.window_counts(seconds, now)
+      distributions = {}
+      for name, offset, edges, expected in zip(self.names, self.offsets, self.edges, self.expected):
+        observed = counts[offset:offset + len(edges) + 1]
+        distributions[name] = divergences(observed, expected)
+      rows = int(counts[:len(self.edges[0]) + 1].sum())
+      probability = distributions.pop('probability')
+      reports.append({
+        'seconds': seconds,
+        'rows': rows,
+        'probability': probability,
+        'features': distributions,
+        'drifted_features': sorted(name for name, value in distributions.items() if value['status'] == 'major')
+      })
+    return reports
+
+# Func: Drift statistics
+## Sub-Func: Bin proportions floored at EPSILON
+def proportions(counts):
+  counts = np.asarray(counts, dtype=float)
+  return np.maximum(counts / max(counts.sum(), 1), EPSILON)
+
+## Main-Func: PSI and KL divergence of observed counts from the reference proportions
+def divergences(observed, expected):
+  if observed.sum() == 0:
+    return {'psi': None, 'kl': None, 'status': 'no data'}
+  actual = proportions(observed)
+  log_ratio = np.log(actual / expected)
+  psi = float(((actual - expected) * log_ratio).sum())
+  status = 'major' if psi > PSI_MAJOR else 'moderate' if psi > PSI_MODERATE else 'none'
+  return {'psi': psi, 'kl': float((actual * log_ratio).sum()), 'status': status}
+
+# Func: Registry integration
+## Sub-Func: Load the reference of a model version (registered as a registry warmer)
+def warm(model):
+  """Create the drift monitor of a model version, if it has a training reference"""
+  path = os.path.join(model.path, REFERENCE_FILE)
+  if not os.path.exists(path):
+    return
+  with open(path) as f:
+    model.cache['drift'] = DriftMonitor(json.load(f))
+
+## Main-Func: Record a scored batch
+def observe(model, features, probabilities):
+  """Add a batch of model features (dataframe) and probabilities to the monitor of its model version"""
+  monitor = model.cache.get('drift')
+  if monitor is None or len(probabilities) == 0:
+    return
+  with metrics.STAGE_SECONDS.time('drift_update'):
+    monitor.update(features[monitor.names[:-1]].to_numpy(dtype=float), probabilities)
@@ -0,0 +1,95 @@
+import math
+import os
+import numpy as np
+import metrics
+
+# Config
+STAGE_TREES = int(os.getenv('EARLY_EXIT_STAGE_TREES', '10')) # trees summed between two exit checks
+TOLERANCE = 1e-9 # margin slack of an early decision, far above the rounding error of the sums
+
+# Class
+## Class: Staged margin evaluation of a binary LightGBM booster
+class EarlyExitModel:
+  """
+  The raw margin of a row is the sum of one leaf value per tree. After every stage, a row whose
+  partial margin plus the largest (smallest) possible contribution of the remaining trees is still
+  below (above) the threshold has its label decided, and only undecided rows go through the next
+  stage. The bounds are the sums of the max (min) leaf value of each remaining tree, so the labels
+  are exactly those of the full model (rows ending within TOLERANCE of the threshold are scored again
+  by the full model, so rounding in the staged sums can't flip them).
+  """
+
+  def __init__(self, booster, classes, stage_trees=STAGE_TREES):
+    dump = booster.dump_model()
+    if not dump['objective'].startswith('binary'):
+      raise ValueError(f"Early exit needs a binary objective, not {dump['objective']}")
+    self.sigmoid = float(dump['objective'].split('sigmoid:')[1].split()[0]) if 'sigmoid:' in dump['objective'] else 1.0
+    self.booster = booster
+    self.classes = np.asarray(classes)
+    leaf_ranges = np.array([leaf_range(tree['tree_structure']) for tree in dump['tree_info']])
+    self.n_trees = len(leaf_ranges)
+    self.boundaries = list(range(0, self.n_trees, stage_trees)) + [self.n_trees]
+    # Bounds of the contribution of the trees after each boundary
+    self.rest_min = np.r_[np.cumsum(leaf_ranges[::-1, 0])[::-1], 0.0][self.boundaries]
+    self.rest_max = np.r_[np.cumsum(leaf_ranges[::-1, 1])[::-1], 0.0][self.boundaries]
+
+  def margin_threshold(self, threshold):
+    """Raw margin above which the probability is above threshold"""
+    return math.log(threshold / (1 - threshold)) / self.sigmoid
+
+  def predict_labels(self, X, threshold=0.5):
+    """
+    Return (labels, trees summed per row, rescored) with labels of probability > threshold, like
+    scoring.predict_frame. rescored marks the rows also scored by the full model (a second pass over
+    every tree, not counted in the trees summed).
+    """
+    X = np.asarray(X, dtype=float)
+    n = len(X)
+    cut = self.margin_threshold(threshold)
+    margins = np.zeros(n)
+    trees = np.zeros(n, dtype=np.int64)
+    positive = np.zeros(n, dtype=bool)
+    rescored = np.zeros(n, dtype=bool)
+    active = np.arange(n)
+    for k in range(len(self.boundaries) - 1):
+      start, end = self.boundaries[k], self.boundaries[k + 1]
+      margins[active] += self.booster.predict(X[active], raw_score=True, start_iteration=start, num_iteration=end - start)
+      trees[active] = end
+      partial = margins[active]
+      surely_positive = partial + self.rest_min[k + 1] > cut + TOLERANCE
+      surely_negative = partial + self.rest_max[k + 1] < cut - TOLERANCE
+      positive[active[surely_positive]] = True
+      active = active[~(surely_positive | surely_negative)]
+      if len(active) == 0:
+        break
+    if len(active):
+      # Every tree summed but within TOLERANCE of the threshold: the probability of the full model decides
+      positive[active] = self.booster.predict(X[active]) > threshold
+      rescored[active] = True
+    return self.classes[positive.astype(int)], trees, rescored
+
+# Func: Early exit inference
+## Sub-Func: Smallest and largest leaf value of a tree of dump_model()
+def leaf_range(node):
+  if 'leaf_value' in node:
+    return node['leaf_value'], node['leaf_value']
+  left, right = leaf_range(node['left_child']), leaf_range(node['right_child'])
+  return min(left[0], right[0]), max(left[1], right[1])
+
+## Sub-Func: Build once per model version (registered as a registry warmer)
+def warm(model):
+  """Precompute the leaf bounds of the booster of a model version"""
+  estimator = model.artifacts['model']
+  booster = getattr(estimator, 'booster', None) or estimator.booster_
+  model.cache['early_exit'] = EarlyExitModel(booster, estimator.classes_)
+
+## Main-Func: Labels of a batch
+def predict_labels(features, model, threshold=0.5):
+  """
+  Return (labels, fraction of the trees summed, number of rows rescored by the full model) of a
+  dataframe of model features. The fraction is at most 1, the rescoring passes are counted apart.
+  """
+  early_exit = model.cache['early_exit']
+  with metrics.STAGE_SECONDS.time('early_exit_inference'):
+    labels, trees, rescored = early_exit.predict_labels(features.to_numpy(dtype=float), threshold)
+  return labels, float(trees.mean() / early_exit.n_trees) if len(trees) else 0.0, int(rescored.sum())
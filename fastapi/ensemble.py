@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import pandas as pd
+import metrics
+import registry
+import scoring
+
+# Config
+ENSEMBLE_FILE = 'ensemble.json' # written by python -m training.train --ensemble
+ENSEMBLE = os.getenv('ENSEMBLE', 'off') # 'on': /predict uses the soft voting ensemble of versions that have one
+BUDGET_MS = float(os.getenv('ENSEMBLE_BUDGET_MS', '100')) # per batch, LightGBM alone when the other members are late
+WORKERS = int(os.getenv('ENSEMBLE_WORKERS', '4'))
+BASE_MEMBER = 'lgbm' # artifacts['model'], scored in the request thread and used as the fallback
+
+## Member threads (LightGBM, XGBoost and CatBoost release the GIL while predicting)
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='ensemble')
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+# Class
+## Class: Members of a version besides LightGBM, and the voting weights
+class Ensemble:
+  def __init__(self, members, weights):
+    self.members = members
+    self.weights = weights
+
+# Func: Members
+## Sub-Func: Load and warm the members of a version (registered as a registry warmer)
+def warm(model):
+  """Load the ensemble members of a model version when ENSEMBLE is on and the version has them"""
+  path = os.path.join(model.path, ENSEMBLE_FILE)
+  if ENSEMBLE != 'on' or not os.path.exists(path):
+    return
+  with open(path) as f:
+    config = json.load(f)
+  members = {
+    name: joblib.load(os.path.join(model.path, file_name))
+    for name, file_name in config['members'].items() if name != BASE_MEMBER
+  }
+  # First predictions are slow, like LightGBM in ModelVersion.warm
+  features = scoring.preprocess_frame(pd.DataFrame(registry.warmup_employees[:1]), model.artifacts)
+  for estimator in members.values():
+    estimator.predict_proba(features)
+  model.cache['ensemble'] = Ensemble(members, config['weights'])
+
+## Sub-Func: Probabilities of one member, timed (late members are timed too)
+def member_probabilities(name, estimator, features):
+  with metrics.ENSEMBLE_MEMBER_SECONDS.time(name):
+    return estimator.predict_proba(features)[:, 1]
+
+## Sub-Func: Give back the thread of a finished (or cancelled) member
+def release(future):
+  global _in_flight
+  with _in_flight_lock:
+    _in_flight -= 1
+
+## Sub-Func: Reserve threads for the members of a batch, unless late members of earlier batches still hold them
+def reserve(n_members):
+  global _in_flight
+  with _in_flight_lock:
+    if _in_flight + n_members > WORKERS:
+      return False
+    _in_flight += n_members
+    return True
+
+## Main-Func: Predict with the ensemble within the latency budget
+async def predict_frame(features, model, budget_ms=BUDGET_MS):
+  """
+  Return (predictions, probabilities, scored_by, lightgbm_probabilities). The other members run in the
+  member threads while LightGBM runs in the calling thread; the probabilities are their weighted mean
+  if every member finishes within budget_ms, else LightGBM's alone (scored_by 'lightgbm'). The wait
+  for the members is awaited, so the event loop keeps serving other requests meanwhile.
+  """
+  ensemble = model.cache.get('ensemble')
+  if ensemble is None:
+    predictions, probabilities = scoring.predict_frame(features, model.artifacts)
+    return predictions, probabilities, 'lightgbm', probabilities
+  start = time.perf_counter()
+  futures = {}
+  if reserve(len(ensemble.members)):
+    for name, estimator in ensemble.members.items():
+      futures[name] = _executor.submit(member_probabilities, name, estimator, features)
+      futures[name].add_done_callback(release)
+  with metrics.ENSEMBLE_MEMBER_SECONDS.time(BASE_MEMBER):
+    predictions, probabilities = scoring.predict_frame(features, model.artifacts)
+
+  if not futures:
+    reason = 'busy'
+  else:
+    waiting = [asyncio.wrap_future(future) for future in futures.values()]
+    for future in waiting:
+      # Late members finish in the background, their errors are counted by the next check, not logged
+      future.add_done_callback(lambda future: future.cancelled() or future.exception())
+    _, late = await asyncio.wait(waiting, timeout=max(budget_ms / 1000 - (time.perf_counter() - start), 0))
+    reason = 'budget' if late else 'error' if any(future.exception() for future in futures.values()) else None
+  if reason is not None:
+    metrics.ENSEMBLE_FALLBACKS.inc(reason)
+    metrics.ENSEMBLE_BATCHES.inc('lightgbm')
+    return predictions, probabilities, 'lightgbm', probabilities
+
+  # Soft voting, like VotingClassifier(voting='soft')
+  total = probabilities * ensemble.weights[BASE_MEMBER]
+  for name, future in futures.items():
+    total = total + future.result() * ensemble.weights[name]
+  voted = total / sum(ensemble.weights.values())
+  predictions = model.artifacts['model'].classes_[(voted > 0.5).astype(int)]
+  metrics.ENSEMBLE_BATCHES.inc('ensemble')
+  return predictions, voted, 'ensemble', probabilities
@@ -0,0 +1,109 @@
+import os
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+import metrics
+import scoring
+
+# Config
+SHAP_CACHE_SIZE = int(os.getenv('SHAP_CACHE_SIZE', '100000')) # rows of contributions kept per model version
+
+## Model features of each EmployeeData field (one hot columns are summed into their field)
+field_columns = {
+  **{column: [column] for column in scoring.numerical_columns + scoring.oe_columns},
+  **scoring.ohe_feature_columns
+}
+
+# Class
+## Class: LRU of contributions keyed by the bytes of the encoded feature vector
+class ContributionCache:
+  def __init__(self, maxsize=SHAP_CACHE_SIZE):
+    self.maxsize = maxsize
+    self._values = OrderedDict()
+    self._lock = Lock()
+
+  def get_many(self, keys):
+    with self._lock:
+      values = []
+      for key in keys:
+        value = self._values.get(key)
+        if value is not None:
+          self._values.move_to_end(key)
+        values.append(value)
+      return values
+
+  def put_many(self, keys, values):
+    with self._lock:
+      for key, value in zip(keys, values):
+        self._values[key] = value
+        self._values.move_to_end(key)
+      while len(self._values) > self.maxsize:
+        self._values.popitem(last=False)
+
+  def __len__(self):
+    return len(self._values)
+
+# Func: Explainer
+## Sub-Func: Build once per model version (registered as a registry warmer)
+def warm(model):
+  """Build the TreeExplainer of a model version and its contribution cache"""
+  import shap
+
+  estimator = model.artifacts['model']
+  booster = getattr(estimator, 'booster', None) or estimator.booster_
+  explainer = shap.TreeExplainer(booster)
+  model.cache['explainer'] = explainer
+  model.cache['base_value'] = float(np.ravel(explainer.expected_value)[-1])
+  model.cache['contributions'] = ContributionCache()
+
+## Sub-Func: SHAP values of the positive class as a 2-D array
+def shap_values(explainer, X):
+  values = explainer.shap_values(X)
+  if isinstance(values, list):
+    values = values[-1]
+  values = np.asarray(values)
+  if values.ndim == 3:
+    values = values[:, :, -1]
+  return values
+
+## Main-Func: Contributions of a batch, computing only rows not seen before
+def explain_features(features, model):
+  """
+  Return (contributions, base_value): TreeSHAP values in log-odds, one row per input row,
+  summing with base_value to the raw score of the model
+  """
+  X = np.ascontiguousarray(features, dtype=float)
+  cache = model.cache['contributions']
+  keys = [row.tobytes() for row in X]
+  rows = cache.get_many(keys)
+  # Unique feature vectors of the batch that are not cached yet
+  missing = OrderedDict()
+  for i, (key, row) in enumerate(zip(keys, rows)):
+    if row is None:
+      missing.setdefault(key, i)
+  metrics.SHAP_ROWS.inc('cached', amount=len(keys) - sum(row is None for row in rows))
+  if missing:
+    metrics.SHAP_ROWS.inc('computed', amount=len(missing))
+    with metrics.STAGE_SECONDS.time('shap'):
+      values = shap_values(model.cache['explainer'], X[list(missing.values())])
+    values = [row.copy() for row in values]
+    computed = dict(zip(missing, values))
+    cache.put_many(missing.keys(), values)
+    rows = [computed[key] if row is None else row for key, row in zip(keys, rows)]
+  contributions = np.vstack(rows) if rows else np.empty((0, X.shape[1]))
+  return contributions, model.cache['base_value']
+
+## Sub-Func: Response records
+def to_records(full_names, predictions, probabilities, contributions):
+  index = {column: i for i, column in enumerate(scoring.features_columns)}
+  field_index = {field: [index[column] for column in columns] for field, columns in field_columns.items()}
+  records = []
+  for name, prediction, probability, row in zip(full_names, predictions, probabilities, contributions):
+    records.append({
+      'full_name': name,
+      'prediction': int(prediction),
+      'probability': float(probability),
+      'contributions': {column: float(row[i]) for column, i in index.items()},
+      'field_contributions': {field: float(row[idx].sum()) for field, idx in field_index.items()}
+    })
+  return records
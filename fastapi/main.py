@@ -1,10 +1,10 @@
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.responses import StreamingResponse, HTMLResponse
+from fastapi import FastAPI, HTTPException, Depends, Query, Header
+from fastapi.responses import StreamingResponse, HTMLResponse, PlainTextResponse, FileResponse
 from pyngrok import ngrok
 import uvicorn
 from pydantic import BaseModel, Field
 from enum import Enum
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import pandas as pd
 import joblib
 from sklearn.preprocessing import OrdinalEncoder, MinMaxScaler
@@ -17,18 +17,30 @@ from langchain_ollama import OllamaLLM
 from langchain_experimental.agents import create_pandas_dataframe_agent
 from dotenv import load_dotenv
 import os
+import secrets
+import time
 from datetime import datetime
 from functools import lru_cache
+import admission
+import cohort
+import counterfactual
+import drift
+import early_exit
+import ensemble
+import explain
+import metrics
+import population
+import profiler
+from profiler import run_in_threadpool
+import registry
+import result_store
+import scoring
+import sensitivity
+import simulation
 
 # Load environment variables
 load_dotenv()
-ngrok_auth_token = os.getenv('NGROK_AUTH_TOKEN')
-if not ngrok_auth_token:
-  raise Exception("NGROK_AUTH_TOKEN not found in environment variables")
-
-  
-# Expose the FastAPI app with ngrok
-ngrok.set_auth_token(ngrok_auth_token)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN') # X-Admin-Token of the admin endpoints, which are disabled when unset
 
 # Create FastAPI app
 app = FastAPI(
@@ -38,15 +50,32 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc"
 )
+app.add_middleware(profiler.ProfilerMiddleware)
+# Concurrency limits per endpoint class (inside the metrics middleware, so shed requests are counted)
+app.add_middleware(admission.AdmissionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
 
-# Load pickle
+# Load pickle (active model version, new versions are loaded and warmed in the background)
 try:
-    ordinalencoder = joblib.load(os.path.join('pickle', 'ordinalencoder.pkl'))
-    minmaxscaler = joblib.load(os.path.join('pickle', 'minmaxscaler.pkl'))
-    model = joblib.load(os.path.join('pickle', 'lclgbm.pkl'))
+    # Warmers are registered before start, so every loaded version (including those found by the poll thread) has their caches
+    model_registry = registry.ModelRegistry(warmers=[
+      explain.warm, # SHAP explainer of every version, built when the version is loaded
+      simulation.warm, # Scored holdout pool of every version for the guarantee simulation
+      drift.warm, # Training reference distributions of every version for the drift monitor
+      ensemble.warm, # Voting ensemble members of every version (ENSEMBLE=on)
+      early_exit.warm # Leaf bounds of every version for early exit label predictions
+    ])
+    model_registry.start()
 except Exception as e:
   raise Exception("Error loading pickle")
 
+# Create result store (result sets older than RESULTS_TTL_DAYS are purged now and every RESULTS_PURGE_SECONDS)
+result_store.init_db()
+result_store.start_purge()
+
+# Load population cube (python -m training.cube)
+population_cube = population.load_cube()
+
 # Class
 ## Class: categorical columns
 class gender_cat(str, Enum):
@@ -124,19 +153,19 @@ class last_new_job_cat(str, Enum):
   four = '4'
   more_four = '>4'
 
-## Class: Combine into one input
+## Class: Combine into one input (missing fields are imputed with MICE)
 class EmployeeData(BaseModel):
   full_name: str = Field(..., max_length = 200)
-  city_development_index: float = Field(..., ge = 0, le = 1)
-  gender: gender_cat
-  relevant_experience: bool = Field(...)
-  enrolled_university: enrolled_university_cat
-  education_level: education_level_cat
-  major_discipline: major_discipline_cat
-  experience: experience_cat
-  company_size: company_size_cat
-  company_type: company_type_cat
-  last_new_job: last_new_job_cat
+  city_development_index: Optional[float] = Field(None, ge = 0, le = 1)
+  gender: Optional[gender_cat] = None
+  relevant_experience: Optional[bool] = None
+  enrolled_university: Optional[enrolled_university_cat] = None
+  education_level: Optional[education_level_cat] = None
+  major_discipline: Optional[major_discipline_cat] = None
+  experience: Optional[experience_cat] = None
+  company_size: Optional[company_size_cat] = None
+  company_type: Optional[company_type_cat] = None
+  last_new_job: Optional[last_new_job_cat] = None
 
   class Config:
     json_schema_extra = {
@@ -159,16 +188,107 @@ class EmployeeData(BaseModel):
 class MassInputData(BaseModel):
   employees: List[EmployeeData] = Field(..., max_items = 50)
 
+## Class: Counterfactual search
+class changeable_field_cat(str, Enum):
+  enrolled_university = 'enrolled_university'
+  education_level = 'education_level'
+  relevant_experience = 'relevant_experience'
+  major_discipline = 'major_discipline'
+
+changeable_field_values = {
+  'enrolled_university': [cat.value for cat in enrolled_university_cat],
+  'education_level': [cat.value for cat in education_level_cat],
+  'relevant_experience': [False, True],
+  'major_discipline': [cat.value for cat in major_discipline_cat]
+}
+
+class CounterfactualRequest(BaseModel):
+  employees: List[EmployeeData] = Field(..., max_items = 50)
+  target: float = Field(0.5, gt = 0, lt = 1) # probability of leaving to get below
+  fields: List[changeable_field_cat] = [
+    changeable_field_cat.enrolled_university, changeable_field_cat.education_level, changeable_field_cat.relevant_experience
+  ]
+  max_edits: int = Field(3, ge = 1, le = 4)
+  max_results: int = Field(3, ge = 1, le = 20) # solutions returned per employee
+
+## Class: Partial dependence and ICE sweep
+class sensitivity_field_cat(str, Enum):
+  city_development_index = 'city_development_index'
+  gender = 'gender'
+  relevant_experience = 'relevant_experience'
+  enrolled_university = 'enrolled_university'
+  education_level = 'education_level'
+  major_discipline = 'major_discipline'
+  experience = 'experience'
+  company_size = 'company_size'
+  company_type = 'company_type'
+  last_new_job = 'last_new_job'
+
+class SensitivityRequest(BaseModel):
+  field: sensitivity_field_cat
+  employees: Optional[List[EmployeeData]] = Field(None, max_items = 50) # roster, or result_id, else the holdout pool
+  result_id: Optional[str] = None
+  ice_rows: int = Field(50, ge = 0, le = 1000) # ICE curves returned (the partial dependence uses every row)
+
 ## Class: Preprocessed Data
 class PreprocessedData(BaseModel):
   original_data: List[Dict[str,Any]]
   preprocessed_features: List[Dict[str,float]]
   features_columns: List[str]
+  model_version: Optional[str] = None # version whose encoder and scaler made the features
 
 ## Class: Input to LLM AI
 class AIRequest(BaseModel):
   question: str
-  df_dict: dict
+  result_id: Optional[str] = None # ID returned by /predict
+  df_dict: Optional[dict] = None # deprecated, use result_id
+
+## Class: Model version to promote
+class PromoteRequest(BaseModel):
+  version: str
+
+## Class: Guarantee program simulation
+class simulation_mode_cat(str, Enum):
+  random = 'random'
+  stratified = 'stratified'
+
+class GuaranteeSimulation(BaseModel):
+  cohort_size: int = Field(30, ge = 1, le = 5000)
+  n_cohorts: int = Field(10000, ge = 1, le = simulation.MAX_COHORTS)
+  mode: simulation_mode_cat = simulation_mode_cat.random
+  threshold: float = Field(15, ge = 0, le = 100) # attrition rate (%) at which the guarantee fails
+  stay_share: float = Field(0.75, gt = 0, lt = 1) # share of staying employees in stratified cohorts
+  decision_threshold: float = Field(0.5, gt = 0, lt = 1) # probability above which an employee is predicted to leave
+  seed: Optional[int] = None
+
+## Class: Course cohort selection
+class CohortCandidate(BaseModel):
+  full_name: str = Field(..., max_length = 200)
+  probability: float = Field(..., ge = 0, le = 1)
+  company_type: Optional[company_type_cat] = None
+  education_level: Optional[education_level_cat] = None
+
+class CohortSelection(BaseModel):
+  result_id: Optional[str] = None # stored results of /predict, or candidates
+  candidates: Optional[List[CohortCandidate]] = None
+  seats: int = Field(..., ge = 1)
+  max_per_company_type: Dict[company_type_cat, int] = {}
+  min_per_education_level: Dict[education_level_cat, int] = {}
+  max_expected_attrition: Optional[float] = Field(None, ge = 0, le = 100) # e.g. 15 (%) like the guarantee program
+
+## Class: Population cube query
+class PopulationQuery(BaseModel):
+  group_by: List[str] = [] # e.g. ["education_level"]
+  filters: Dict[str, List[str]] = {} # e.g. {"company_type": ["Pvt Ltd"]}
+
+## Class: Observed outcomes of stored results
+class FeedbackOutcome(BaseModel):
+  row_index: int = Field(..., ge = 0) # row of the result set, as returned by /results/{result_id}
+  left: bool # the employee changed jobs after the course
+
+class FeedbackRequest(BaseModel):
+  result_id: str
+  outcomes: List[FeedbackOutcome] = Field(..., min_length = 1)
 
 ## Class: Success Response from LLM AI
 class SuccesResponse(BaseModel):
@@ -181,51 +301,6 @@ class ErrorResponse(BaseModel):
   status: str = "error"
   message: str
 
-# Map and Column
-## gender
-gender_map = {
-    "Female": [1, 0],
-    "Male": [0, 1],
-    "Other": [0, 0]
-    }
-gender_columns = [
-    "gender_Female",
-    "gender_Male"
-    ]
-## major_discipline
-major_discipline_map = {
-    "Arts": [1, 0, 0, 0, 0],
-    "Business Degree": [0, 1, 0, 0, 0],
-    "Humanities": [0, 0, 1, 0, 0],
-    "No Major": [0, 0, 0, 1, 0],
-    "STEM": [0, 0, 0, 0, 1],
-    "Other": [0, 0, 0, 0, 0]
-  }
-major_discipline_columns = [
-    "major_discipline_Arts",
-    "major_discipline_Business Degree",
-    "major_discipline_Humanities",
-    "major_discipline_No Major",
-    "major_discipline_STEM"
-  ]
-## company_type
-company_type_map = {
-    "Early Startup": [1, 0, 0, 0, 0],
-    "Funded Startup": [0, 1, 0, 0, 0],
-    "NGO": [0, 0, 1, 0, 0],
-    "Public Sector": [0, 0, 0, 1, 0],
-    "Pvt Ltd": [0, 0, 0, 0, 1],
-    "Other": [0, 0, 0, 0, 0]
-  }
-company_type_columns = [
-    "company_type_Early Startup",
-    "company_type_Funded Startup",
-    "company_type_NGO",
-    "company_type_Public Sector",
-    "company_type_Pvt Ltd"
-  ]
-
-
 # Func: Create Excel Template
 ## Sub-Func: Create Header
 def header_name(ws,header_list,comment_list,width_list):
@@ -293,6 +368,8 @@ def data_validation(ws,type,formula1,area):
   dv.add(area)
 
 ## Main-Func: Excel
+TEMPLATE_ROWS = 10000 # employee rows with dropdowns and validation (mass input is sent in chunks, so not limited to 50)
+
 def generate_excel_template():
   # initiate excel
   wb = Workbook()
@@ -317,29 +394,30 @@ def generate_excel_template():
   width_list = [25] * 11
   # initiate headers
   header_name(ws,header_list,comment_list,width_list)
-  # add data validation to each columns
+  # add data validation to each columns (rows 2 to TEMPLATE_ROWS + 1)
+  last_row = TEMPLATE_ROWS + 1
   # a. fullname
-  data_validation(ws,"textLength",200,'A2:A51')
+  data_validation(ws,"textLength",200,f'A2:A{last_row}')
   # b. gender
-  data_validation(ws,"list",'"Male,Female,Other"','B2:B51')
+  data_validation(ws,"list",'"Male,Female,Other"',f'B2:B{last_row}')
   # c. enrolled_university
-  data_validation(ws,"list",'"No Enroll,Part Time,Full Time"','C2:C51')
+  data_validation(ws,"list",'"No Enroll,Part Time,Full Time"',f'C2:C{last_row}')
   # d. experience
-  data_validation(ws,"whole",0,'D2:D51')
+  data_validation(ws,"whole",0,f'D2:D{last_row}')
   # e. relevant_experience
-  data_validation(ws,"list",'"Yes,No"','E2:E51')
+  data_validation(ws,"list",'"Yes,No"',f'E2:E{last_row}')
   # f. last_new_job
-  data_validation(ws,"list",'"Never,1,2,3,4,More than 4"','F2:F51')
+  data_validation(ws,"list",'"Never,1,2,3,4,More than 4"',f'F2:F{last_row}')
   # g. education_level
-  data_validation(ws,"list",'"Primary School,High School,Graduate,Masters,Phd"','G2:G51')
+  data_validation(ws,"list",'"Primary School,High School,Graduate,Masters,Phd"',f'G2:G{last_row}')
   # h. major_discipline
-  data_validation(ws,"list",'"STEM,Humanities,Business Degree,Arts,No Major,Other"','H2:H51')
+  data_validation(ws,"list",'"STEM,Humanities,Business Degree,Arts,No Major,Other"',f'H2:H{last_row}')
   # i. city_development_index
-  data_validation(ws,"decimal",0,'I2:I51')
+  data_validation(ws,"decimal",0,f'I2:I{last_row}')
   # j. company_size
-  data_validation(ws,"list",'"Less than 10,10 to 49,50 to 99,100 to 499,500 to 999,1000 to 4999,5000 to 9999,More than 9999"','J2:J51')
+  data_validation(ws,"list",'"Less than 10,10 to 49,50 to 99,100 to 499,500 to 999,1000 to 4999,5000 to 9999,More than 9999"',f'J2:J{last_row}')
   # k. company_type
-  data_validation(ws,"list",'"Pvt Ltd,Public Sector,Funded Startup,Early Startup,NGO,Other"','K2:K51')
+  data_validation(ws,"list",'"Pvt Ltd,Public Sector,Funded Startup,Early Startup,NGO,Other"',f'K2:K{last_row}')
   # Save the workbook to an in-memory file
   file_stream = BytesIO()
   wb.save(file_stream)
@@ -381,7 +459,37 @@ def get_prefix():
   When you give 'Final Answer:', never give suggestion about python and about code in 'Action Input:' and only give data reasoning analysis and give next step reccomendation for company
   """
 
-## Main-Func: LLM AI Agent
+## Sub-Func: Make dataframe from stored results
+company_size_label_map = {
+    "<10": "Less than 10",
+    "10-49": "10 to 49",
+    "50-99": "50 to 99",
+    "100-500": "100 to 499",
+    "500-999": "500 to 999",
+    "1000-4999": "1000 to 4999",
+    "5000-9999": "5000 to 9999",
+    "10000+": "More than 9999"
+  }
+
+def results_to_ai_dataframe(df):
+  """Convert stored results into the dataframe described in get_prefix()"""
+  return pd.DataFrame({
+    "Full Name": df['full_name'],
+    "Gender": df['gender'],
+    "Enrolled University": df['enrolled_university'],
+    "Work Experience": df['experience'].map(lambda x: 0 if x == '<1' else 21 if x == '>20' else int(x), na_action='ignore'),
+    "Data Science Experience": df['relevant_experience'].map(lambda x: "Yes" if x else "No", na_action='ignore'),
+    "Duration of Last New Job": df['last_new_job'].map(lambda x: 0 if x == 'never' else 5 if x == '>4' else int(x), na_action='ignore'),
+    "Education Level": df['education_level'],
+    "Major Discipline": df['major_discipline'],
+    "City Development Index": df['city_development_index'],
+    "Company Size": df['company_size'].map(company_size_label_map),
+    "Company Type": df['company_type'],
+    "Probability of Leaving": (df['probability'] * 100).round(2),
+    "Prediction": df['prediction'].map(lambda x: "Leave" if x == 1 else "Stay")
+  })
+
+## Sub-Func: LLM AI Agent
 def create_agent(df, model_name="qwen2.5", temp=0, max_execution_time=60):
   llm = OllamaLLM(model=model_name, temperature=temp)
   agent = create_pandas_dataframe_agent(
@@ -395,15 +503,94 @@ def create_agent(df, model_name="qwen2.5", temp=0, max_execution_time=60):
   )
   return agent
 
+## Main-Func: Ask one model (timed per attempt)
+AGENT_STOPPED = 'Agent stopped due to iteration limit or time limit.'
+
+def ask_agent(df, question, model_name="qwen2.5"):
+  start = time.perf_counter()
+  outcome = 'error'
+  try:
+    result = create_agent(df, model_name=model_name).invoke(question)
+    outcome = 'timeout' if result['output'] == AGENT_STOPPED else 'answer'
+    return result
+  finally:
+    metrics.LLM_ATTEMPT_SECONDS.observe(time.perf_counter() - start, model_name, outcome)
+
+# Func: Admin endpoints
+## Main-Func: Check the admin token (behind ngrok every client looks local, so a localhost check is not enough)
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+  if not ADMIN_TOKEN:
+    raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+  if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+    raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token header")
+
 @app.get("/")
 async def read_root():
     """Check if API is running and pickle files are loaded"""
+    artifacts = model_registry.active.artifacts
     return {
       "status": "API running",
       "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-      "pickle_files": all([ordinalencoder, minmaxscaler, model])
+      "pickle_files": all([artifacts['ordinalencoder'], artifacts['minmaxscaler'], artifacts['model']]),
+      "imputer": artifacts['imputer'] is not None,
+      "model_version": model_registry.active.version
       }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms and counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiles")
+async def get_profiles(limit: int = 50):
+    """List recent request profiles (send the header X-Profile: 1 or set PROFILE_SAMPLE_RATE to record them)"""
+    return {"profiles": profiler.list_profiles(limit=limit)}
+
+@app.get("/profiles/{request_id}/{kind}")
+async def get_profile(request_id: str, kind: str):
+    """Download a profile: kind is speedscope (open in speedscope.app) or cprofile (open with pstats or snakeviz)"""
+    if not profiler.request_id_pattern.match(request_id) or kind not in ('speedscope', 'cprofile'):
+      raise HTTPException(status_code=404, detail="Profile not found")
+    path = profiler.profile_paths(request_id)[kind]
+    if not os.path.exists(path):
+      raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=os.path.basename(path))
+
+@app.get("/models")
+async def get_models():
+    """List model versions, the active and candidate versions, and shadow scoring statistics"""
+    return model_registry.describe()
+
+@app.get("/drift")
+async def get_drift(window: List[int] = Query(default=drift.WINDOWS), version: Optional[str] = None):
+    """PSI and KL divergence of recent model features and probabilities from the training distributions"""
+    model = model_registry.get(version) if version else model_registry.active
+    if model is None:
+      raise HTTPException(status_code=404, detail="Model version not loaded")
+    monitor = model.cache.get('drift')
+    if monitor is None:
+      raise HTTPException(status_code=404, detail="No training reference for this model version, train it with python -m training.train")
+    retention = monitor.bucket_seconds * len(monitor.bucket_ids)
+    if any(seconds <= 0 or seconds > retention for seconds in window):
+      raise HTTPException(status_code=422, detail=f"Windows must be between 1 and {retention:.0f} seconds")
+    return {
+      'model_version': model.version,
+      'reference_rows': monitor.reference_rows,
+      'bucket_seconds': monitor.bucket_seconds,
+      'windows': monitor.report(window)
+    }
+
+@app.post("/models/promote", dependencies=[Depends(require_admin)])
+async def promote_model(request: PromoteRequest):
+    """Load and warm a model version (if needed) and switch to it between requests"""
+    try:
+      model = await run_in_threadpool(model_registry.promote, request.version)
+    except KeyError:
+      raise HTTPException(status_code=404, detail="Model version not found")
+    except Exception as e:
+      raise HTTPException(status_code=500, detail=f"Error loading model version: {str(e)}")
+    return {"status": "success", "active": model.describe()}
+
 @app.get("/create_excel_template")
 async def create_excel_template():
     """Generate and return an Excel template for mass input"""
@@ -422,59 +609,291 @@ async def create_excel_template():
 
 @app.post("/preprocess", response_model=PreprocessedData)
 async def preprocess_data(data: MassInputData):
-  """Preprocess employee(s) data for prediction (encoding and scaling)"""
+  """Preprocess employee(s) data for prediction (encoding, imputation, and scaling)"""
+  metrics.handler_started()
+  metrics.BATCH_SIZE.observe(len(data.employees), 'preprocess')
   try:
     # Convert to dataframe
-    df = pd.DataFrame([item.model_dump() for item in data.employees])
+    df = pd.DataFrame([item.model_dump(mode='json') for item in data.employees])
     # Store original data
-    original_data = df.to_dict('records')
-    # Divide columns
-    oe_columns = ['relevant_experience', 'enrolled_university', 'education_level', 'experience', 'company_size', 'last_new_job']
-    ohe_columns = ['gender','major_discipline','company_type']
-    numerical_columns = ['city_development_index']
-    # Ordinal Encoder oe_columns
-    df[oe_columns] = ordinalencoder.transform(df[oe_columns])
-    # One Hot Encoding ohe_columns
-    gender_values = df['gender'].map(gender_map).tolist()
-    major_discipline_values = df['major_discipline'].map(major_discipline_map).tolist()
-    company_type_values = df['company_type'].map(company_type_map).tolist()
-    gender_df = pd.DataFrame(gender_values, columns=gender_columns)
-    major_discipline_df = pd.DataFrame(major_discipline_values, columns=major_discipline_columns)
-    company_type_df = pd.DataFrame(company_type_values, columns=company_type_columns)
-    df = pd.concat([df, gender_df, major_discipline_df, company_type_df], axis=1)
-    # Drop unwanted columns
-    df = df.drop(columns=ohe_columns)
-    df = df.drop(columns='full_name')
-    # Min Max Scaler
-    df_values = minmaxscaler.transform(df)
-    df = pd.DataFrame(df_values, columns=df.columns)
+    original_data = df.astype(object).where(df.notna(), None).to_dict('records')
+    # Encode, impute missing values, and scale
+    model = model_registry.active
+    df = scoring.preprocess_frame(df, model.artifacts)
     # Store preprocessed features
     preprocessed_features = df.to_dict('records')
     # Store features columns
     features_columns = df.columns.tolist()
+    metrics.handler_finished()
     return PreprocessedData(
         original_data=original_data,
         preprocessed_features=preprocessed_features,
-        features_columns=features_columns
+        features_columns=features_columns,
+        model_version=model.version
         )
+  except ValueError as e:
+    raise HTTPException(
+        status_code=422,
+        detail=f"Error in preprocessing: {str(e)}"
+    )
   except Exception as e:
     raise HTTPException(
         status_code=500,
         detail=f"Error in preprocessing: {str(e)}"
     )
 
+@app.post("/explain")
+async def explain_data(data: MassInputData):
+  """Per-feature contributions (TreeSHAP, in log-odds) to the probability of leaving"""
+  metrics.handler_started()
+  try:
+    model = model_registry.active
+    df = pd.DataFrame([item.model_dump(mode='json') for item in data.employees])
+    features = scoring.preprocess_frame(df, model.artifacts)
+    predictions, probabilities = scoring.predict_frame(features, model.artifacts)
+    contributions, base_value = explain.explain_features(features.to_numpy(), model)
+  except ValueError as e:
+    raise HTTPException(
+        status_code=422,
+        detail=f"Error in explanation: {str(e)}"
+    )
+  except Exception as e:
+    raise HTTPException(
+        status_code=500,
+        detail=f"Error in explanation: {str(e)}"
+    )
+  metrics.handler_finished()
+  return {
+      'status': 'success',
+      'model_version': model.version,
+      'base_value': base_value,
+      'results': explain.to_records(df['full_name'], predictions, probabilities, contributions)
+  }
+
+@app.post("/counterfactual")
+async def counterfactual_search(request: CounterfactualRequest):
+  """Fewest edits of changeable fields that bring each employee's probability of leaving below target"""
+  metrics.handler_started()
+  model = model_registry.active
+  df = pd.DataFrame([item.model_dump(mode='json') for item in request.employees])
+  domains = {field.value: changeable_field_values[field.value] for field in dict.fromkeys(request.fields)}
+  try:
+    results = await run_in_threadpool(
+      counterfactual.search, df, model.artifacts, domains,
+      target=request.target, max_edits=request.max_edits, max_results=request.max_results
+    )
+  except ValueError as e:
+    raise HTTPException(status_code=422, detail=f"Error in counterfactual search: {str(e)}")
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=f"Error in counterfactual search: {str(e)}")
+  metrics.handler_finished()
+  return {
+    'status': 'success',
+    'model_version': model.version,
+    'target': request.target,
+    'results': [{'full_name': name, **result} for name, result in zip(df['full_name'], results)]
+  }
+
+@app.post("/sensitivity")
+async def sensitivity_sweep(request: SensitivityRequest):
+  """Partial dependence and ICE curves of the probability of leaving over the values of one field"""
+  model = model_registry.active
+  if request.employees is not None or request.result_id is not None:
+    if request.employees is not None:
+      source = 'employees'
+      df = pd.DataFrame([item.model_dump(mode='json') for item in request.employees])
+    else:
+      if not result_store.result_set_exists(request.result_id):
+        raise HTTPException(status_code=404, detail="Result set not found")
+      source = 'result_set'
+      df = result_store.load_results(request.result_id).drop(columns=['probability', 'prediction'])
+    roster_key = sensitivity.roster_hash(df)
+    features = lambda: scoring.preprocess_frame(df, model.artifacts).to_numpy()
+    names = df['full_name'].tolist()
+  else:
+    holdout = model.cache.get('holdout')
+    if holdout is None:
+      raise HTTPException(status_code=404, detail="Holdout pool not available, train the model with python -m training.train")
+    source = 'holdout'
+    roster_key = sensitivity.HOLDOUT_ROSTER
+    features = lambda: holdout['X']
+    names = None
+  try:
+    result, cached = await run_in_threadpool(sensitivity.partial_dependence, model, request.field.value, roster_key, features)
+  except ValueError as e:
+    raise HTTPException(status_code=422, detail=f"Error in sensitivity sweep: {str(e)}")
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=f"Error in sensitivity sweep: {str(e)}")
+  ice = result['ice'][:request.ice_rows]
+  return {
+    'status': 'success',
+    'model_version': model.version,
+    'field': request.field.value,
+    'source': source,
+    'rows': len(result['ice']),
+    'cached': cached,
+    'values': result['values'],
+    'partial_dependence': result['partial_dependence'].tolist(),
+    'ice': [
+      {'full_name': None if names is None else names[i], 'probabilities': curve.tolist()}
+      for i, curve in enumerate(ice)
+    ]
+  }
+
+@app.post("/simulate_guarantee")
+async def simulate_guarantee(request: GuaranteeSimulation):
+  """Monte Carlo attrition rates of random or stratified cohorts drawn from the scored holdout pool"""
+  model = model_registry.active
+  holdout = model.cache.get('holdout')
+  if holdout is None:
+    raise HTTPException(status_code=404, detail="Holdout pool not available, train the model with python -m training.train")
+  try:
+    result = await run_in_threadpool(
+      simulation.simulate_guarantee,
+      holdout['y_true'],
+      holdout['probability'] > request.decision_threshold,
+      request.cohort_size,
+      n_cohorts=request.n_cohorts,
+      mode=request.mode.value,
+      threshold=request.threshold,
+      stay_share=request.stay_share,
+      seed=request.seed
+    )
+  except ValueError as e:
+    raise HTTPException(status_code=422, detail=f"Error in simulation: {str(e)}")
+  return {'status': 'success', 'model_version': model.version, 'decision_threshold': request.decision_threshold, **result}
+
+@app.get("/population")
+async def get_population():
+  """Dimensions and categories of the population cube of aug_train.csv"""
+  if population_cube is None:
+    raise HTTPException(status_code=404, detail="Population cube not built, run python -m training.cube")
+  return population_cube.describe()
+
+@app.post("/population")
+async def query_population(request: PopulationQuery):
+  """Employees and leave rate of the training population, sliced and grouped by any dimensions"""
+  if population_cube is None:
+    raise HTTPException(status_code=404, detail="Population cube not built, run python -m training.cube")
+  try:
+    result = population_cube.query(request.group_by, request.filters)
+  except ValueError as e:
+    raise HTTPException(status_code=422, detail=f"Error in population query: {str(e)}")
+  return {'status': 'success', **result}
+
+@app.post("/select_cohort")
+async def select_cohort(request: CohortSelection):
+  """Choose the course participants with the lowest expected attrition under seat and mix constraints"""
+  if request.result_id is None and request.candidates is None:
+    raise HTTPException(status_code=422, detail="result_id or candidates is required")
+  if request.result_id is not None:
+    if not result_store.result_set_exists(request.result_id):
+      raise HTTPException(status_code=404, detail="Result set not found")
+    df = result_store.load_results(request.result_id)[['full_name', 'probability', 'company_type', 'education_level']]
+  else:
+    df = pd.DataFrame([item.model_dump(mode='json') for item in request.candidates])
+  try:
+    selection = await run_in_threadpool(
+      cohort.select_cohort,
+      df['probability'].to_numpy(dtype=float),
+      df['company_type'].to_numpy(dtype=object),
+      df['education_level'].to_numpy(dtype=object),
+      request.seats,
+      max_per_company_type={key.value: value for key, value in request.max_per_company_type.items()},
+      min_per_education_level={key.value: value for key, value in request.min_per_education_level.items()},
+      max_expected_attrition=request.max_expected_attrition
+    )
+  except ValueError as e:
+    raise HTTPException(status_code=422, detail=f"Error in cohort selection: {str(e)}")
+  selected = df.iloc[selection.pop('indices')]
+  selected = selected.astype(object).where(selected.notna(), None)
+  return {
+    'status': 'success',
+    **selection,
+    'selected': [{'row_index': int(index), **record} for index, record in zip(selected.index, selected.to_dict('records'))]
+  }
+
+@app.post("/results")
+async def create_results():
+  """Create an empty result set, so chunked predictions can be stored under one ID"""
+  return {"result_id": result_store.create_result_set()}
+
+@app.get("/results/{result_id}")
+async def get_results(result_id: str, full_name: Optional[str] = None):
+  """Return stored prediction results, optionally filtered by full name"""
+  if not result_store.result_set_exists(result_id):
+    raise HTTPException(status_code=404, detail="Result set not found")
+  if full_name:
+    df = result_store.find_by_name(result_id, full_name)
+  else:
+    df = result_store.load_results(result_id)
+  return {
+    "result_id": result_id,
+    "results": df.astype(object).where(df.notna(), None).to_dict('records')
+  }
+
+@app.post("/feedback")
+async def add_feedback(request: FeedbackRequest):
+  """Store observed outcomes of scored employees, used by python -m training.update"""
+  if not result_store.result_set_exists(request.result_id):
+    raise HTTPException(status_code=404, detail="Result set not found")
+  missing = result_store.missing_rows(request.result_id, [item.row_index for item in request.outcomes])
+  if missing:
+    raise HTTPException(status_code=422, detail=f"No stored result for row_index {missing[:10]}" + (f" and {len(missing) - 10} more" if len(missing) > 10 else ""))
+  result_store.add_outcomes(request.result_id, [(item.row_index, item.left) for item in request.outcomes])
+  return {'status': 'success', 'recorded': len(request.outcomes), **result_store.outcome_stats()}
+
+@app.get("/feedback")
+async def get_feedback():
+  """Number of stored outcomes"""
+  return result_store.outcome_stats()
+
+## Sub-Func: Model version and features of preprocessed data
+def preprocessed_features(data: PreprocessedData):
+  model = model_registry.get(data.model_version) if data.model_version else None
+  if model is None and data.model_version:
+    # Preprocessed by a version that is no longer loaded, preprocess again with the active one
+    model = model_registry.active
+    return model, scoring.preprocess_frame(pd.DataFrame(data.original_data), model.artifacts)
+  return model or model_registry.active, pd.DataFrame(data.preprocessed_features, columns=data.features_columns)
+
+@app.post("/predict_label")
+async def predict_label(data: PreprocessedData, threshold: float = Query(0.5, gt=0, lt=1)):
+  """Whether each employee's probability of leaving is above threshold, summing only the trees needed to decide it"""
+  metrics.handler_started()
+  metrics.BATCH_SIZE.observe(len(data.preprocessed_features), 'predict_label')
+  try:
+    model, df_final = preprocessed_features(data)
+    predictions, trees_fraction, rescored_rows = early_exit.predict_labels(df_final, model, threshold)
+    metrics.ROWS_SCORED.inc(amount=len(predictions))
+    metrics.handler_finished()
+    return {
+      'status': 'success',
+      'model_version': model.version,
+      'threshold': threshold,
+      'trees_fraction': trees_fraction,
+      'rescored_rows': rescored_rows, # within rounding of the threshold, scored again by the full model
+      'results': [{'original_data': orig, 'prediction': pred} for orig, pred in zip(data.original_data, predictions)]
+    }
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=f"Error in label prediction: {str(e)}")
+
 @app.post("/predict")
-async def predict_data(data: PreprocessedData):
-  """Make predictions based on preprocessed data"""
+async def predict_data(data: PreprocessedData, result_id: Optional[str] = None, offset: int = 0):
+  """Make predictions based on preprocessed data and store them in a result set"""
+  metrics.handler_started()
+  metrics.BATCH_SIZE.observe(len(data.preprocessed_features), 'predict')
+  if result_id is not None and not result_store.result_set_exists(result_id):
+    raise HTTPException(status_code=404, detail="Result set not found")
   try:
     # Convert PreprocessedData to dataframe
-    df_final = pd.DataFrame(
-              data.preprocessed_features,
-              columns=data.features_columns
-          )
-    # Make predictions using model
-    predictions = model.predict(df_final)
-    probabilities = model.predict_proba(df_final)[:, 1]
+    model, df_final = preprocessed_features(data)
+    # Make predictions using model (the voting ensemble within its latency budget when ENSEMBLE=on)
+    predictions, probabilities, scored_by, lightgbm_probabilities = await ensemble.predict_frame(df_final, model)
+    # reference.json holds the distribution of LightGBM's probabilities
+    drift.observe(model, df_final, lightgbm_probabilities)
+    # Compare with the candidate version on a sample of requests (in the background)
+    model_registry.maybe_shadow(data.original_data, model)
     # Combine predictions with original data
     results = []
     for orig, pred, prob in zip(data.original_data, predictions, probabilities):
@@ -485,8 +904,16 @@ async def predict_data(data: PreprocessedData):
               "probability": prob
           }
       )
+    # Store results
+    if result_id is None:
+      result_id = result_store.create_result_set()
+    result_store.add_results(result_id, results, offset=offset)
+    metrics.ROWS_SCORED.inc(amount=len(results))
+    metrics.handler_finished()
     return {
         'status': 'success',
+        'result_id': result_id,
+        'scored_by': scored_by,
         'results': results
     }
   except Exception as e:
@@ -497,29 +924,40 @@ async def predict_data(data: PreprocessedData):
   
 @app.post("/ai_ask", response_model=SuccesResponse, responses={500: {"model": ErrorResponse}})
 async def ai_ask(request: AIRequest):
+  metrics.handler_started()
+  if request.result_id is None and request.df_dict is None:
+    raise HTTPException(status_code=422, detail="result_id is required")
+  if request.result_id is not None and not result_store.result_set_exists(request.result_id):
+    raise HTTPException(status_code=404, detail="Result set not found")
   try:
     # rearrange dataframe
-    df = pd.DataFrame.from_dict(request.df_dict)
+    if request.result_id is not None:
+      df = results_to_ai_dataframe(result_store.load_results(request.result_id))
+    else:
+      df = pd.DataFrame.from_dict(request.df_dict)
 
-    # first try with qwen2.5
-    agent = create_agent(df)
-    result = agent.invoke(request.question)
+    # first try with qwen2.5 (in a worker thread, the agent must not block the event loop)
+    result = await run_in_threadpool(ask_agent, df, request.question)
 
-    if result['output'] == 'Agent stopped due to iteration limit or time limit.':
+    if result['output'] == AGENT_STOPPED:
       # second try with llama3.1
-      agent = create_agent(df, model_name="llama3.1")
-      result = agent.invoke(request.question)
+      metrics.LLM_FALLBACKS.inc('llama3.1')
+      result = await run_in_threadpool(ask_agent, df, request.question, model_name="llama3.1")
 
-      if result['output'] == 'Agent stopped due to iteration limit or time limit.':
+      if result['output'] == AGENT_STOPPED:
+        metrics.LLM_TIMEOUTS.inc()
+        metrics.handler_finished()
         return ErrorResponse(
           message = "Analysis timed out. Please simplify your question or try again later."
         )
     
+      metrics.handler_finished()
       return SuccesResponse(
         message=result['output'],
         by='Generated by Llama3.1'
       )
     
+    metrics.handler_finished()
     return SuccesResponse(
       message=result['output'],
       by='Generated by Qwen2.5'
@@ -532,6 +970,12 @@ async def ai_ask(request: AIRequest):
     ) 
     
 if __name__ == "__main__":
+    # Expose the FastAPI app with ngrok (only when run as a script, so the app can be imported)
+    ngrok_auth_token = os.getenv('NGROK_AUTH_TOKEN')
+    if not ngrok_auth_token:
+      raise Exception("NGROK_AUTH_TOKEN not found in environment variables")
+    ngrok.set_auth_token(ngrok_auth_token)
+
     # Connect to ngrok
     url = ngrok.connect(8000)
     print(f"Public URL: {url}")
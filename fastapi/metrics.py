@@ -0,0 +1,183 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from math import inf
+from threading import Lock
+
+# Config
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 10000)
+
+# Class
+## Class: Counter
+class Counter:
+  """Monotonic counter, one value per combination of label values"""
+  type = 'counter'
+
+  def __init__(self, name, documentation, label_names=()):
+    self.name = name
+    self.documentation = documentation
+    self.label_names = label_names
+    self._values = {}
+    self._lock = Lock()
+    REGISTRY.append(self)
+
+  def inc(self, *label_values, amount=1):
+    with self._lock:
+      self._values[label_values] = self._values.get(label_values, 0) + amount
+
+  def samples(self):
+    with self._lock:
+      values = dict(self._values)
+    for label_values, value in values.items():
+      yield self.name, self.label_names, label_values, value
+
+## Class: Histogram
+class Histogram:
+  """Histogram with fixed buckets, one set of buckets per combination of label values"""
+  type = 'histogram'
+
+  def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+    self.name = name
+    self.documentation = documentation
+    self.label_names = label_names
+    self.upper_bounds = tuple(buckets) + (inf,)
+    self._values = {}
+    self._lock = Lock()
+    REGISTRY.append(self)
+
+  def observe(self, value, *label_values):
+    index = bisect_left(self.upper_bounds, value)
+    with self._lock:
+      child = self._values.get(label_values)
+      if child is None:
+        child = self._values[label_values] = [[0] * len(self.upper_bounds), 0.0]
+      child[0][index] += 1
+      child[1] += value
+
+  def time(self, *label_values):
+    """Context manager observing the seconds spent in its block"""
+    return _Timer(self, label_values)
+
+  def samples(self):
+    with self._lock:
+      values = {label_values: (list(counts), total) for label_values, (counts, total) in self._values.items()}
+    label_names = self.label_names + ('le',)
+    for label_values, (counts, total) in values.items():
+      cumulative = 0
+      for bound, count in zip(self.upper_bounds, counts):
+        cumulative += count
+        yield f'{self.name}_bucket', label_names, label_values + (format_value(bound),), cumulative
+      yield f'{self.name}_sum', self.label_names, label_values, total
+      yield f'{self.name}_count', self.label_names, label_values, cumulative
+
+class _Timer:
+  __slots__ = ('histogram', 'label_values', 'start')
+
+  def __init__(self, histogram, label_values):
+    self.histogram = histogram
+    self.label_values = label_values
+
+  def __enter__(self):
+    self.start = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc):
+    self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+
+# Metrics (per process: with several uvicorn workers, each worker reports its own)
+REGISTRY = []
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Latency of HTTP requests', ('method', 'path', 'status'))
+STAGE_SECONDS = Histogram('pipeline_stage_duration_seconds', 'Latency of each scoring pipeline stage', ('stage',))
+LLM_ATTEMPT_SECONDS = Histogram('llm_attempt_duration_seconds', 'Latency of each LLM agent attempt in /ai_ask', ('model', 'outcome'))
+BATCH_SIZE = Histogram('batch_size_rows', 'Rows per scoring request', ('endpoint',), buckets=BATCH_BUCKETS)
+ROWS_SCORED = Counter('rows_scored_total', 'Rows scored by the model')
+LLM_FALLBACKS = Counter('llm_fallbacks_total', 'Questions retried with the fallback model', ('model',))
+LLM_TIMEOUTS = Counter('llm_timeouts_total', 'Questions where every model hit the iteration or time limit')
+SHAP_ROWS = Counter('shap_rows_total', 'Rows explained by /explain, from the cache or computed', ('source',))
+ENSEMBLE_MEMBER_SECONDS = Histogram('ensemble_member_duration_seconds', 'Latency of each ensemble member on a batch', ('member',))
+ENSEMBLE_BATCHES = Counter('ensemble_batches_total', 'Batches of /predict with the ensemble on, by the model that scored them', ('scored_by',))
+ADMISSION_WAIT_SECONDS = Histogram('admission_queue_wait_seconds', 'Time admitted requests waited in the queue of their endpoint class', ('class',))
+ADMISSION_REJECTIONS = Counter('admission_rejections_total', 'Requests shed by admission control (queue full or past deadline)', ('class', 'reason'))
+ENSEMBLE_FALLBACKS = Counter('ensemble_fallbacks_total', 'Batches scored by LightGBM alone (members late, failed, or busy)', ('reason',))
+
+# Func: Request timing
+## Sub-Func: Per-request timestamps, set by MetricsMiddleware
+_request_times = ContextVar('request_times', default=None)
+
+def request_admitted():
+  """Mark the end of the admission queue wait (counted by ADMISSION_WAIT_SECONDS, not as validation)"""
+  times = _request_times.get()
+  if times is not None:
+    times['admitted'] = time.perf_counter()
+
+def handler_started():
+  """Record request validation (body parsing and pydantic) as the time from admission until the handler starts"""
+  times = _request_times.get()
+  if times is not None:
+    STAGE_SECONDS.observe(time.perf_counter() - times['admitted'], 'request_validation')
+
+def handler_finished():
+  """Mark the end of the handler, the time until the response starts is response serialization"""
+  times = _request_times.get()
+  if times is not None:
+    times['handler_end'] = time.perf_counter()
+
+## Main-Func: ASGI middleware
+class MetricsMiddleware:
+  """Observe the latency of every HTTP request, labelled by route template (not raw path)"""
+
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] != 'http':
+      await self.app(scope, receive, send)
+      return
+    start = time.perf_counter()
+    times = {'start': start, 'admitted': start, 'handler_end': None}
+    token = _request_times.set(times)
+    status = [500]
+
+    async def send_wrapper(message):
+      if message['type'] == 'http.response.start':
+        status[0] = message['status']
+        if times['handler_end'] is not None:
+          STAGE_SECONDS.observe(time.perf_counter() - times['handler_end'], 'response_serialization')
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      _request_times.reset(token)
+      route = scope.get('route')
+      path = route.path if route is not None else 'unmatched'
+      REQUEST_SECONDS.observe(time.perf_counter() - times['start'], scope['method'], path, str(status[0]))
+
+# Func: Prometheus text format
+## Sub-Func: Format numbers and labels
+def format_value(value):
+  if value == inf:
+    return '+Inf'
+  if isinstance(value, float) and value.is_integer():
+    return str(int(value)) if abs(value) < 1e15 else repr(value)
+  return repr(value) if isinstance(value, float) else str(value)
+
+def format_labels(label_names, label_values):
+  if not label_names:
+    return ''
+  pairs = []
+  for name, value in zip(label_names, label_values):
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    pairs.append(f'{name}="{value}"')
+  return '{' + ','.join(pairs) + '}'
+
+## Main-Func: Render every metric
+def render():
+  lines = []
+  for metric in REGISTRY:
+    lines.append(f'# HELP {metric.name} {metric.documentation}')
+    lines.append(f'# TYPE {metric.name} {metric.type}')
+    for name, label_names, label_values, value in metric.samples():
+      lines.append(f'{name}{format_labels(label_names, label_values)} {format_value(value)}')
+  return '\n'.join(lines) + '\n'
@@ -0,0 +1,82 @@
+import json
+import os
+from functools import lru_cache
+import numpy as np
+import scoring
+
+# Config
+CUBE_PATH = os.getenv('POPULATION_CUBE', os.path.join(scoring.PICKLE_DIR, 'cube.npz')) # written by python -m training.cube
+QUERY_CACHE_SIZE = 1024
+
+# Class
+## Class: Population statistics cube of aug_train.csv
+class PopulationCube:
+  """Non-empty cells of the cube (category codes, employees, leavers), aggregated per query"""
+
+  def __init__(self, path=CUBE_PATH):
+    with np.load(path) as cube:
+      meta = json.loads(str(cube['meta']))
+      self.codes = cube['codes'].astype(np.int64)
+      self.count = cube['count'].astype(np.int64)
+      self.leavers = cube['leavers'].astype(np.int64)
+    self.dimensions = meta['dimensions']
+    self.categories = meta['categories']
+    self.cdi_edges = meta['cdi_edges']
+    self.rows = meta['rows']
+    self.index = {dimension: j for j, dimension in enumerate(self.dimensions)}
+    self.category_codes = {dimension: {cat: i for i, cat in enumerate(cats)} for dimension, cats in self.categories.items()}
+    self._query = lru_cache(maxsize=QUERY_CACHE_SIZE)(self._compute)
+
+  def describe(self):
+    return {'rows': self.rows, 'cells': len(self.count), 'cdi_edges': self.cdi_edges, 'categories': self.categories}
+
+  def query(self, group_by=(), filters=None):
+    """
+    Employees, leavers, and leave rate of the population sliced by filters ({dimension: [categories]})
+    and grouped by the group_by dimensions. Raise ValueError for unknown dimensions or categories.
+    """
+    filters = filters or {}
+    for dimension in list(group_by) + list(filters):
+      if dimension not in self.index:
+        raise ValueError(f"Unknown dimension {dimension}, expected one of {self.dimensions}")
+    if len(set(group_by)) != len(group_by):
+      raise ValueError("group_by has a dimension twice")
+    for dimension, values in filters.items():
+      unknown = [value for value in values if value not in self.category_codes[dimension]]
+      if unknown:
+        raise ValueError(f"Unknown categories {unknown} of {dimension}, expected some of {self.categories[dimension]}")
+    # Hashable key, so repeated queries are served from the cache
+    key = (tuple(group_by), tuple(sorted((dimension, tuple(sorted(set(values)))) for dimension, values in filters.items())))
+    return self._query(*key)
+
+  def _compute(self, group_by, filters):
+    mask = np.ones(len(self.count), dtype=bool)
+    for dimension, values in filters:
+      codes = [self.category_codes[dimension][value] for value in values]
+      mask &= np.isin(self.codes[:, self.index[dimension]], codes)
+    count, leavers = self.count[mask], self.leavers[mask]
+    total, total_leavers = int(count.sum()), int(leavers.sum())
+    groups = []
+    if group_by:
+      columns = [self.index[dimension] for dimension in group_by]
+      keys, inverse = np.unique(self.codes[mask][:, columns], axis=0, return_inverse=True)
+      inverse = inverse.ravel()
+      group_count = np.bincount(inverse, weights=count, minlength=len(keys))
+      group_leavers = np.bincount(inverse, weights=leavers, minlength=len(keys))
+      for codes, n, n_leavers in zip(keys, group_count, group_leavers):
+        groups.append({
+          **{dimension: self.categories[dimension][code] for dimension, code in zip(group_by, codes)},
+          'count': int(n),
+          'leavers': int(n_leavers),
+          'leave_rate': n_leavers / n
+        })
+    return {
+      'count': total,
+      'leavers': total_leavers,
+      'leave_rate': total_leavers / total if total else None,
+      'groups': groups
+    }
+
+# Func: Load the cube if it was built
+def load_cube(path=CUBE_PATH):
+  return PopulationCube(path) if os.path.exists(path) else None
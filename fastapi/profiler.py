@@ -0,0 +1,252 @@
+import asyncio
+import cProfile
+import glob
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+
+# Config
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0')) # fraction of requests profiled without the header
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.005')) # seconds between stack samples
+PROFILE_MAX_BYTES = int(os.getenv('PROFILE_MAX_BYTES', str(200 * 2**20))) # oldest profiles are deleted above this size
+PROFILE_HEADER = b'x-profile' # send "X-Profile: 1" to profile a request
+SKIPPED_PATHS = ('/profiles', '/metrics')
+request_id_pattern = re.compile(r'^[0-9a-f]{32}$')
+_active = ContextVar('profile', default=None) # (sampler, cProfiles of worker threads) of the profiled request
+
+# Class
+## Class: Sampling profiler of one thread
+class StackSampler:
+  """
+  Sample the call stack of a thread every interval (in a background thread) and export it to speedscope.
+  While the request waits on a worker thread (follow), that thread is sampled instead.
+  """
+
+  def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+    self.thread_ids = [thread_id]
+    self.interval = interval
+    self.frames = []
+    self.frame_index = {}
+    self.samples = []
+    self.weights = []
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._run, daemon=True)
+
+  def start(self):
+    self.start_time = time.perf_counter()
+    self._thread.start()
+
+  def stop(self):
+    self._stop.set()
+    self._thread.join()
+    self.end_time = time.perf_counter()
+
+  def follow(self, thread_id):
+    self.thread_ids.append(thread_id)
+
+  def unfollow(self, thread_id):
+    self.thread_ids.remove(thread_id)
+
+  def _frame_id(self, code):
+    key = (code.co_name, code.co_filename, code.co_firstlineno)
+    index = self.frame_index.get(key)
+    if index is None:
+      index = self.frame_index[key] = len(self.frames)
+      self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+    return index
+
+  def _run(self):
+    last = time.perf_counter()
+    while not self._stop.wait(self.interval):
+      frame = sys._current_frames().get(self.thread_ids[-1])
+      now = time.perf_counter()
+      if frame is None:
+        continue
+      stack = []
+      while frame is not None:
+        stack.append(self._frame_id(frame.f_code))
+        frame = frame.f_back
+      stack.reverse()
+      self.samples.append(stack)
+      self.weights.append(now - last)
+      last = now
+
+  def speedscope(self, name):
+    return {
+      '$schema': 'https://www.speedscope.app/file-format-schema.json',
+      'name': name,
+      'exporter': 'employee-prediction-api',
+      'shared': {'frames': self.frames},
+      'profiles': [{
+        'type': 'sampled',
+        'name': name,
+        'unit': 'seconds',
+        'startValue': 0,
+        'endValue': self.end_time - self.start_time,
+        'samples': self.samples,
+        'weights': self.weights
+      }]
+    }
+
+# Func: Profile files
+## Sub-Func: Paths of a profile
+def profile_paths(request_id, profile_dir=PROFILE_DIR):
+  return {
+    'speedscope': os.path.join(profile_dir, f'{request_id}.speedscope.json'),
+    'cprofile': os.path.join(profile_dir, f'{request_id}.prof'),
+    'meta': os.path.join(profile_dir, f'{request_id}.meta.json')
+  }
+
+## Sub-Func: Delete the oldest profiles above PROFILE_MAX_BYTES
+def rotate(profile_dir=PROFILE_DIR, max_bytes=PROFILE_MAX_BYTES):
+  profiles = []
+  for meta_path in glob.glob(os.path.join(profile_dir, '*.meta.json')):
+    request_id = os.path.basename(meta_path)[:-len('.meta.json')]
+    paths = [path for path in profile_paths(request_id, profile_dir).values() if os.path.exists(path)]
+    profiles.append((os.path.getmtime(meta_path), sum(os.path.getsize(path) for path in paths), paths))
+  profiles.sort()
+  total = sum(size for _, size, _ in profiles)
+  for _, size, paths in profiles:
+    if total <= max_bytes:
+      break
+    for path in paths:
+      os.remove(path)
+    total -= size
+
+## Sub-Func: Write the files of a finished profile
+def save_profile(request_id, sampler, cprofiles, meta, profile_dir=PROFILE_DIR):
+  """cprofiles are those of the event loop thread and of the worker threads, merged in one dump"""
+  os.makedirs(profile_dir, exist_ok=True)
+  paths = profile_paths(request_id, profile_dir)
+  with open(paths['speedscope'], 'w') as f:
+    json.dump(sampler.speedscope(f"{meta['method']} {meta['path']} {request_id}"), f)
+  if cprofiles:
+    stats = pstats.Stats(cprofiles[0])
+    stats.add(*cprofiles[1:])
+    stats.dump_stats(paths['cprofile'])
+  # meta is written last, listing only shows complete profiles
+  with open(paths['meta'], 'w') as f:
+    json.dump(meta, f)
+  rotate(profile_dir)
+
+## Main-Func: List recent profiles
+def list_profiles(limit=50, profile_dir=PROFILE_DIR):
+  profiles = []
+  meta_paths = sorted(glob.glob(os.path.join(profile_dir, '*.meta.json')), key=os.path.getmtime, reverse=True)
+  for meta_path in meta_paths[:limit]:
+    try:
+      with open(meta_path) as f:
+        profiles.append(json.load(f))
+    except (OSError, ValueError):
+      continue # deleted by rotation meanwhile
+  return profiles
+
+# Func: Worker threads
+## Main-Func: Run a blocking function in the threadpool, profiled with its request
+async def run_in_threadpool(func, *args, **kwargs):
+  """Like fastapi.concurrency.run_in_threadpool, but the profilers of a profiled request follow the worker thread"""
+  profile = _active.get()
+  if profile is None:
+    return await _run_in_threadpool(func, *args, **kwargs)
+  sampler, cprofiles = profile
+
+  def profiled():
+    thread_id = threading.get_ident()
+    cprofile = cProfile.Profile()
+    try:
+      cprofile.enable()
+    except ValueError:
+      cprofile = None # another profiler is active in this thread
+    sampler.follow(thread_id)
+    try:
+      return func(*args, **kwargs)
+    finally:
+      sampler.unfollow(thread_id)
+      if cprofile is not None:
+        cprofile.disable()
+        cprofiles.append(cprofile)
+
+  return await _run_in_threadpool(profiled)
+
+# Func: ASGI middleware
+## Sub-Func: Decide if a request is profiled
+def should_profile(scope):
+  if scope['type'] != 'http' or scope['path'].startswith(SKIPPED_PATHS):
+    return False
+  if dict(scope['headers']).get(PROFILE_HEADER) in (b'1', b'true'):
+    return True
+  return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+## Main-Func: Profile requests chosen by header or sampling rate
+class ProfilerMiddleware:
+  """
+  Profile a request with the stack sampler (speedscope flame graph) and cProfile, keyed by a request ID
+  returned in the X-Profile-Id header. One request is profiled at a time per process: both profilers
+  see the whole event loop thread, so work of concurrent requests on that thread is included. Work the
+  handler sends to the threadpool with run_in_threadpool of this module is followed into the worker
+  thread; other threads (e.g. the ensemble members' executor) are not profiled.
+  """
+
+  def __init__(self, app):
+    self.app = app
+    self._busy = threading.Lock()
+
+  async def __call__(self, scope, receive, send):
+    if not should_profile(scope) or not self._busy.acquire(blocking=False):
+      await self.app(scope, receive, send)
+      return
+    request_id = uuid.uuid4().hex
+    status = [500]
+
+    async def send_wrapper(message):
+      if message['type'] == 'http.response.start':
+        status[0] = message['status']
+        message = {**message, 'headers': list(message.get('headers', [])) + [(b'x-profile-id', request_id.encode())]}
+      await send(message)
+
+    started_at = datetime.now().isoformat(timespec='seconds')
+    sampler = StackSampler(threading.get_ident())
+    cprofile = cProfile.Profile()
+    try:
+      cprofile.enable()
+    except ValueError:
+      cprofile = None # another profiler is active in this thread
+    cprofiles = [cprofile] if cprofile is not None else []
+    token = _active.set((sampler, cprofiles))
+    sampler.start()
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      sampler.stop()
+      _active.reset(token)
+      if cprofile is not None:
+        cprofile.disable()
+      meta = {
+        'request_id': request_id,
+        'method': scope['method'],
+        'path': scope['path'],
+        'status': status[0],
+        'started_at': started_at,
+        'duration_seconds': sampler.end_time - sampler.start_time,
+        'samples': len(sampler.samples)
+      }
+
+      # Writing the files and rotating the directory would stall the event loop, so a worker thread does it
+      # and releases the lock once the profile is on disk (even if this request is cancelled meanwhile)
+      def write():
+        try:
+          save_profile(request_id, sampler, cprofiles, meta)
+        finally:
+          self._busy.release()
+
+      await asyncio.get_running_loop().run_in_executor(None, write)
@@ -0,0 +1,310 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import scoring
+
+# Config
+VERSIONS_DIR = os.getenv('MODEL_VERSIONS_DIR', os.path.join(scoring.PICKLE_DIR, 'versions'))
+POLL_SECONDS = float(os.getenv('MODEL_POLL_SECONDS', '10')) # how often VERSIONS_DIR is scanned
+PROMOTION = os.getenv('MODEL_PROMOTION', 'auto') # 'auto': new versions go live once warm, 'manual': POST /models/promote
+SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', '0')) # fraction of /predict requests also scored by the candidate
+BASE_VERSION = 'base' # the artifacts directly in PICKLE_DIR
+ACTIVE_FILE = 'ACTIVE' # name of the promoted version, so restarts serve the same version
+READY_FILE = 'manifest.json' # written last by python -m training.train --version
+
+## Warm-up rows (one complete, one incomplete when an imputer is available)
+warmup_employees = [
+  {
+    'full_name': 'Warm Up', 'city_development_index': 0.9, 'gender': 'Male', 'relevant_experience': True,
+    'enrolled_university': 'No Enroll', 'education_level': 'Graduate', 'major_discipline': 'STEM',
+    'experience': '5', 'company_size': '50-99', 'company_type': 'Pvt Ltd', 'last_new_job': '1'
+  },
+  {
+    'full_name': 'Warm Up', 'city_development_index': None, 'gender': None, 'relevant_experience': False,
+    'enrolled_university': 'Full Time', 'education_level': 'Masters', 'major_discipline': None,
+    'experience': '>20', 'company_size': None, 'company_type': 'NGO', 'last_new_job': 'never'
+  }
+]
+
+# Class
+## Class: One loaded and warmed version
+class ModelVersion:
+  """Artifacts of one version plus derived objects (e.g. explainers) in cache, built by the registry warmers"""
+
+  def __init__(self, version, path):
+    self.version = version
+    self.path = path
+    start = time.perf_counter()
+    self.artifacts = scoring.load_artifacts(path)
+    self.load_seconds = time.perf_counter() - start
+    self.loaded_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    self.cache = {}
+    self.warm_seconds = None
+
+  def warm(self, warmers):
+    """Score the warm-up rows once (first calls of LightGBM are slow) and build derived caches"""
+    start = time.perf_counter()
+    rows = warmup_employees if self.artifacts['imputer'] is not None else warmup_employees[:1]
+    features = scoring.preprocess_frame(pd.DataFrame(rows), self.artifacts)
+    scoring.predict_frame(features, self.artifacts)
+    for warmer in warmers:
+      warmer(self)
+    self.warm_seconds = time.perf_counter() - start
+
+  def describe(self):
+    return {
+      'version': self.version,
+      'path': self.path,
+      'loaded_at': self.loaded_at,
+      'load_seconds': round(self.load_seconds, 4),
+      'warm_seconds': None if self.warm_seconds is None else round(self.warm_seconds, 4),
+      'imputer': self.artifacts['imputer'] is not None
+    }
+
+## Class: Shadow scoring statistics of a candidate
+class ShadowStats:
+  def __init__(self, version):
+    self.version = version
+    self.requests = 0
+    self.rows = 0
+    self.label_agreements = 0
+    self.abs_probability_diff = 0.0
+    self.max_probability_diff = 0.0
+    self.active_seconds = 0.0
+    self.candidate_seconds = 0.0
+    self.errors = 0
+    self.lock = threading.Lock()
+
+  def add(self, active, candidate, active_seconds, candidate_seconds):
+    diff = np.abs(active[1] - candidate[1])
+    with self.lock:
+      self.requests += 1
+      self.rows += len(diff)
+      self.label_agreements += int((active[0] == candidate[0]).sum())
+      self.abs_probability_diff += float(diff.sum())
+      self.max_probability_diff = max(self.max_probability_diff, float(diff.max(initial=0)))
+      self.active_seconds += active_seconds
+      self.candidate_seconds += candidate_seconds
+
+  def describe(self):
+    with self.lock:
+      rows = max(self.rows, 1)
+      return {
+        'candidate': self.version,
+        'requests': self.requests,
+        'rows': self.rows,
+        'errors': self.errors,
+        'label_agreement': self.label_agreements / rows,
+        'mean_abs_probability_diff': self.abs_probability_diff / rows,
+        'max_abs_probability_diff': self.max_probability_diff,
+        'active_ms_per_row': self.active_seconds / rows * 1000,
+        'candidate_ms_per_row': self.candidate_seconds / rows * 1000
+      }
+
+## Class: Registry
+class ModelRegistry:
+  """
+  Serve one active version, watch VERSIONS_DIR for new ones, and load and warm them in a background thread.
+  Handlers read registry.active once per request, so a swap (a single reference assignment) never mixes
+  versions inside a request.
+  """
+
+  def __init__(self, versions_dir=VERSIONS_DIR, base_dir=scoring.PICKLE_DIR, promotion=PROMOTION,
+               shadow_sample_rate=SHADOW_SAMPLE_RATE, warmers=()):
+    self.versions_dir = versions_dir
+    self.base_dir = base_dir
+    self.promotion = promotion
+    self.shadow_sample_rate = shadow_sample_rate
+    self.warmers = list(warmers) # functions(ModelVersion) building derived caches, run on every loaded version
+    self.loaded = {}
+    self.failed = {}
+    self.active = None
+    self.previous = None
+    self.candidate = None
+    self.shadow = None
+    self._lock = threading.RLock()
+    self._stop = threading.Event()
+    self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+
+  ### Versions on disk
+  def available(self):
+    """{version: path} of complete versions, plus the base version if PICKLE_DIR holds artifacts"""
+    versions = {}
+    if any(os.path.exists(os.path.join(self.base_dir, name)) for name in ('lclgbm.pkl', os.path.join('bundle', 'bundle.json'))):
+      versions[BASE_VERSION] = self.base_dir
+    if os.path.isdir(self.versions_dir):
+      for name in sorted(os.listdir(self.versions_dir)):
+        path = os.path.join(self.versions_dir, name)
+        if os.path.isfile(os.path.join(path, READY_FILE)):
+          versions[name] = path
+    return versions
+
+  def latest(self, versions):
+    """Newest version (version directories sort by name, the base version comes first)"""
+    names = [name for name in versions if name != BASE_VERSION]
+    return names[-1] if names else BASE_VERSION if BASE_VERSION in versions else None
+
+  def saved_active(self):
+    try:
+      with open(os.path.join(self.versions_dir, ACTIVE_FILE)) as f:
+        return f.read().strip() or None
+    except OSError:
+      return None
+
+  def save_active(self, version):
+    os.makedirs(self.versions_dir, exist_ok=True)
+    tmp_path = os.path.join(self.versions_dir, f'{ACTIVE_FILE}.tmp')
+    with open(tmp_path, 'w') as f:
+      f.write(version)
+    os.replace(tmp_path, os.path.join(self.versions_dir, ACTIVE_FILE))
+
+  ### Loading
+  def get(self, version):
+    """A loaded version, or None"""
+    return self.loaded.get(version)
+
+  def load(self, version):
+    """Load and warm a version (blocking), or return it if it is already loaded"""
+    with self._lock:
+      if version in self.loaded:
+        return self.loaded[version]
+    versions = self.available()
+    if version not in versions:
+      raise KeyError(version)
+    model = ModelVersion(version, versions[version])
+    model.warm(self.warmers)
+    with self._lock:
+      return self.loaded.setdefault(version, model)
+
+  def add_warmer(self, warmer):
+    """
+    Register a function(ModelVersion) building derived caches, run on every loaded version. After start(),
+    a version being loaded by the poll thread meanwhile can miss it: pass warmers to the constructor instead.
+    """
+    self.warmers.append(warmer)
+    for model in list(self.loaded.values()):
+      warmer(model)
+
+  ### Promotion
+  def promote(self, version):
+    """Make a version active (loading it first if needed) and remember it across restarts"""
+    model = self.load(version)
+    with self._lock:
+      if self.active is not model:
+        self.previous = self.active
+        self.active = model
+      if self.candidate is model:
+        self.candidate = None
+        self.shadow = None
+      self._evict()
+    self.save_active(version)
+    return model
+
+  def _evict(self):
+    # Keep the active version, the previous one (requests preprocessed before the swap) and the candidate
+    keep = {model.version for model in (self.active, self.previous, self.candidate) if model is not None}
+    for version in list(self.loaded):
+      if version not in keep:
+        del self.loaded[version]
+
+  def start(self):
+    """Load the saved (or newest) version synchronously, then watch for new versions in the background"""
+    versions = self.available()
+    version = self.saved_active()
+    if version not in versions:
+      version = self.latest(versions)
+    if version is None:
+      raise FileNotFoundError(f"No model artifacts in {self.base_dir} or {self.versions_dir}")
+    self.promote(version)
+    if POLL_SECONDS > 0:
+      threading.Thread(target=self._watch, daemon=True, name='model-registry').start()
+
+  def stop(self):
+    self._stop.set()
+
+  def _watch(self):
+    while not self._stop.wait(POLL_SECONDS):
+      self.poll()
+
+  def poll(self):
+    """Load a new version found on disk, then promote it (auto) or make it the shadow candidate (manual)"""
+    versions = self.available()
+    latest = self.latest(versions)
+    known = set(self.loaded) | set(self.failed) | {model.version for model in (self.active, self.candidate) if model}
+    if latest is None or latest in known or latest == BASE_VERSION:
+      return
+    try:
+      model = self.load(latest)
+    except Exception as e:
+      self.failed[latest] = str(e)
+      return
+    if self.promotion == 'auto':
+      self.promote(latest)
+    else:
+      with self._lock:
+        self.candidate = model
+        self.shadow = ShadowStats(latest)
+        self._evict()
+
+  ### Shadow scoring
+  def maybe_shadow(self, original_data, active):
+    """Score a sample of requests with the candidate in the background, never delaying the response"""
+    candidate, stats = self.candidate, self.shadow
+    if candidate is None or stats is None or candidate is active:
+      return
+    if self.shadow_sample_rate <= 0 or random.random() >= self.shadow_sample_rate:
+      return
+    self._shadow_executor.submit(self._shadow_score, original_data, active, candidate, stats)
+
+  def _shadow_score(self, original_data, active, candidate, stats):
+    try:
+      df = pd.DataFrame(original_data)
+      results = []
+      for model in (active, candidate):
+        start = time.perf_counter()
+        predictions = scoring.predict_frame(scoring.preprocess_frame(df, model.artifacts), model.artifacts)
+        results.append((predictions, time.perf_counter() - start))
+      stats.add(results[0][0], results[1][0], results[0][1], results[1][1])
+    except Exception:
+      with stats.lock:
+        stats.errors += 1
+
+  ### Status
+  def describe(self):
+    versions = []
+    for version, path in self.available().items():
+      model = self.loaded.get(version)
+      if self.active is not None and version == self.active.version:
+        status = 'active'
+      elif self.candidate is not None and version == self.candidate.version:
+        status = 'candidate'
+      elif version in self.failed:
+        status = 'failed'
+      elif model is not None:
+        status = 'loaded'
+      else:
+        status = 'available'
+      entry = {'version': version, 'path': path, 'status': status}
+      if model is not None:
+        entry.update(model.describe())
+      if version in self.failed:
+        entry['error'] = self.failed[version]
+      manifest_path = os.path.join(path, READY_FILE)
+      if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+          entry['metrics'] = json.load(f).get('metrics')
+      versions.append(entry)
+    return {
+      'active': self.active.version if self.active else None,
+      'candidate': self.candidate.version if self.candidate else None,
+      'promotion': self.promotion,
+      'shadow_sample_rate': self.shadow_sample_rate,
+      'shadow': self.shadow.describe() if self.shadow else None,
+      'versions': versions
+    }
@@ -0,0 +1,227 @@
+import json
+import os
+import sqlite3
+import uuid
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime, timedelta
+from threading import Event, Lock, Thread
+import pandas as pd
+
+# Config
+RESULTS_DB = os.getenv('RESULTS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results.db'))
+FRAME_CACHE_SIZE = 32
+RESULTS_TTL_DAYS = float(os.getenv('RESULTS_TTL_DAYS', '30')) # older result sets are purged (0 keeps them), unless they have outcomes
+PURGE_SECONDS = float(os.getenv('RESULTS_PURGE_SECONDS', '3600')) # how often expired result sets are purged
+
+result_columns = [
+  'full_name', 'gender', 'enrolled_university', 'experience', 'relevant_experience', 'last_new_job',
+  'education_level', 'major_discipline', 'city_development_index', 'company_size', 'company_type',
+  'probability', 'prediction'
+  ]
+
+# Func: Database
+## Sub-Func: Open connection
+def connect():
+  conn = sqlite3.connect(RESULTS_DB, timeout=30)
+  conn.execute('PRAGMA journal_mode=WAL')
+  return conn
+
+## Main-Func: Create tables
+def init_db():
+  with closing(connect()) as conn, conn:
+    conn.executescript("""
+      CREATE TABLE IF NOT EXISTS result_sets (
+        result_id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL
+      );
+      CREATE TABLE IF NOT EXISTS results (
+        result_id TEXT NOT NULL REFERENCES result_sets(result_id),
+        row_index INTEGER NOT NULL,
+        full_name TEXT,
+        gender TEXT,
+        enrolled_university TEXT,
+        experience TEXT,
+        relevant_experience INTEGER,
+        last_new_job TEXT,
+        education_level TEXT,
+        major_discipline TEXT,
+        city_development_index REAL,
+        company_size TEXT,
+        company_type TEXT,
+        probability REAL,
+        prediction INTEGER,
+        PRIMARY KEY (result_id, row_index)
+      );
+      CREATE INDEX IF NOT EXISTS idx_result_sets_created ON result_sets (created_at);
+      CREATE INDEX IF NOT EXISTS idx_results_name ON results (result_id, full_name COLLATE NOCASE);
+      CREATE TABLE IF NOT EXISTS outcomes (
+        outcome_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        result_id TEXT NOT NULL,
+        row_index INTEGER NOT NULL,
+        target INTEGER NOT NULL,
+        recorded_at TEXT NOT NULL,
+        UNIQUE (result_id, row_index),
+        FOREIGN KEY (result_id, row_index) REFERENCES results(result_id, row_index)
+      );
+    """)
+
+# Func: Result sets
+## Sub-Func: Small LRU of loaded result frames
+_frame_cache = OrderedDict()
+_frame_cache_lock = Lock()
+
+def _cache_get(result_id):
+  with _frame_cache_lock:
+    if result_id in _frame_cache:
+      _frame_cache.move_to_end(result_id)
+      return _frame_cache[result_id]
+  return None
+
+def _cache_put(result_id, df):
+  with _frame_cache_lock:
+    _frame_cache[result_id] = df
+    _frame_cache.move_to_end(result_id)
+    while len(_frame_cache) > FRAME_CACHE_SIZE:
+      _frame_cache.popitem(last=False)
+
+def _cache_drop(result_id):
+  with _frame_cache_lock:
+    _frame_cache.pop(result_id, None)
+
+## Main-Func: Create, append, and read
+def create_result_set():
+  """Create an empty result set and return its ID"""
+  result_id = uuid.uuid4().hex
+  with closing(connect()) as conn, conn:
+    conn.execute(
+      'INSERT INTO result_sets (result_id, created_at) VALUES (?, ?)',
+      (result_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    )
+  return result_id
+
+def result_set_exists(result_id):
+  with closing(connect()) as conn:
+    row = conn.execute('SELECT 1 FROM result_sets WHERE result_id = ?', (result_id,)).fetchone()
+  return row is not None
+
+def add_results(result_id, results, offset=0):
+  """Store scored rows (original_data, prediction, probability) starting at row offset"""
+  rows = []
+  for i, result in enumerate(results):
+    orig = result['original_data']
+    rows.append((
+      result_id, offset + i,
+      orig.get('full_name'), orig.get('gender'), orig.get('enrolled_university'), orig.get('experience'),
+      None if orig.get('relevant_experience') is None else int(bool(orig.get('relevant_experience'))),
+      orig.get('last_new_job'), orig.get('education_level'), orig.get('major_discipline'),
+      orig.get('city_development_index'), orig.get('company_size'), orig.get('company_type'),
+      float(result['probability']), int(result['prediction'])
+    ))
+  with closing(connect()) as conn, conn:
+    conn.executemany(
+      f'INSERT OR REPLACE INTO results (result_id, row_index, {", ".join(result_columns)}) '
+      f'VALUES ({", ".join(["?"] * (len(result_columns) + 2))})',
+      rows
+    )
+  _cache_drop(result_id)
+
+def load_results(result_id):
+  """Return all rows of a result set in input order (cached)"""
+  df = _cache_get(result_id)
+  if df is not None:
+    return df
+  with closing(connect()) as conn:
+    df = pd.read_sql_query(
+      f'SELECT {", ".join(result_columns)} FROM results WHERE result_id = ? ORDER BY row_index',
+      conn, params=(result_id,)
+    )
+  df['relevant_experience'] = df['relevant_experience'].astype('boolean')
+  _cache_put(result_id, df)
+  return df
+
+def find_by_name(result_id, full_name):
+  """Return rows of a result set matching full_name (case insensitive)"""
+  with closing(connect()) as conn:
+    return pd.read_sql_query(
+      f'SELECT {", ".join(result_columns)} FROM results '
+      'WHERE result_id = ? AND full_name = ? COLLATE NOCASE ORDER BY row_index',
+      conn, params=(result_id, full_name)
+    )
+
+# Func: Retention
+## Sub-Func: Delete result sets older than ttl_days (those with observed outcomes are training data and are kept)
+def purge_expired(ttl_days=RESULTS_TTL_DAYS):
+  """Return the number of result sets deleted"""
+  if ttl_days <= 0:
+    return 0
+  cutoff = (datetime.now() - timedelta(days=ttl_days)).strftime("%Y-%m-%d %H:%M:%S")
+  with closing(connect()) as conn, conn:
+    expired = [row[0] for row in conn.execute(
+      'SELECT result_id FROM result_sets WHERE created_at < ? '
+      'AND NOT EXISTS (SELECT 1 FROM outcomes o WHERE o.result_id = result_sets.result_id)',
+      (cutoff,)
+    )]
+    conn.executemany('DELETE FROM results WHERE result_id = ?', [(result_id,) for result_id in expired])
+    conn.executemany('DELETE FROM result_sets WHERE result_id = ?', [(result_id,) for result_id in expired])
+  for result_id in expired:
+    _cache_drop(result_id)
+  return len(expired)
+
+## Main-Func: Purge now, then every PURGE_SECONDS in a background thread
+_stop_purge = Event()
+
+def start_purge(ttl_days=RESULTS_TTL_DAYS, interval=PURGE_SECONDS):
+  purge_expired(ttl_days)
+  if ttl_days <= 0 or interval <= 0:
+    return
+
+  def run():
+    while not _stop_purge.wait(interval):
+      try:
+        purge_expired(ttl_days)
+      except sqlite3.Error:
+        pass # e.g. database locked, retried at the next interval
+
+  Thread(target=run, daemon=True, name='result-purge').start()
+
+# Func: Observed outcomes
+## Sub-Func: Row indexes not stored in a result set
+def missing_rows(result_id, row_indexes):
+  """Return the sorted row indexes without a stored row (chunked result sets can have gaps)"""
+  row_indexes = sorted(set(row_indexes))
+  with closing(connect()) as conn:
+    stored = {row[0] for row in conn.execute(
+      'SELECT row_index FROM results WHERE result_id = ? AND row_index IN (SELECT value FROM json_each(?))',
+      (result_id, json.dumps(row_indexes))
+    )}
+  return [row_index for row_index in row_indexes if row_index not in stored]
+
+## Sub-Func: Record outcomes (a new outcome of the same row replaces the old one)
+def add_outcomes(result_id, outcomes):
+  """Store (row_index, left) pairs of a result set, left is 1 when the employee changed jobs"""
+  recorded_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+  with closing(connect()) as conn, conn:
+    conn.executemany(
+      'INSERT OR REPLACE INTO outcomes (result_id, row_index, target, recorded_at) VALUES (?, ?, ?, ?)',
+      [(result_id, row_index, int(bool(left)), recorded_at) for row_index, left in outcomes]
+    )
+
+## Main-Func: Labeled rows for python -m training.update
+def load_outcomes(after_id=0):
+  """Return the stored fields, prediction, and observed target of every outcome with outcome_id > after_id"""
+  columns = ', '.join(f'r.{column}' for column in result_columns)
+  with closing(connect()) as conn:
+    df = pd.read_sql_query(
+      f'SELECT o.outcome_id, o.result_id, o.row_index, {columns}, o.target FROM outcomes o '
+      'JOIN results r ON r.result_id = o.result_id AND r.row_index = o.row_index '
+      'WHERE o.outcome_id > ? ORDER BY o.outcome_id',
+      conn, params=(after_id,)
+    )
+  df['relevant_experience'] = df['relevant_experience'].astype('boolean')
+  return df
+
+def outcome_stats():
+  with closing(connect()) as conn:
+    count, leavers, last_id = conn.execute('SELECT COUNT(*), COALESCE(SUM(target), 0), COALESCE(MAX(outcome_id), 0) FROM outcomes').fetchone()
+  return {'outcomes': count, 'leavers': leavers, 'last_outcome_id': last_id}
@@ -0,0 +1,106 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import metrics
+
+# Config
+PICKLE_DIR = os.getenv('PICKLE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pickle'))
+ARTIFACT_FORMAT = os.getenv('ARTIFACT_FORMAT', 'auto') # 'auto': bundle/ (see bundle.py) if exported, else the pickles
+
+# Columns
+oe_columns = ['relevant_experience', 'enrolled_university', 'education_level', 'experience', 'company_size', 'last_new_job']
+ohe_columns = ['gender', 'major_discipline', 'company_type']
+numerical_columns = ['city_development_index']
+## One hot columns (the dropped category, 'Other', is all zeros)
+gender_columns = [
+    "gender_Female",
+    "gender_Male"
+    ]
+major_discipline_columns = [
+    "major_discipline_Arts",
+    "major_discipline_Business Degree",
+    "major_discipline_Humanities",
+    "major_discipline_No Major",
+    "major_discipline_STEM"
+  ]
+company_type_columns = [
+    "company_type_Early Startup",
+    "company_type_Funded Startup",
+    "company_type_NGO",
+    "company_type_Public Sector",
+    "company_type_Pvt Ltd"
+  ]
+ohe_feature_columns = {
+    'gender': gender_columns,
+    'major_discipline': major_discipline_columns,
+    'company_type': company_type_columns
+  }
+## Model input order (same as training)
+features_columns = numerical_columns + oe_columns + gender_columns + major_discipline_columns + company_type_columns
+
+# Func: Load pickle
+def load_artifacts(pickle_dir=PICKLE_DIR, artifact_format=ARTIFACT_FORMAT):
+  """Load encoder, scaler, model and (if trained) the serve-time imputer"""
+  bundle_dir = os.path.join(pickle_dir, 'bundle')
+  if artifact_format == 'bundle' or (artifact_format == 'auto' and os.path.exists(os.path.join(bundle_dir, 'bundle.json'))):
+    import bundle
+    return bundle.load_bundle(bundle_dir)
+  artifacts = {
+    'ordinalencoder': joblib.load(os.path.join(pickle_dir, 'ordinalencoder.pkl')),
+    'minmaxscaler': joblib.load(os.path.join(pickle_dir, 'minmaxscaler.pkl')),
+    'model': joblib.load(os.path.join(pickle_dir, 'lclgbm.pkl')),
+    'imputer': None
+  }
+  imputer_path = os.path.join(pickle_dir, 'iterativeimputer.pkl')
+  if os.path.exists(imputer_path):
+    artifacts['imputer'] = joblib.load(imputer_path)
+  return artifacts
+
+# Func: Preprocess
+## Sub-Func: One hot encoding with missing values as NaN
+def one_hot(values, columns, prefix):
+  categories = np.array([col[len(prefix) + 1:] for col in columns], dtype=object)
+  values = values.to_numpy(dtype=object)
+  encoded = (values[:, None] == categories[None, :]).astype(float)
+  encoded[pd.isna(values)] = np.nan
+  return encoded
+
+## Main-Func: Encode, impute, and scale
+def preprocess_frame(df, artifacts):
+  """Turn a dataframe of EmployeeData fields into scaled model features (missing fields are imputed)"""
+  n = len(df)
+  features = np.empty((n, len(features_columns)), dtype=float)
+  # Numerical
+  features[:, 0] = pd.to_numeric(df['city_development_index'], errors='coerce').to_numpy(dtype=float)
+  # Ordinal Encoder oe_columns
+  with metrics.STAGE_SECONDS.time('ordinal_encoding'):
+    oe_values = df[oe_columns].astype(object)
+    oe_values = oe_values.where(oe_values.notna(), np.nan)
+    features[:, 1:1 + len(oe_columns)] = artifacts['ordinalencoder'].transform(oe_values)
+  # One Hot Encoding ohe_columns
+  with metrics.STAGE_SECONDS.time('one_hot_assembly'):
+    start = 1 + len(oe_columns)
+    for column in ohe_columns:
+      columns = ohe_feature_columns[column]
+      features[:, start:start + len(columns)] = one_hot(df[column], columns, column)
+      start += len(columns)
+  # MICE imputation (only when something is missing)
+  if np.isnan(features).any():
+    if artifacts.get('imputer') is None:
+      raise ValueError("Missing values can't be imputed: iterativeimputer.pkl is not available")
+    with metrics.STAGE_SECONDS.time('mice_imputation'):
+      features = artifacts['imputer'].transform(pd.DataFrame(features, columns=features_columns))
+  # Min Max Scaler
+  with metrics.STAGE_SECONDS.time('minmax_scaling'):
+    features = artifacts['minmaxscaler'].transform(pd.DataFrame(features, columns=features_columns))
+  return pd.DataFrame(features, columns=features_columns)
+
+# Func: Predict
+def predict_frame(features, artifacts):
+  """Return predicted labels and probabilities of leaving"""
+  model = artifacts['model']
+  with metrics.STAGE_SECONDS.time('model_inference'):
+    probabilities = model.predict_proba(features)[:, 1]
+  predictions = model.classes_[(probabilities > 0.5).astype(int)]
+  return predictions, probabilities
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+import pandas as pd
+import metrics
+import scoring
+
+# Config
+CACHE_SIZE = int(os.getenv('SENSITIVITY_CACHE_SIZE', '256')) # sweeps kept, keyed by (model version, field, roster hash)
+CDI_GRID = np.round(np.linspace(0.45, 0.95, 11), 2) # city development index values swept (range of aug_train.csv)
+HOLDOUT_ROSTER = 'holdout' # roster key of the scored holdout pool
+
+## EmployeeData fields that can be swept
+fields = scoring.numerical_columns + scoring.oe_columns + scoring.ohe_columns
+
+# Class
+## Class: LRU of sweeps
+class SweepCache:
+  def __init__(self, maxsize=CACHE_SIZE):
+    self.maxsize = maxsize
+    self._values = OrderedDict()
+    self._lock = Lock()
+
+  def get(self, key):
+    with self._lock:
+      value = self._values.get(key)
+      if value is not None:
+        self._values.move_to_end(key)
+      return value
+
+  def put(self, key, value):
+    with self._lock:
+      self._values[key] = value
+      self._values.move_to_end(key)
+      while len(self._values) > self.maxsize:
+        self._values.popitem(last=False)
+
+_cache = SweepCache()
+
+# Func: Sensitivity sweep
+## Sub-Func: Hash of a roster (dataframe of EmployeeData fields)
+def roster_hash(df):
+  records = df.astype(object).where(df.notna(), None).to_dict('records')
+  return hashlib.sha256(json.dumps(records, sort_keys=True, default=str).encode()).hexdigest()
+
+## Sub-Func: Values of a field and the scaled model features they set
+def field_grid(field, artifacts):
+  """Return (values, feature column indices, scaled feature values with one row per value)"""
+  if field in scoring.numerical_columns:
+    values = [float(value) for value in CDI_GRID]
+    columns = [field]
+    encoded = CDI_GRID[:, None]
+  elif field in scoring.oe_columns:
+    categories = artifacts['ordinalencoder'].categories_[scoring.oe_columns.index(field)]
+    values = [value.item() if isinstance(value, np.generic) else value for value in categories if not pd.isna(value)]
+    columns = [field]
+    encoded = np.arange(len(values), dtype=float)[:, None]
+  elif field in scoring.ohe_columns:
+    columns = scoring.ohe_feature_columns[field]
+    values = [column[len(field) + 1:] for column in columns]
+    encoded = np.eye(len(columns))
+  else:
+    raise ValueError(f"Unknown field {field}, expected one of {fields}")
+  index = [scoring.features_columns.index(column) for column in columns]
+  # The scaler works column by column, so the other columns don't matter
+  raw = np.zeros((len(values), len(scoring.features_columns)))
+  raw[:, index] = encoded
+  scaled = np.asarray(artifacts['minmaxscaler'].transform(pd.DataFrame(raw, columns=scoring.features_columns)))
+  return values, index, scaled[:, index]
+
+## Sub-Func: Probabilities of every row at every value of a field, in one model call
+def sweep(X, field, artifacts):
+  """Return (values, probabilities with one row per value and one column per roster row)"""
+  values, index, scaled = field_grid(field, artifacts)
+  grid = np.repeat(X[None, :, :], len(values), axis=0)
+  grid[:, :, index] = scaled[:, None, :]
+  with metrics.STAGE_SECONDS.time('sensitivity_sweep'):
+    probabilities = artifacts['model'].predict_proba(pd.DataFrame(grid.reshape(-1, X.shape[1]), columns=scoring.features_columns))[:, 1]
+  return values, probabilities.reshape(len(values), len(X))
+
+## Main-Func: Partial dependence and ICE curves, cached per (model version, field, roster)
+def partial_dependence(model, field, roster_key, features):
+  """
+  Return (sweep, cached): sweep has the swept 'values', the 'partial_dependence' (mean probability
+  at each value) and the 'ice' curves (one row of probabilities per roster row). features is a
+  function returning the scaled model features of the roster, only called on a cache miss.
+  """
+  key = (model.version, field, roster_key)
+  result = _cache.get(key)
+  if result is not None:
+    return result, True
+  X = np.asarray(features(), dtype=float)
+  if len(X) == 0:
+    raise ValueError("The roster is empty")
+  values, probabilities = sweep(X, field, model.artifacts)
+  result = {'values': values, 'partial_dependence': probabilities.mean(axis=1), 'ice': probabilities.T}
+  _cache.put(key, result)
+  return result, False
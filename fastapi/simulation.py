@@ -0,0 +1,87 @@
+import os
+import numpy as np
+
+# Config
+HOLDOUT_FILE = 'holdout.npz' # scaled test split written by python -m training.train
+MAX_COHORTS = 1_000_000
+PERCENTILES = [5, 25, 50, 75, 95, 99]
+
+# Func: Monte Carlo guarantee program simulation
+## Sub-Func: Load and score the holdout pool once per model version (registered as a registry warmer)
+def warm(model):
+  """Score the holdout pool of a model version, if it has one"""
+  path = os.path.join(model.path, HOLDOUT_FILE)
+  if not os.path.exists(path):
+    return
+  with np.load(path) as holdout:
+    X, y = holdout['X'], holdout['y']
+  model.cache['holdout'] = {
+    'X': X, # default roster of /sensitivity
+    'y_true': y.astype(np.int8),
+    'probability': model.artifacts['model'].predict_proba(X)[:, 1]
+  }
+
+## Sub-Func: Attrition rate of each cohort from its confusion matrix cells
+def attrition_rates(tn, fn):
+  """FN / (TN + FN) * 100: employees predicted to stay who left (0 when nobody is predicted to stay)"""
+  predicted_stay = tn + fn
+  return np.divide(fn * 100.0, predicted_stay, out=np.zeros(len(fn)), where=predicted_stay > 0)
+
+## Main-Func: Simulate cohorts
+def simulate_guarantee(y_true, y_pred, cohort_size, n_cohorts=10_000, mode='random', threshold=15,
+                       stay_share=0.75, seed=None):
+  """
+  Attrition rate statistics of random cohorts drawn from a scored pool, like random_guarantee and
+  stratify_guarantee in 2_Preprocessing_and_ML.ipynb.
+
+  A cohort's attrition rate only depends on how many of its employees fall in each confusion
+  matrix cell, and for a cohort drawn without replacement those counts follow a multivariate
+  hypergeometric distribution. Drawing the counts directly gives every cohort in one vectorized
+  call instead of scoring each cohort.
+
+  mode 'random' draws cohort_size employees from the whole pool, 'stratified' draws
+  int(cohort_size * stay_share) employees who stayed and the rest from employees who left.
+  A cohort fails when its attrition rate is at least threshold (%).
+  """
+  y_true = np.asarray(y_true).astype(bool)
+  y_pred = np.asarray(y_pred).astype(bool)
+  if n_cohorts < 1 or n_cohorts > MAX_COHORTS:
+    raise ValueError(f"n_cohorts must be between 1 and {MAX_COHORTS}")
+  rng = np.random.default_rng(seed)
+  # Confusion matrix cells of the pool, label 1 = leaving
+  tn = int((~y_true & ~y_pred).sum())
+  fp = int((~y_true & y_pred).sum())
+  fn = int((y_true & ~y_pred).sum())
+  tp = int((y_true & y_pred).sum())
+  if mode == 'random':
+    if cohort_size < 1 or cohort_size > len(y_true):
+      raise ValueError(f"cohort_size must be between 1 and the pool size ({len(y_true)})")
+    counts = rng.multivariate_hypergeometric([tn, fp, fn, tp], cohort_size, size=n_cohorts)
+    cohort_tn, cohort_fn = counts[:, 0], counts[:, 2]
+  elif mode == 'stratified':
+    stay_count = int(cohort_size * stay_share)
+    leave_count = cohort_size - stay_count
+    if stay_count > tn + fp or leave_count > fn + tp or cohort_size < 1:
+      raise ValueError(f"The pool has {tn + fp} staying and {fn + tp} leaving employees, "
+                       f"not enough for {stay_count} and {leave_count}")
+    cohort_tn = rng.multivariate_hypergeometric([tn, fp], stay_count, size=n_cohorts)[:, 0]
+    cohort_fn = rng.multivariate_hypergeometric([fn, tp], leave_count, size=n_cohorts)[:, 0]
+  else:
+    raise ValueError("mode must be 'random' or 'stratified'")
+
+  rates = attrition_rates(cohort_tn, cohort_fn)
+  failures = rates >= threshold
+  failure_rate = float(failures.mean())
+  return {
+    'mode': mode,
+    'cohort_size': cohort_size,
+    'n_cohorts': n_cohorts,
+    'threshold': threshold,
+    'pool': {'size': len(y_true), 'tn': tn, 'fp': fp, 'fn': fn, 'tp': tp},
+    'failures': int(failures.sum()),
+    'failure_rate': failure_rate,
+    'failure_rate_std_error': float(np.sqrt(failure_rate * (1 - failure_rate) / n_cohorts)),
+    'attrition_mean': float(rates.mean()),
+    'attrition_std': float(rates.std()),
+    'attrition_percentiles': dict(zip(map(str, PERCENTILES), np.percentile(rates, PERCENTILES).tolist()))
+  }
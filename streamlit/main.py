@@ -3,11 +3,23 @@ import pandas as pd
 import requests
 import base64
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from PIL import Image
+from mapping import single_mapping, mass_mapping, build_results_frame, roster_benchmark, sensitivity_frame
 
 # FastAPI Ngrok URL
 API_URL = st.secrets["FASTAPI_NGROK_URL"] # Replace with your FastAPI Ngrok URL
 
+# Mass prediction limits
+MAX_EMPLOYEES_PER_REQUEST = 50 # same as max_items in MassInputData (FastAPI)
+MAX_WORKERS = 8 # concurrent chunk requests
+MAX_RETRIES = 3 # attempts per failed chunk
+REQUEST_TIMEOUT = (10, 120) # seconds to connect and to wait for a response
+BACKOFF_SECONDS = 1 # first wait before retrying a chunk without Retry-After, doubled every attempt
+MAX_BACKOFF_SECONDS = 30
+
 # App Config
 st.set_page_config(page_title="Ascencio Course Selection", page_icon="🧩", layout="wide")
 img = Image.open("./streamlit/bg.png")
@@ -47,6 +59,23 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Function
+## HTTP Session
+@st.cache_resource
+def get_session():
+    """
+    Create a pooled HTTP session shared by every request to the FastAPI application
+
+    Returns
+    -------
+    requests.Session
+        A session whose connection pool is large enough for MAX_WORKERS concurrent requests
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 ## Check API Status
 def check_api_connection():
     """
@@ -58,7 +87,7 @@ def check_api_connection():
         A boolean indicating the status of the API connection
     """
     try:
-        response = requests.get(f'{API_URL}/')
+        response = get_session().get(f'{API_URL}/')
         return response.status_code == 200
     except:
         return False
@@ -74,7 +103,7 @@ def download_excel_template():
         The content of the Excel template if the API connection is successful, None otherwise
     """
     try:
-        response = requests.get(f'{API_URL}/create_excel_template')
+        response = get_session().get(f'{API_URL}/create_excel_template')
         if response.status_code == 200:
             return response.content
         else:
@@ -82,184 +111,235 @@ def download_excel_template():
     except:
         return None
 
-## Mapping Features
-def single_mapping(input_data):
+## Process Multiple Employees Data
+def retry_delay(response, attempt):
     """
-    Map the input data to the correct format for the FastAPI application.
+    Seconds to wait before retrying a failed request, or None if retrying can't help
 
     Parameters
     ----------
-    input_data : dict
-        A dictionary containing the input data
+    response : requests.Response or None
+        The failed response, None for a connection error or timeout
+    attempt : int
+        The number of the failed attempt (0 for the first)
 
     Returns
     -------
-    dict
-        A dictionary containing the mapped input data
-    """
-    # last_new_job
-    if input_data["last_new_job"] == "More than 4":
-        input_data["last_new_job"] = ">4"
-    elif input_data["last_new_job"] == "Never":
-        input_data["last_new_job"] = "never"
-    # experience
-    input_data["experience"] = str(input_data['experience'])
-    if input_data["experience"] == "0":
-        input_data["experience"] = "<1"
-    elif input_data["experience"] == "21":
-        input_data["experience"] = ">20"
-    # company_size
-    if input_data["company_size"] == "Less than 10":
-        input_data["company_size"] = "<10"
-    elif input_data["company_size"] == "10 to 49":
-        input_data["company_size"] = "10-49"
-    elif input_data["company_size"] == "50 to 99":
-        input_data["company_size"] = "50-99"
-    elif input_data["company_size"] == "100 to 499":
-        input_data["company_size"] = "100-500"
-    elif input_data["company_size"] == "500 to 999":
-        input_data["company_size"] = "500-999"
-    elif input_data["company_size"] == "1000 to 4999":
-        input_data["company_size"] = "1000-4999"
-    elif input_data["company_size"] == "5000 to 9999":
-        input_data["company_size"] = "5000-9999"
-    elif input_data["company_size"] == "More than 9999":
-        input_data["company_size"] = "10000+"
-    # relevant_experience
-    if input_data["relevant_experience"] == "Yes":
-        input_data["relevant_experience"] = True
-    else:
-        input_data["relevant_experience"] = False
-    return input_data
-
-## Process Excel File
-def mass_mapping(uploaded_file):
+    float or None
+        Retry-After of a 429 or 5xx response, else exponential backoff; None for other responses (e.g. 422)
     """
-    Process an Excel file containing mass input data.
+    if response is not None and response.status_code != 429 and response.status_code < 500:
+        return None
+    backoff = min(BACKOFF_SECONDS * 2 ** attempt, MAX_BACKOFF_SECONDS)
+    if response is None:
+        return backoff
+    try:
+        return min(float(response.headers.get('Retry-After', backoff)), MAX_BACKOFF_SECONDS)
+    except ValueError:
+        return backoff
+
+def error_response(response, message, attempt):
+    """Error result of a chunk, with retry_after when the chunk may be retried"""
+    error = {"status": "error", "message": message}
+    delay = retry_delay(response, attempt)
+    if delay is not None:
+        error["retry_after"] = delay
+    return error
+
+def predict_chunk(employees,session=None,result_id=None,offset=0,attempt=0):
+    """
+    Preprocess and predict one API-sized chunk of employees.
 
     Parameters
     ----------
-    uploaded_file : file
-        The Excel file containing the mass input data
+    employees : list
+        A list of at most MAX_EMPLOYEES_PER_REQUEST dictionaries containing employee data.
+    session : requests.Session, optional
+        The pooled session to use, so worker threads don't touch Streamlit's cache (default is get_session()).
+    result_id : str, optional
+        The server-side result set to store the predictions in (default is a new result set).
+    offset : int, optional
+        The position of the first employee of this chunk in the whole upload (default is 0).
+    attempt : int, optional
+        The number of previous attempts of this chunk, for the retry backoff (default is 0).
 
     Returns
     -------
-    dict or list
-        A dictionary containing the error message if there is an error, or a list of dictionaries containing the mapped input data
+    dict
+        A dictionary containing the prediction results or an error message
+        (with retry_after when the error is a connection error, a timeout, 429 or 5xx).
     """
     try:
-        # Read excel file
-        df = pd.read_excel(uploaded_file)
-        # Check required columns
-        required_columns = [
-            'Full Name', 'Gender', 'Enrolled University', 'Work Experience', 
-            'Data Science Experience', 'Duration of Last New Job', 'Education Level', 
-            'Major Discipline', 'City Development Index', 'Company Size', 'Company Type'
-        ]
-        for column in required_columns:
-            if column not in df.columns:
-                return {"status": "error", "message": f"Missing required column: {column}"}
-        # Drop NA
-        shape_old = df.shape[0]
-        df = df.dropna()
-        shape_new = df.shape[0]
-        if shape_old != shape_new:
-            return {"status": "error", "message": "There are missing values in the dataset"}
-        # Map column names
-        column_mapping = {
-            'Full Name': 'full_name',
-            'Gender': 'gender',
-            'Enrolled University': 'enrolled_university',
-            'Work Experience': 'experience',
-            'Data Science Experience': 'relevant_experience',
-            'Duration of Last New Job': 'last_new_job',
-            'Education Level': 'education_level',
-            'Major Discipline': 'major_discipline',
-            'City Development Index': 'city_development_index',
-            'Company Size': 'company_size',
-            'Company Type': 'company_type'
-        }
-        df = df.rename(columns=column_mapping)
-        # Map values
-        # last_new_job
-        df['last_new_job'] = df['last_new_job'].astype(str)
-        df['last_new_job'] = df['last_new_job'].apply(lambda x: ">4" if x == "More than 4" else ("never" if x == "Never" else x))
-        # experience
-        df['experience'] = df['experience'].astype(str)
-        df['experience'] = df['experience'].apply(lambda x: "<1" if x == "0" else (">20" if x == "21" else x))
-        # company_size
-        company_size_mapping = {
-            'Less than 10': '<10',
-            '10 to 49': '10-49',
-            '50 to 99': '50-99',
-            '100 to 499': '100-500',
-            '500 to 999': '500-999',
-            '1000 to 4999': '1000-4999',
-            '5000 to 9999': '5000-9999',
-            'More than 9999': '10000+'
-        }
-        df['company_size'] = df['company_size'].map(company_size_mapping)
-        # relevant_experience
-        relevant_experience_mapping = {
-            'Yes': True,
-            'No': False
-        }
-        df['relevant_experience'] = df['relevant_experience'].map(relevant_experience_mapping)
-        # Order columns by alphabet
-        df = df[[
-            'city_development_index', 'company_size', 'company_type', 'education_level', 'enrolled_university', 'experience', 'full_name', 'gender', 'last_new_job', 'major_discipline', 'relevant_experience'
-        ]]
-        # Convert to JSON
-        records = df.to_dict('records')
-        return records
+        session = session or get_session()
+        # Preprocess
+        preprocess_response = session.post(
+            f'{API_URL}/preprocess', 
+            json={"employees": employees},
+            timeout=REQUEST_TIMEOUT
+            )
+        if preprocess_response.status_code != 200:
+            try:
+                message = preprocess_response.json()
+            except ValueError:
+                message = preprocess_response.text
+            return error_response(preprocess_response, message, attempt)
+        # Predict
+        params = {"offset": offset}
+        if result_id:
+            params["result_id"] = result_id
+        predict_response = session.post(
+            f'{API_URL}/predict', 
+            json=preprocess_response.json(),
+            params=params,
+            timeout=REQUEST_TIMEOUT
+            )
+        if predict_response.status_code != 200:
+            return error_response(predict_response, "Failed to predict data", attempt)
+        # Output      
+        return predict_response.json()
+    except (requests.ConnectionError, requests.Timeout) as e:
+        return error_response(None, str(e), attempt)
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-## Process Multiple Employees Data
-def preprocess_and_predict(employee_data,mass=False):
+def preprocess_and_predict(employee_data,mass=False,progress_callback=None):
     """
     Preprocesses the employee data and predicts the likelihood of a job change.
 
+    Mass input is split into chunks of MAX_EMPLOYEES_PER_REQUEST employees which 
+    are submitted concurrently (MAX_WORKERS at a time). Chunks failing with a connection 
+    error, a timeout, 429, or 5xx are retried individually up to MAX_RETRIES times, after 
+    their Retry-After (or an exponential backoff); other errors (e.g. 422) are returned at 
+    once. The results are merged back in input order.
+
     Parameters
     ----------
     employee_data : dict or list
         A dictionary or list of dictionaries containing employee data to be preprocessed.
     mass : bool, optional
         A boolean indicating whether to process multiple employees at once (default is False).
+    progress_callback : callable, optional
+        Called with (finished_chunks, total_chunks) every time a chunk finishes (default is None).
 
     Returns
     -------
     dict
         A dictionary containing the prediction results or an error message.
     """
+    if not mass:
+        return predict_chunk([employee_data])
+    # Error from mass_mapping
+    if isinstance(employee_data, dict):
+        return employee_data
+    if not employee_data:
+        return {"status": "error", "message": "There is no employee data in the uploaded file"}
+    # Split into API-sized chunks
+    chunks = [
+        employee_data[i:i + MAX_EMPLOYEES_PER_REQUEST] 
+        for i in range(0, len(employee_data), MAX_EMPLOYEES_PER_REQUEST)
+        ]
+    session = get_session()
+    # Create one result set for the whole upload
     try:
-        # Preprocess
-        if mass:
-            preprocess_response = requests.post(
-                f'{API_URL}/preprocess', 
-                json={"employees": employee_data}
-                )
-        else:
-            preprocess_response = requests.post(
-                f'{API_URL}/preprocess', 
-                json={"employees": [employee_data]}
-                )
-        if preprocess_response.status_code != 200:
-            return {"status": "error", "message": preprocess_response.json()}
-        # Predict
-        predict_response = requests.post(
-            f'{API_URL}/predict', 
-            json=preprocess_response.json()
-            )
-        if predict_response.status_code != 200:
-            return {"status": "error", "message": "Failed to predict data"}
-        # Output      
-        return predict_response.json()
+        result_response = session.post(f'{API_URL}/results', timeout=REQUEST_TIMEOUT)
+        if result_response.status_code != 200:
+            return {"status": "error", "message": "Failed to create result set"}
+        result_id = result_response.json()["result_id"]
     except Exception as e:
         return {"status": "error", "message": str(e)}
+    chunk_results = [None] * len(chunks)
+    pending = list(range(len(chunks)))
+    finished = 0
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(chunks))) as executor:
+        for attempt in range(MAX_RETRIES):
+            futures = {executor.submit(predict_chunk, chunks[i], session, result_id, i * MAX_EMPLOYEES_PER_REQUEST, attempt): i for i in pending}
+            pending = []
+            for future in as_completed(futures):
+                i = futures[future]
+                chunk_results[i] = future.result()
+                if chunk_results[i].get('status') == 'error':
+                    pending.append(i)
+                else:
+                    finished += 1
+                    if progress_callback:
+                        progress_callback(finished, len(chunks))
+            # Stop at errors that retrying can't fix
+            if not pending or any('retry_after' not in chunk_results[i] for i in pending):
+                break
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(max(chunk_results[i]['retry_after'] for i in pending))
+    # Chunks still failing after retries
+    if pending:
+        # Report a chunk that can't succeed first, else the first chunk out of retries
+        not_retryable = [i for i in pending if 'retry_after' not in chunk_results[i]]
+        retryable = not not_retryable
+        first = min(not_retryable or pending)
+        start = first * MAX_EMPLOYEES_PER_REQUEST + 1
+        end = start + len(chunks[first]) - 1
+        return {
+            "status": "error", 
+            "message": f"Failed to predict employees {start} to {end}" + (f" after {MAX_RETRIES} attempts" if retryable else "") + f": {chunk_results[first].get('message')}"
+            }
+    # Merge in input order
+    results = []
+    for result in chunk_results:
+        results.extend(result.get('results', []))
+    return {"status": "success", "result_id": result_id, "results": results}
+
+## Population Baseline
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_population_baseline(dimension):
+    """
+    Get the population leave rate per category of a field from the population cube of the FastAPI application
+
+    Parameters
+    ----------
+    dimension : str
+        The field to group by
+
+    Returns
+    -------
+    tuple
+        (POST /population response, city development index bin edges), or None if the cube is not available
+    """
+    try:
+        session = get_session()
+        cube = session.get(f'{API_URL}/population')
+        population = session.post(f'{API_URL}/population', json={"group_by": [dimension]})
+        if cube.status_code != 200 or population.status_code != 200:
+            return None
+        return population.json(), cube.json()["cdi_edges"]
+    except Exception:
+        return None
+
+## Sensitivity Sweep
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_sensitivity(result_id, field):
+    """
+    Get the partial dependence and ICE curves of the stored results over the values of a field
+
+    Parameters
+    ----------
+    result_id : str
+        The ID of the stored prediction results
+    field : str
+        The field to sweep
+
+    Returns
+    -------
+    dict
+        The POST /sensitivity response, or None if it failed
+    """
+    try:
+        response = get_session().post(f'{API_URL}/sensitivity', json={"field": field, "result_id": result_id, "ice_rows": 10})
+        if response.status_code != 200:
+            return None
+        return response.json()
+    except Exception:
+        return None
 
 ## Ask LLM AI
-def ask_ai(request,df_dict):
+def ask_ai(request,result_id):
     """
     Ask AI a question based on employee data
 
@@ -267,8 +347,8 @@ def ask_ai(request,df_dict):
     ----------
     request : str
         The question to ask the AI
-    df_dict : dict
-        A dictionary containing the results dataframe
+    result_id : str
+        The ID of the prediction results stored by the FastAPI application
 
     Returns
     -------
@@ -279,9 +359,9 @@ def ask_ai(request,df_dict):
         # API request payload
         payload = {
             "question": request,
-            "df_dict": df_dict
+            "result_id": result_id
         }
-        ai_response = requests.post(
+        ai_response = get_session().post(
             f'{API_URL}/ai_ask', 
             json=payload
             )
@@ -306,8 +386,8 @@ def initialize_session_state():
         st.session_state.page = 'landing'
     if 'prediction_results' not in st.session_state:
         st.session_state.prediction_results = None
-    if 'dataframe_results' not in st.session_state:
-        st.session_state.dataframe_results = None
+    if 'result_id' not in st.session_state:
+        st.session_state.result_id = None
 
 ## Navigation
 def navigate_to(page):
@@ -524,6 +604,7 @@ def single_input_page():
                         st.error(f"Error: {result.get('message')}")
                     else:
                         st.session_state.prediction_results = result
+                        st.session_state.result_id = result.get('result_id')
                         check = True # show button
     if check:
         st.button("Navigate to Prediction Results", key='single_pred', on_click=navigate_to, args=('prediction_results',))
@@ -539,9 +620,11 @@ def mass_input_page():
     uploaded, the data is preprocessed and predictions are made. If successful, 
     the user can navigate to the prediction results page.
 
-    The template supports up to 50 employees per prediction. The function 
-    ensures that all necessary fields are provided and handles errors if the 
-    template cannot be retrieved or if prediction processing fails.
+    Uploads of any size are split into chunks of MAX_EMPLOYEES_PER_REQUEST 
+    employees and submitted concurrently, with a progress bar showing finished 
+    chunks. The function ensures that all necessary fields are provided and 
+    handles errors if the template cannot be retrieved or if prediction 
+    processing fails.
 
     """
     display_header()
@@ -556,7 +639,7 @@ def mass_input_page():
         with st.expander("Tutorial How to Use Mass Employee Prediction"):
             st.markdown("""
             1. Download the template
-            2. Fill in the data. Maximum 50 employees for each predictions
+            2. Fill in the data. Large files are sent to the API in batches of 50 employees. Unknown values (except Full Name) can be left empty
             3. Upload the completed template
             """)
         st.markdown('<br>', unsafe_allow_html=True)
@@ -576,11 +659,16 @@ def mass_input_page():
         if uploaded_file:
             with st.spinner("Processing..."):
                 employee_data = mass_mapping(uploaded_file)
-                result = preprocess_and_predict(employee_data,mass=True)
+                progress_bar = st.progress(0, text="Predicting employees...")
+                def update_progress(finished, total):
+                    progress_bar.progress(finished / total, text=f"Predicted {finished} of {total} batches")
+                result = preprocess_and_predict(employee_data,mass=True,progress_callback=update_progress)
+                progress_bar.empty()
                 if result.get('status') == 'error':
                     st.error(f"Error: {result.get('message')}")
                 else:
                     st.session_state.prediction_results = result
+                    st.session_state.result_id = result.get('result_id')
                     check = True # show button
                     st.markdown('<br>', unsafe_allow_html=True)
         if check:
@@ -614,45 +702,7 @@ def prediction_results_page():
     
     # Make dataframe
     results = st.session_state.prediction_results.get("results", [])
-    results_data = []
-    for result in results:
-        original_data = result.get("original_data", {})
-        prediction = result.get("prediction", "N/A")
-        probability = result.get("probability", "N/A")
-        result_dict = {
-            "Full Name": original_data.get("full_name", "N/A"),
-            "Gender": original_data.get("gender", "N/A"),
-            "Enrolled University": original_data.get("enrolled_university", "N/A"),
-            "Work Experience": original_data.get("experience", "N/A"),
-            "Data Science Experience": "Yes" if original_data.get("relevant_experience", "N/A") else "No",
-            "Duration of Last New Job": "Never" if original_data.get("last_new_job", "N/A") == "never" 
-                                        else "More than 4 years" if original_data.get("last_new_job", "N/A") == ">4" 
-                                        else original_data.get('last_new_job', "N/A"),
-            "Education Level": original_data.get("education_level", "N/A"),
-            "Major Discipline": original_data.get("major_discipline", "N/A"),
-            "City Development Index": original_data.get("city_development_index", "N/A"),
-            "Company Size": "Less than 10" if original_data.get("company_size", "N/A") == "<10"
-                            else "10 to 49" if original_data.get("company_size", "N/A") == "10-49"
-                            else "50 to 99" if original_data.get("company_size", "N/A") == "50-99"
-                            else "100 to 499" if original_data.get("company_size", "N/A") == "100-500"
-                            else "500 to 999" if original_data.get("company_size", "N/A") == "500-999"
-                            else "1000 to 4999" if original_data.get("company_size", "N/A") == "1000-4999"
-                            else "5000 to 9999" if original_data.get("company_size", "N/A") == "5000-9999"
-                            else "More than 9999" if original_data.get("company_size", "N/A") == "10000+"
-                            else original_data.get("company_size", "N/A"),
-            "Company Type": original_data.get("company_type", "N/A"),
-            "Probability of Leaving": f"{probability:06.2%}",
-            "Prediction": "Leave" if prediction == 1 else "Stay"
-        }
-        results_data.append(result_dict)
-    df = pd.DataFrame(results_data)
-
-    # prepare dataset for AI
-    df_results = df.copy()
-    df_results["Probability of Leaving"] = df_results["Probability of Leaving"].str.rstrip("%").astype(float)
-    df_results["Work Experience"] = df_results["Work Experience"].apply(lambda x: 0 if x == '<1' else 21 if x == '>20' else int(x))
-    df_results["Duration of Last New Job"] = df_results["Duration of Last New Job"].apply(lambda x: 0 if x == 'Never' else 5 if x == 'More than 4 years' else int(x))
-    st.session_state.dataframe_results = df_results
+    df = build_results_frame(results)
 
     st.markdown('<br>', unsafe_allow_html=True)
     
@@ -728,6 +778,54 @@ def prediction_results_page():
     
     st.markdown("---")
 
+    # Population benchmark
+    st.markdown('<h2 class="sub-title">Population Benchmark</h2>', unsafe_allow_html=True)
+    dimensions = {
+        "Education Level": "education_level",
+        "Work Experience": "experience",
+        "Company Size": "company_size",
+        "Company Type": "company_type",
+        "City Development Index": "city_development_index",
+        "Gender": "gender",
+        "Major Discipline": "major_discipline",
+        "Enrolled University": "enrolled_university",
+        "Data Science Experience": "relevant_experience",
+        "Duration of Last New Job": "last_new_job"
+    }
+    col1, col2, col3 = st.columns(3)
+    with col2:
+        dimension_label = st.selectbox("Compare by", list(dimensions), key="benchmark_dimension")
+    baseline = get_population_baseline(dimensions[dimension_label])
+    if baseline is None:
+        st.info("Population benchmark is not available.")
+    else:
+        population, cdi_edges = baseline
+        df_benchmark = roster_benchmark(results, dimensions[dimension_label], population, cdi_edges)
+        col1, col2, col3 = st.columns([1,13,1])
+        with col2:
+            st.bar_chart(df_benchmark[["Population Leave Rate", "Roster Predicted Leave Rate"]], stack=False)
+            st.caption(f"Population: {population['count']} employees of the training data, leave rate {population['leave_rate']:.2%}. "
+                       "Roster: mean predicted probability of leaving.")
+
+    st.markdown("---")
+
+    # Sensitivity
+    st.markdown('<h2 class="sub-title">Sensitivity</h2>', unsafe_allow_html=True)
+    col1, col2, col3 = st.columns(3)
+    with col2:
+        sensitivity_label = st.selectbox("Change", list(dimensions), key="sensitivity_dimension")
+    sensitivity = get_sensitivity(st.session_state.result_id, dimensions[sensitivity_label]) if st.session_state.result_id else None
+    if sensitivity is None:
+        st.info("Sensitivity is not available.")
+    else:
+        col1, col2, col3 = st.columns([1,13,1])
+        with col2:
+            st.line_chart(sensitivity_frame(sensitivity))
+            st.caption(f"Probability of leaving if every employee had each {sensitivity_label} value: average over the "
+                       f"{sensitivity['rows']} employees (partial dependence) and the first employees (ICE).")
+
+    st.markdown("---")
+
     # Ask AI
     st.markdown('<h2 class="sub-title">Ask AI</h2>', unsafe_allow_html=True)
     col1, col2, col3 = st.columns(3)
@@ -737,7 +835,7 @@ def prediction_results_page():
     if button and request:
         with st.spinner("AI is thinking. It may take up to 3 minutes..."):
             with st.container(border=True):
-                response = ask_ai(request, st.session_state.dataframe_results.to_dict())
+                response = ask_ai(request, st.session_state.result_id)
                 if response["status"] == "error":
                     st.write(response['input'].message)
                 else:
@@ -0,0 +1,278 @@
+"""
+Pure data helpers of the Streamlit application (no Streamlit calls, importable by the benchmarks).
+"""
+import pandas as pd
+
+## Mapping Features
+def single_mapping(input_data):
+    """
+    Map the input data to the correct format for the FastAPI application.
+
+    Parameters
+    ----------
+    input_data : dict
+        A dictionary containing the input data
+
+    Returns
+    -------
+    dict
+        A dictionary containing the mapped input data
+    """
+    # last_new_job
+    if input_data["last_new_job"] == "More than 4":
+        input_data["last_new_job"] = ">4"
+    elif input_data["last_new_job"] == "Never":
+        input_data["last_new_job"] = "never"
+    # experience
+    input_data["experience"] = str(input_data['experience'])
+    if input_data["experience"] == "0":
+        input_data["experience"] = "<1"
+    elif input_data["experience"] == "21":
+        input_data["experience"] = ">20"
+    # company_size
+    if input_data["company_size"] == "Less than 10":
+        input_data["company_size"] = "<10"
+    elif input_data["company_size"] == "10 to 49":
+        input_data["company_size"] = "10-49"
+    elif input_data["company_size"] == "50 to 99":
+        input_data["company_size"] = "50-99"
+    elif input_data["company_size"] == "100 to 499":
+        input_data["company_size"] = "100-500"
+    elif input_data["company_size"] == "500 to 999":
+        input_data["company_size"] = "500-999"
+    elif input_data["company_size"] == "1000 to 4999":
+        input_data["company_size"] = "1000-4999"
+    elif input_data["company_size"] == "5000 to 9999":
+        input_data["company_size"] = "5000-9999"
+    elif input_data["company_size"] == "More than 9999":
+        input_data["company_size"] = "10000+"
+    # relevant_experience
+    if input_data["relevant_experience"] == "Yes":
+        input_data["relevant_experience"] = True
+    else:
+        input_data["relevant_experience"] = False
+    return input_data
+
+## Process Excel File
+def to_text(value):
+    """
+    Convert an Excel cell to text, so numbers read as float because of empty cells (1.0) become '1'.
+
+    Parameters
+    ----------
+    value : any
+        The cell value
+
+    Returns
+    -------
+    str
+        The cell value as text
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def mass_mapping(uploaded_file):
+    """
+    Process an Excel file containing mass input data.
+
+    Parameters
+    ----------
+    uploaded_file : file
+        The Excel file containing the mass input data
+
+    Returns
+    -------
+    dict or list
+        A dictionary containing the error message if there is an error, or a list of dictionaries containing the mapped input data.
+        Empty cells (except Full Name) are sent as null and imputed by the FastAPI application.
+    """
+    try:
+        # Read excel file
+        df = pd.read_excel(uploaded_file)
+        # Check required columns
+        required_columns = [
+            'Full Name', 'Gender', 'Enrolled University', 'Work Experience', 
+            'Data Science Experience', 'Duration of Last New Job', 'Education Level', 
+            'Major Discipline', 'City Development Index', 'Company Size', 'Company Type'
+        ]
+        for column in required_columns:
+            if column not in df.columns:
+                return {"status": "error", "message": f"Missing required column: {column}"}
+        # Drop empty rows, other missing values are imputed by the API
+        df = df.dropna(how='all')
+        if df['Full Name'].isna().any():
+            return {"status": "error", "message": "There are missing values in Full Name"}
+        # Map column names
+        column_mapping = {
+            'Full Name': 'full_name',
+            'Gender': 'gender',
+            'Enrolled University': 'enrolled_university',
+            'Work Experience': 'experience',
+            'Data Science Experience': 'relevant_experience',
+            'Duration of Last New Job': 'last_new_job',
+            'Education Level': 'education_level',
+            'Major Discipline': 'major_discipline',
+            'City Development Index': 'city_development_index',
+            'Company Size': 'company_size',
+            'Company Type': 'company_type'
+        }
+        df = df.rename(columns=column_mapping)
+        # Map values
+        # last_new_job
+        df['last_new_job'] = df['last_new_job'].map(to_text, na_action='ignore')
+        df['last_new_job'] = df['last_new_job'].map(lambda x: ">4" if x == "More than 4" else ("never" if x == "Never" else x), na_action='ignore')
+        # experience
+        df['experience'] = df['experience'].map(to_text, na_action='ignore')
+        df['experience'] = df['experience'].map(lambda x: "<1" if x == "0" else (">20" if x == "21" else x), na_action='ignore')
+        # company_size
+        company_size_mapping = {
+            'Less than 10': '<10',
+            '10 to 49': '10-49',
+            '50 to 99': '50-99',
+            '100 to 499': '100-500',
+            '500 to 999': '500-999',
+            '1000 to 4999': '1000-4999',
+            '5000 to 9999': '5000-9999',
+            'More than 9999': '10000+'
+        }
+        # relevant_experience
+        relevant_experience_mapping = {
+            'Yes': True,
+            'No': False
+        }
+        # Only empty cells become null, unknown labels are errors
+        for column, label, mapping in [
+            ('company_size', 'Company Size', company_size_mapping),
+            ('relevant_experience', 'Data Science Experience', relevant_experience_mapping)
+        ]:
+            mapped = df[column].map(mapping)
+            unmapped = df[column].notna() & mapped.isna()
+            if unmapped.any():
+                labels = sorted(set(df.loc[unmapped, column].map(repr)))
+                return {"status": "error", "message": f"Unknown values in {label}: {', '.join(labels)}, expected one of {', '.join(mapping)}"}
+            df[column] = mapped
+        # Order columns by alphabet
+        df = df[[
+            'city_development_index', 'company_size', 'company_type', 'education_level', 'enrolled_university', 'experience', 'full_name', 'gender', 'last_new_job', 'major_discipline', 'relevant_experience'
+        ]]
+        # Convert to JSON (missing values as null)
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        return records
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+## Make Results Dataframe
+def build_results_frame(results):
+    """
+    Make the dataframe shown in the prediction results page.
+
+    Parameters
+    ----------
+    results : list
+        The results returned by the FastAPI application
+
+    Returns
+    -------
+    pd.DataFrame
+        A dataframe with one row per employee and readable values
+    """
+    results_data = []
+    for result in results:
+        original_data = result.get("original_data", {})
+        prediction = result.get("prediction", "N/A")
+        probability = result.get("probability", "N/A")
+        result_dict = {
+            "Full Name": original_data.get("full_name", "N/A"),
+            "Gender": original_data.get("gender", "N/A"),
+            "Enrolled University": original_data.get("enrolled_university", "N/A"),
+            "Work Experience": original_data.get("experience", "N/A"),
+            "Data Science Experience": {True: "Yes", False: "No"}.get(original_data.get("relevant_experience"), "N/A"),
+            "Duration of Last New Job": "Never" if original_data.get("last_new_job", "N/A") == "never" 
+                                        else "More than 4 years" if original_data.get("last_new_job", "N/A") == ">4" 
+                                        else original_data.get('last_new_job', "N/A"),
+            "Education Level": original_data.get("education_level", "N/A"),
+            "Major Discipline": original_data.get("major_discipline", "N/A"),
+            "City Development Index": original_data.get("city_development_index", "N/A"),
+            "Company Size": "Less than 10" if original_data.get("company_size", "N/A") == "<10"
+                            else "10 to 49" if original_data.get("company_size", "N/A") == "10-49"
+                            else "50 to 99" if original_data.get("company_size", "N/A") == "50-99"
+                            else "100 to 499" if original_data.get("company_size", "N/A") == "100-500"
+                            else "500 to 999" if original_data.get("company_size", "N/A") == "500-999"
+                            else "1000 to 4999" if original_data.get("company_size", "N/A") == "1000-4999"
+                            else "5000 to 9999" if original_data.get("company_size", "N/A") == "5000-9999"
+                            else "More than 9999" if original_data.get("company_size", "N/A") == "10000+"
+                            else original_data.get("company_size", "N/A"),
+            "Company Type": original_data.get("company_type", "N/A"),
+            "Probability of Leaving": f"{probability:06.2%}",
+            "Prediction": "Leave" if prediction == 1 else "Stay"
+        }
+        results_data.append(result_dict)
+    return pd.DataFrame(results_data)
+
+## Compare Roster with Population
+def roster_benchmark(results, dimension, population, cdi_edges):
+    """
+    Compare the predicted leave rate of the scored roster with the population leave rate per category.
+
+    Parameters
+    ----------
+    results : list
+        The results returned by the FastAPI application
+    dimension : str
+        The field to group by (a dimension of the population cube)
+    population : dict
+        The response of POST /population grouped by dimension
+    cdi_edges : list
+        The city development index bin edges of the population cube
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per category with the population leave rate, the roster's mean probability of leaving,
+        and the number of employees of the roster
+    """
+    values = []
+    for result in results:
+        value = result.get("original_data", {}).get(dimension)
+        if value is None:
+            values.append("missing")
+        elif dimension == "city_development_index":
+            # Same bins and labels as training/cube.py
+            labels = [f"<{cdi_edges[0]}"] + [f"{low}-{high}" for low, high in zip(cdi_edges[:-1], cdi_edges[1:])] + [f">={cdi_edges[-1]}"]
+            values.append(labels[sum(value >= edge for edge in cdi_edges)])
+        else:
+            values.append(str(value))
+    roster = pd.DataFrame({"Category": values, "probability": [result.get("probability", 0) for result in results]})
+    roster = roster.groupby("Category")["probability"].agg(["mean", "size"])
+    baseline = pd.DataFrame(population.get("groups", [])).rename(columns={dimension: "Category"}).set_index("Category")
+    df = baseline[["leave_rate"]].join(roster, how="outer")
+    df.columns = ["Population Leave Rate", "Roster Predicted Leave Rate", "Roster Employees"]
+    df["Roster Employees"] = df["Roster Employees"].fillna(0).astype(int)
+    return df
+
+## Sensitivity Chart
+def sensitivity_frame(sensitivity, max_curves=10):
+    """
+    Arrange the partial dependence and the first ICE curves of a sensitivity sweep for a line chart.
+
+    Parameters
+    ----------
+    sensitivity : dict
+        The response of POST /sensitivity
+    max_curves : int, optional
+        Number of employees whose ICE curve is shown (default is 10)
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per swept value, with the "Average" (partial dependence) column and one column per employee
+    """
+    df = pd.DataFrame({"Average": sensitivity["partial_dependence"]}, index=[str(value) for value in sensitivity["values"]])
+    for i, curve in enumerate(sensitivity.get("ice", [])[:max_curves]):
+        name = curve.get("full_name") or f"Employee {i + 1}"
+        while name in df.columns:
+            name = f"{name} ({i + 1})"
+        df[name] = curve["probabilities"]
+    df.index.name = "Value"
+    return df
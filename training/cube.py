@@ -0,0 +1,145 @@
+"""
+Population statistics cube of aug_train.csv.
+
+Counts employees and leavers (target 1) for every combination of the
+categorical features and a city development index bin that occurs in the
+data. The cube stores only those cells (a few thousand, instead of the tens of
+millions of the full cross product) as one row of category codes each, so the
+service answers any group-by or slice of the population by aggregating the
+cells instead of scanning the CSV. Missing values are their own category.
+
+Usage (from the repository root):
+    python -m training.cube
+    python -m training.cube --data Data/aug_train.csv --out fastapi/pickle/cube.npz
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from training import data
+from training.stages import relevant_experience_cats
+
+DIMENSIONS = ['city_development_index', 'gender', 'relevant_experience', 'enrolled_university', 'education_level',
+              'major_discipline', 'experience', 'company_size', 'company_type', 'last_new_job']
+CDI_EDGES = [0.5, 0.6, 0.7, 0.8, 0.9]
+MISSING = 'missing'
+
+
+def cdi_labels(edges=CDI_EDGES):
+    """
+    Labels of the city development index bins.
+
+    Parameters
+    ----------
+    edges : list, optional
+        Inner bin edges (default is CDI_EDGES)
+
+    Returns
+    -------
+    list
+        '<0.5', '0.5-0.6', ..., '>=0.9'
+    """
+    return [f'<{edges[0]}'] + [f'{low}-{high}' for low, high in zip(edges[:-1], edges[1:])] + [f'>={edges[-1]}']
+
+
+def dimension_values(df, dimension, edges=CDI_EDGES):
+    """
+    Category labels of one dimension, as strings with missing values as MISSING.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The training data loaded by data.load()
+    dimension : str
+        One of DIMENSIONS
+
+    Returns
+    -------
+    tuple
+        (values, categories) with categories in display order (ordinal order for ordered features)
+    """
+    values = df[dimension]
+    missing = values.isna().to_numpy()
+    if dimension == 'city_development_index':
+        categories = cdi_labels(edges)
+        labels = np.array(categories, dtype=object)[np.digitize(values.fillna(0).to_numpy(dtype=float), edges)]
+    else:
+        labels = values.astype(object).map(str).to_numpy(dtype=object)
+        if dimension == 'relevant_experience':
+            categories = [str(cat) for cat in relevant_experience_cats]
+        elif dimension in data.ordered_categories:
+            categories = list(data.ordered_categories[dimension])
+        else:
+            categories = sorted(set(labels[~missing]))
+    labels[missing] = MISSING
+    return labels, categories + [MISSING]
+
+
+def build_cube(df, edges=CDI_EDGES):
+    """
+    Aggregate the training data into the non-empty cells of the cube.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The training data loaded by data.load() (with target)
+    edges : list, optional
+        Inner bin edges of the city development index (default is CDI_EDGES)
+
+    Returns
+    -------
+    dict
+        'dimensions', 'categories' ({dimension: labels}), 'cdi_edges', 'rows', and per cell
+        'codes' (one category code per dimension), 'count' and 'leavers'
+    """
+    codes = np.empty((len(df), len(DIMENSIONS)), dtype=np.uint8)
+    categories = {}
+    for j, dimension in enumerate(DIMENSIONS):
+        labels, categories[dimension] = dimension_values(df, dimension, edges)
+        codes[:, j] = pd.Categorical(labels, categories=categories[dimension]).codes
+    cells, inverse = np.unique(codes, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    return {
+        'dimensions': DIMENSIONS,
+        'categories': categories,
+        'cdi_edges': list(edges),
+        'rows': len(df),
+        'codes': cells,
+        'count': np.bincount(inverse, minlength=len(cells)).astype(np.int32),
+        'leavers': np.bincount(inverse, weights=df['target'].to_numpy(dtype=float), minlength=len(cells)).astype(np.int32),
+    }
+
+
+def save_cube(cube, path):
+    """
+    Write the cube as an .npz file (cell arrays plus the JSON metadata), atomically.
+
+    Parameters
+    ----------
+    cube : dict
+        Output of build_cube()
+    path : str
+        Path of the .npz file
+    """
+    meta = {key: cube[key] for key in ('dimensions', 'categories', 'cdi_edges', 'rows')}
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez_compressed(tmp_path, codes=cube['codes'], count=cube['count'], leavers=cube['leavers'], meta=np.array(json.dumps(meta)))
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-aggregate aug_train.csv into the population cube of the service")
+    parser.add_argument('--data', default=os.path.join('Data', 'aug_train.csv'), help="Path of aug_train.csv")
+    parser.add_argument('--out', default=os.path.join('fastapi', 'pickle', 'cube.npz'), help="Path of the cube")
+    args = parser.parse_args()
+
+    cube = build_cube(data.load(args.data))
+    save_cube(cube, args.out)
+    print(f"{cube['rows']} rows in {len(cube['count'])} cells, {os.path.getsize(args.out)} bytes: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
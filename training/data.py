@@ -0,0 +1,153 @@
+"""
+Typed columnar cache of the raw CSVs in Data/.
+
+The first load of a CSV converts it to an uncompressed Feather (Arrow IPC)
+file in .cache/data/, named after the sha256 of the CSV, so later loads are a
+memory-mapped read instead of a CSV parse. Two variants are cached:
+
+- normalized (default, used by the training pipeline and the notebooks): relevent_experience is
+  renamed to relevant_experience and converted to bool, enrolled_university,
+  company_size and company_type use the values of the FastAPI application
+  ("No Enroll", "10-49", "Early Startup", ...), and categorical columns have
+  categorical dtypes (ordered for the ordinal features).
+- raw (used by the general exploration of 1_EDA.ipynb): same values and dtypes as pd.read_csv.
+
+Usage:
+    from training import data
+    df_train = data.load('Data/aug_train.csv')
+    df_train = data.load('Data/aug_train.csv', normalized=False)
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from training.stages import (company_size_cats, education_level_cats, enrolled_university_cats, experience_cats,
+                             file_hash, last_new_job_cats)
+
+SCHEMA_VERSION = 1  # bump when normalize() changes
+CACHE_DIR = os.path.join('.cache', 'data')
+
+ordered_categories = {
+    'enrolled_university': enrolled_university_cats,
+    'education_level': education_level_cats,
+    'experience': experience_cats,
+    'company_size': company_size_cats,
+    'last_new_job': last_new_job_cats,
+}
+unordered_columns = ['city', 'gender', 'major_discipline', 'company_type']
+
+
+def normalize(df):
+    """
+    Normalize raw values and set typed dtypes.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        aug_train.csv or aug_test.csv as read by pd.read_csv
+
+    Returns
+    -------
+    pd.DataFrame
+        The normalized dataframe
+    """
+    df = df.rename(columns={'relevent_experience': 'relevant_experience'})
+    df['relevant_experience'] = df['relevant_experience'].map(
+        {'Has relevent experience': True, 'No relevent experience': False}).astype('boolean')
+    df['enrolled_university'] = df['enrolled_university'].map(
+        {'no_enrollment': 'No Enroll', 'Full time course': 'Full Time', 'Part time course': 'Part Time'})
+    df['company_size'] = df['company_size'].replace({'10/49': '10-49'})
+    df['company_type'] = df['company_type'].replace({'Early Stage Startup': 'Early Startup'})
+    for col, cats in ordered_categories.items():
+        df[col] = pd.Categorical(df[col], categories=cats, ordered=True)
+    for col in unordered_columns:
+        df[col] = df[col].astype('category')
+    df['enrollee_id'] = df['enrollee_id'].astype('int32')
+    df['training_hours'] = df['training_hours'].astype('int16')
+    return df
+
+
+def source_key(csv_path):
+    """
+    Identify a CSV by its content and the normalization schema.
+
+    Returns
+    -------
+    str
+        sha256 of the CSV followed by the schema version
+    """
+    return f'{file_hash(csv_path)}-v{SCHEMA_VERSION}'
+
+
+def cache_path(csv_path, normalized=True, cache_dir=CACHE_DIR, key=None):
+    """
+    Path of the cached Feather file of a CSV.
+
+    Returns
+    -------
+    str
+        .cache/data/<csv name>-<variant>-<source key>.feather
+    """
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    variant = 'typed' if normalized else 'raw'
+    return os.path.join(cache_dir, f'{stem}-{variant}-{(key or source_key(csv_path))[:24]}.feather')
+
+
+def convert(csv_path, out_path, normalized=True):
+    """
+    Convert a CSV to an uncompressed (memory-mappable) Feather file.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path of the CSV
+    out_path : str
+        Path of the Feather file
+    normalized : bool, optional
+        Apply normalize() before writing (default is True)
+    """
+    import pyarrow.feather as feather
+
+    df = pd.read_csv(csv_path)
+    if normalized:
+        df = normalize(df)
+    tmp_path = f'{out_path}.{os.getpid()}.tmp'
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, out_path)
+
+
+def load(csv_path, normalized=True, cache_dir=CACHE_DIR):
+    """
+    Load a CSV from its typed columnar cache, converting it first if the CSV changed.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path of the CSV (e.g. Data/aug_train.csv)
+    normalized : bool, optional
+        Return normalized values and dtypes instead of pd.read_csv's (default is True)
+    cache_dir : str, optional
+        Directory of the Feather files (default is .cache/data)
+
+    Returns
+    -------
+    pd.DataFrame
+        The data
+    """
+    import pyarrow.feather as feather
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = cache_path(csv_path, normalized, cache_dir)
+    if not os.path.exists(path):
+        # Remove files of older versions of the same CSV
+        for old_path in glob.glob(cache_path(csv_path, normalized, cache_dir, key='*')):
+            os.remove(old_path)
+        convert(csv_path, path, normalized)
+    df = feather.read_table(path, memory_map=True).to_pandas()
+    if not normalized:
+        # Arrow nulls come back as None, pd.read_csv uses NaN
+        objects = df.select_dtypes(include=['object']).columns
+        df[objects] = df[objects].where(df[objects].notna(), np.nan)
+    return df
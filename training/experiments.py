@@ -0,0 +1,229 @@
+"""
+Parallel experiment grid over preprocessing choices.
+
+Every combination of the grid is a branch of the stage chain
+load -> clean -> encode -> impute -> split -> smote -> scale -> fit.
+Branches that share a prefix share its nodes (e.g. one MICE result is reused
+by every SMOTE ratio), nodes are identified by the same content hash as the
+training pipeline cache, and independent nodes run in a process pool as soon
+as their parent is done. Re-running a grid with one new option only computes
+the new nodes.
+
+Usage (from the repository root):
+    python -m training.experiments
+    python -m training.experiments --grid grid.json
+
+Grid file (every key is optional, missing keys use the notebook's choice):
+    {
+        "drop_threshold": [3, 4, 5],
+        "encoding": ["ordinal_ohe", "ohe"],
+        "mice_estimator": ["linear", "bayesian_ridge"],
+        "smote_strategy": [null, 0.35, 0.5, 1.0],
+        "scaler": ["minmax", "standard"]
+    }
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import joblib
+import pandas as pd
+
+from training import data, stages
+
+DEFAULT_GRID = {
+    'drop_threshold': [3, 4, 5],
+    'encoding': stages.ENCODINGS,
+    'mice_estimator': ['linear', 'bayesian_ridge'],
+    'smote_strategy': [None, 0.35, 0.5, 1.0],
+    'scaler': ['minmax', 'standard'],
+}
+
+# Stage chain: (stage name, stage function, grid option -> stage parameters, parent output -> stage input)
+CHAIN = [
+    ('clean', stages.clean, lambda c: {**stages.DEFAULT_PARAMS['clean'], 'drop_threshold': c['drop_threshold']}, lambda out: out),
+    ('encode', stages.encode, lambda c: {'encoding': c['encoding']}, lambda out: out),
+    ('impute', stages.impute, lambda c: {**stages.DEFAULT_PARAMS['impute'], 'estimator': c['mice_estimator']}, lambda out: out['data']),
+    ('split', stages.split, lambda c: stages.DEFAULT_PARAMS['split'], lambda out: out),
+    ('smote', stages.smote, lambda c: {**stages.DEFAULT_PARAMS['smote'], 'sampling_strategy': c['smote_strategy']}, lambda out: out),
+    ('scale', stages.scale, lambda c: {'scaler': c['scaler']}, lambda out: out),
+    ('fit', stages.fit, lambda c: c['fit_params'], lambda out: out),
+]
+STAGE_INDEX = {name: i for i, (name, _, _, _) in enumerate(CHAIN)}
+
+
+def expand_grid(grid, fit_params):
+    """
+    Every combination of the grid.
+
+    Parameters
+    ----------
+    grid : dict
+        {option: [values]}, missing options use the notebook's choice
+    fit_params : dict
+        Parameters of LGBMClassifier
+
+    Returns
+    -------
+    list
+        A list of {option: value} dictionaries
+    """
+    defaults = {
+        'drop_threshold': [stages.DEFAULT_PARAMS['clean']['drop_threshold']],
+        'encoding': [stages.DEFAULT_PARAMS['encode']['encoding']],
+        'mice_estimator': [stages.DEFAULT_PARAMS['impute']['estimator']],
+        'smote_strategy': [stages.DEFAULT_PARAMS['smote']['sampling_strategy']],
+        'scaler': [stages.DEFAULT_PARAMS['scale']['scaler']],
+    }
+    unknown = set(grid) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unknown grid options: {sorted(unknown)}")
+    options = {**defaults, **grid}
+    names = list(options)
+    return [
+        {**dict(zip(names, values)), 'fit_params': fit_params}
+        for values in itertools.product(*(options[name] for name in names))
+    ]
+
+
+def build_dag(configs, root_key):
+    """
+    Build the DAG of stage nodes shared between branches.
+
+    Parameters
+    ----------
+    configs : list
+        Output of expand_grid()
+    root_key : str
+        Source key of aug_train.csv (data.source_key())
+
+    Returns
+    -------
+    tuple
+        (nodes, branches) where nodes is {key: {'stage', 'params', 'parent'}}
+        and branches is a list of (config, [node keys of the chain])
+    """
+    nodes = {}
+    branches = []
+    for config in configs:
+        parent = root_key
+        keys = []
+        for name, _, params_fn, _ in CHAIN:
+            params = params_fn(config)
+            key = stages.stage_key(name, params, [parent])
+            nodes.setdefault(key, {'stage': name, 'params': params, 'parent': parent})
+            keys.append(key)
+            parent = key
+        branches.append((config, keys))
+    return nodes, branches
+
+
+def run_node(cache_dir, data_path, name, params, parent_name, parent_key):
+    """
+    Compute one node in a worker process, reading its parent output from the cache.
+
+    Returns
+    -------
+    dict
+        The timing of the node
+    """
+    cache = stages.StageCache(cache_dir)
+    _, func, _, input_fn = CHAIN[STAGE_INDEX[name]]
+    if parent_name == 'load':
+        parent_output = data.load(data_path)
+    else:
+        parent_output = joblib.load(cache.path(parent_name, parent_key))
+    cache.run(name, func, params, [input_fn(parent_output)], [parent_key])
+    return cache.timings[-1]
+
+
+def run_grid(data_path, grid, fit_params, cache_dir, n_jobs=None):
+    """
+    Run every branch of the grid.
+
+    Parameters
+    ----------
+    data_path : str
+        Path of aug_train.csv
+    grid : dict
+        {option: [values]}
+    fit_params : dict
+        Parameters of LGBMClassifier
+    cache_dir : str
+        Directory of the stage cache (shared with the training pipeline)
+    n_jobs : int, optional
+        Number of worker processes (default is every core)
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per branch with the grid options, metrics and per-stage seconds
+    """
+    cache = stages.StageCache(cache_dir)
+    data.load(data_path)  # convert the CSV once before the workers start
+    root_key = data.source_key(data_path)
+    nodes, branches = build_dag(expand_grid(grid, fit_params), root_key)
+    parent_stage = {key: (nodes[node['parent']]['stage'] if node['parent'] in nodes else 'load') for key, node in nodes.items()}
+
+    timings = {}
+    pending = {key for key, node in nodes.items() if not os.path.exists(cache.path(node['stage'], key))}
+    for key in set(nodes) - pending:
+        timings[key] = {'cached': True, 'compute_seconds': cache.compute_seconds(nodes[key]['stage'], key)}
+    print(f"{len(branches)} branches, {len(nodes)} stage nodes, {len(pending)} to compute")
+
+    with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+        running = {}
+        while pending or running:
+            ready = [key for key in pending if nodes[key]['parent'] not in pending and nodes[key]['parent'] not in running.values()]
+            for key in ready:
+                node = nodes[key]
+                future = executor.submit(run_node, cache_dir, data_path, node['stage'], node['params'], parent_stage[key], node['parent'])
+                running[future] = key
+                pending.discard(key)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = running.pop(future)
+                timings[key] = future.result()
+                print(f"{nodes[key]['stage']:<7} {key[:12]} {timings[key]['compute_seconds']:.3f}s")
+
+    rows = []
+    for config, keys in branches:
+        fitted = joblib.load(cache.path('fit', keys[-1]))
+        row = {k: v for k, v in config.items() if k != 'fit_params'}
+        row.update(fitted['metrics'])
+        for key in keys:
+            row[f"seconds_{nodes[key]['stage']}"] = timings[key]['compute_seconds']
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values(by='recall_test', ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a grid of preprocessing combinations")
+    parser.add_argument('--grid', default=None, help="JSON file with the grid (default is DEFAULT_GRID)")
+    parser.add_argument('--params', default=None, help='JSON with LGBMClassifier parameter overrides')
+    parser.add_argument('--data', default=os.path.join('Data', 'aug_train.csv'))
+    parser.add_argument('--cache-dir', default=os.path.join('.cache', 'stages'))
+    parser.add_argument('--out', default=os.path.join('.cache', 'experiments', 'results.csv'))
+    parser.add_argument('--n-jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    fit_params = {**stages.DEFAULT_PARAMS['fit'], **(json.loads(args.params) if args.params else {})}
+
+    start = time.perf_counter()
+    results = run_grid(args.data, grid, fit_params, args.cache_dir, n_jobs=args.n_jobs)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    results.to_csv(args.out, index=False)
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(results[[c for c in results.columns if not c.startswith('seconds_')]].to_string(index=False))
+    print(f"Wrote {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
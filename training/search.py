@@ -0,0 +1,361 @@
+"""
+Parallel successive halving search for LGBMClassifier, XGBClassifier and CatBoostClassifier.
+
+Candidates are sampled from the same grids as the RandomizedSearchCV cells of
+2_Preprocessing_and_ML.ipynb and scored with StratifiedKFold(n_splits=5) on
+average_precision. Every rung keeps the best 1/eta candidates and gives them
+eta times more training rows, so most candidates are only fitted on a small
+sample. Trials run in a process pool over a shared-memory copy of the training
+matrix and are appended to a checkpoint file, so an interrupted search resumes
+from the last completed trial.
+
+Usage (from the repository root):
+    python -m training.search --model lgbm
+    python -m training.search --model xgb --baseline
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from training import stages
+from training.train import merge_params, prepare_data
+
+# Search spaces (same as the RandomizedSearchCV cells of the notebook)
+SPACES = {
+    'lgbm': {
+        'max_bin': [int(x) for x in np.linspace(195, 205, 10)],
+        'num_iterations': [int(x) for x in np.linspace(90, 110, 20)],
+        'learning_rate': [float(x) for x in np.linspace(0.13, 0.15, 50)],
+        'num_leaves': [int(x) for x in np.linspace(20, 40, 20)],
+    },
+    'xgb': {
+        'min_child_weight': [int(x) for x in np.linspace(3, 8)],
+        'subsample': [float(x) for x in np.linspace(0.97, 0.98, 20)],
+        'gamma': [float(x) for x in np.linspace(0, 1, 20)],
+        'eta': [float(x) for x in np.linspace(0.35, 0.4, 20)],
+    },
+    'cat': {
+        'learning_rate': [float(x) for x in np.linspace(0.01, 0.06, 10)],
+        'depth': [int(x) for x in np.linspace(1, 10, 10)],
+        'l2_leaf_reg': [float(x) for x in np.linspace(0.1, 0.2, 10)],
+    },
+}
+
+MIN_RESOURCE = 500  # smallest number of training rows in the first rung
+
+
+def build_model(name, params, n_jobs=1):
+    """
+    Create an unfitted model of the notebook with the given parameters.
+
+    Parameters
+    ----------
+    name : str
+        'lgbm', 'xgb' or 'cat'
+    params : dict
+        Hyperparameters of the model
+    n_jobs : int, optional
+        Threads used by the model (default is 1, the process pool provides the parallelism)
+
+    Returns
+    -------
+    estimator
+        The unfitted classifier
+    """
+    if name == 'lgbm':
+        from lightgbm import LGBMClassifier
+        return LGBMClassifier(verbose=-1, n_jobs=n_jobs, **params)
+    elif name == 'xgb':
+        from xgboost import XGBClassifier
+        return XGBClassifier(n_jobs=n_jobs, **params)
+    elif name == 'cat':
+        from catboost import CatBoostClassifier
+        return CatBoostClassifier(verbose=False, thread_count=n_jobs, **params)
+    raise ValueError(f"Unknown model: {name}")
+
+
+# Worker
+## Shared training matrix, attached once per worker process
+_shared = {}
+
+
+def _attach(meta):
+    for key, (shm_name, shape, dtype) in meta.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[key] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+
+def _share(array):
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def rung_indices(y, resource, seed):
+    """
+    Stratified sample of row indices used by every candidate of a rung.
+
+    Parameters
+    ----------
+    y : np.ndarray
+        The training target
+    resource : int
+        Number of rows in the sample
+    seed : int
+        Random seed of the rung
+
+    Returns
+    -------
+    np.ndarray
+        The sorted row indices
+    """
+    if resource >= len(y):
+        return np.arange(len(y))
+    from sklearn.model_selection import train_test_split
+    idx, _ = train_test_split(np.arange(len(y)), train_size=resource, stratify=y, random_state=seed)
+    return np.sort(idx)
+
+
+def run_trial(model_name, params, resource, seed, n_splits=5):
+    """
+    Score one candidate on a stratified sample of the shared training matrix.
+
+    Parameters
+    ----------
+    model_name : str
+        'lgbm', 'xgb' or 'cat'
+    params : dict
+        Hyperparameters of the candidate
+    resource : int
+        Number of training rows used by the candidate
+    seed : int
+        Random seed of the rung
+    n_splits : int, optional
+        Number of StratifiedKFold splits (default is 5)
+
+    Returns
+    -------
+    tuple
+        (mean average_precision, seconds)
+    """
+    from sklearn import metrics
+    from sklearn.model_selection import StratifiedKFold
+
+    start = time.perf_counter()
+    X, y = _shared['X'][1], _shared['y'][1]
+    idx = rung_indices(y, resource, seed)
+    X, y = X[idx], y[idx]
+    scores = []
+    for train_idx, val_idx in StratifiedKFold(n_splits=n_splits).split(X, y):
+        model = build_model(model_name, params)
+        model.fit(X[train_idx], y[train_idx])
+        scores.append(metrics.average_precision_score(y[val_idx], model.predict_proba(X[val_idx])[:, 1]))
+    return float(np.mean(scores)), time.perf_counter() - start
+
+
+# Search
+def sample_candidates(model_name, n_candidates, random_state=1):
+    """
+    Sample candidates from the search space like RandomizedSearchCV.
+
+    Returns
+    -------
+    list
+        A list of parameter dictionaries
+    """
+    from sklearn.model_selection import ParameterSampler
+    return [
+        {k: (v.item() if hasattr(v, 'item') else v) for k, v in params.items()}
+        for params in ParameterSampler(SPACES[model_name], n_iter=n_candidates, random_state=random_state)
+    ]
+
+
+def schedule(n_rows, n_candidates, eta):
+    """
+    Number of candidates and training rows for every rung.
+
+    Returns
+    -------
+    list
+        [(n_candidates, resource)] with the last rung using every row
+    """
+    n_rungs = 1 + int(math.floor(math.log(max(n_candidates, 1), eta)))
+    n_rungs = max(1, min(n_rungs, 1 + int(math.floor(math.log(max(n_rows / MIN_RESOURCE, 1), eta)))))
+    return [
+        (max(1, n_candidates // eta ** r), int(n_rows // eta ** (n_rungs - 1 - r)))
+        for r in range(n_rungs)
+    ]
+
+
+def load_checkpoint(path, config_hash):
+    """
+    Read completed trials of a previous run with the same configuration.
+
+    Returns
+    -------
+    dict
+        {(rung, candidate): trial}
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get('config') != config_hash:
+        raise SystemExit(f"{path} was written by a different search configuration, use --fresh to overwrite it")
+    for trial in lines[1:]:
+        done[(trial['rung'], trial['candidate'])] = trial
+    return done
+
+
+def successive_halving(X, y, model_name, n_candidates=100, eta=3, n_jobs=None, checkpoint=None, random_state=1, fresh=False):
+    """
+    Run successive halving over a process pool.
+
+    Parameters
+    ----------
+    X : np.ndarray
+        The scaled and oversampled training features
+    y : np.ndarray
+        The training target
+    model_name : str
+        'lgbm', 'xgb' or 'cat'
+    n_candidates : int, optional
+        Number of sampled candidates (default is 100, same as n_iter in the notebook)
+    eta : int, optional
+        Halving factor (default is 3)
+    n_jobs : int, optional
+        Number of worker processes (default is every core)
+    checkpoint : str, optional
+        Path of the JSONL checkpoint (default is no checkpoint)
+    random_state : int, optional
+        Seed for candidate sampling and rung samples (default is 1)
+    fresh : bool, optional
+        Ignore an existing checkpoint (default is False)
+
+    Returns
+    -------
+    dict
+        Best parameters, best score and every trial
+    """
+    candidates = sample_candidates(model_name, n_candidates, random_state)
+    rungs = schedule(len(y), len(candidates), eta)
+    config_hash = hashlib.sha256(json.dumps(
+        {'model': model_name, 'candidates': candidates, 'rungs': rungs, 'seed': random_state, 'n_rows': len(y)},
+        sort_keys=True).encode()).hexdigest()
+    done = {}
+    if checkpoint and not fresh:
+        done = load_checkpoint(checkpoint, config_hash)
+    if checkpoint and (fresh or not os.path.exists(checkpoint)):
+        with open(checkpoint, 'w') as f:
+            f.write(json.dumps({'config': config_hash}) + '\n')
+
+    X_shm, X_meta = _share(np.asarray(X, dtype=np.float64))
+    y_shm, y_meta = _share(np.asarray(y, dtype=np.float64))
+    trials = []
+    survivors = list(range(len(candidates)))
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count(), initializer=_attach,
+                                 initargs=({'X': X_meta, 'y': y_meta},)) as executor:
+            for rung, (_, resource) in enumerate(rungs):
+                seed = random_state + rung
+                scores = {}
+                futures = {}
+                for c in survivors:
+                    if (rung, c) in done:
+                        scores[c] = done[(rung, c)]['score']
+                        trials.append(done[(rung, c)])
+                    else:
+                        futures[executor.submit(run_trial, model_name, candidates[c], resource, seed)] = c
+                for future in as_completed(futures):
+                    c = futures[future]
+                    score, seconds = future.result()
+                    trial = {'rung': rung, 'candidate': c, 'resource': resource, 'params': candidates[c],
+                             'score': score, 'seconds': round(seconds, 4)}
+                    scores[c] = score
+                    trials.append(trial)
+                    if checkpoint:
+                        with open(checkpoint, 'a') as f:
+                            f.write(json.dumps(trial) + '\n')
+                survivors = sorted(survivors, key=lambda c: scores[c], reverse=True)
+                if rung + 1 < len(rungs):
+                    survivors = survivors[:max(rungs[rung + 1][0], 1)]
+                print(f"rung {rung}: {len(scores)} candidates on {resource} rows, best average_precision {scores[survivors[0]]:.4f}")
+    finally:
+        for shm in (X_shm, y_shm):
+            shm.close()
+            shm.unlink()
+
+    best = survivors[0]
+    final = [t for t in trials if t['rung'] == len(rungs) - 1 and t['candidate'] == best][0]
+    return {'best_params': candidates[best], 'best_score': final['score'], 'rungs': rungs, 'trials': trials}
+
+
+def randomized_search_baseline(X, y, model_name, n_candidates=100, random_state=1):
+    """
+    The RandomizedSearchCV setup of the notebook, for the wall-clock comparison.
+
+    Returns
+    -------
+    dict
+        Best parameters, best score and seconds
+    """
+    from sklearn.model_selection import RandomizedSearchCV, StratifiedKFold
+
+    start = time.perf_counter()
+    rs = RandomizedSearchCV(build_model(model_name, {}, n_jobs=None), SPACES[model_name], scoring='average_precision',
+                            cv=StratifiedKFold(n_splits=5), random_state=random_state, n_iter=n_candidates, n_jobs=3)
+    rs.fit(X, y)
+    return {'best_params': rs.best_params_, 'best_score': float(rs.best_score_),
+            'seconds': round(time.perf_counter() - start, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive halving hyperparameter search on average_precision")
+    parser.add_argument('--model', choices=sorted(SPACES), default='lgbm')
+    parser.add_argument('--n-candidates', type=int, default=100)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--n-jobs', type=int, default=None, help="Worker processes (default is every core)")
+    parser.add_argument('--data', default=os.path.join('Data', 'aug_train.csv'))
+    parser.add_argument('--cache-dir', default=os.path.join('.cache', 'stages'))
+    parser.add_argument('--out-dir', default=os.path.join('.cache', 'search'))
+    parser.add_argument('--fresh', action='store_true', help="Ignore the checkpoint of a previous run")
+    parser.add_argument('--baseline', action='store_true', help="Also run the notebook's RandomizedSearchCV and report the speedup")
+    args = parser.parse_args()
+
+    data = prepare_data(args.data, merge_params(), stages.StageCache(args.cache_dir))['scale']
+    X, y = data['X_train'].to_numpy(), data['y_train'].to_numpy()
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    result = successive_halving(X, y, args.model, n_candidates=args.n_candidates, eta=args.eta, n_jobs=args.n_jobs,
+                                checkpoint=os.path.join(args.out_dir, f'{args.model}_trials.jsonl'), fresh=args.fresh)
+    result['seconds'] = round(time.perf_counter() - start, 4)
+
+    # Refit best candidate on every row and evaluate on the test data
+    model = build_model(args.model, result['best_params'], n_jobs=os.cpu_count())
+    model.fit(data['X_train'], data['y_train'])
+    result['metrics'] = stages.evaluate(model, data)
+    print(f"best params: {result['best_params']}")
+    print(f"best average_precision (cv): {result['best_score']:.4f}, search took {result['seconds']:.1f}s")
+
+    if args.baseline:
+        result['baseline'] = randomized_search_baseline(X, y, args.model, n_candidates=args.n_candidates)
+        result['speedup'] = round(result['baseline']['seconds'] / result['seconds'], 2)
+        print(f"RandomizedSearchCV: best average_precision {result['baseline']['best_score']:.4f} in {result['baseline']['seconds']:.1f}s")
+        print(f"speedup: {result['speedup']}x")
+
+    with open(os.path.join(args.out_dir, f'{args.model}_result.json'), 'w') as f:
+        json.dump(result, f, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
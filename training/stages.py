@@ -0,0 +1,509 @@
+"""Training stages of 2_Preprocessing_and_ML.ipynb with a content-addressed on-disk cache."""
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# Default parameters (same as 2_Preprocessing_and_ML.ipynb)
+DEFAULT_PARAMS = {
+    'clean': {'drop_threshold': 4},
+    'encode': {'encoding': 'ordinal_ohe'},
+    'impute': {'estimator': 'linear', 'n_nearest_features': 2, 'random_state': 1},
+    'split': {'test_size': 0.2, 'random_state': 1},
+    'smote': {'sampling_strategy': 0.35, 'random_state': 1},
+    'scale': {'scaler': 'minmax'},
+    'fit': {'max_bin': 198, 'learning_rate': 0.14714, 'num_iterations': 99, 'num_leaves': 31},
+    # Other members of the notebook's VotingClassifier (lccat, lcxgb), fitted with --ensemble
+    'fit_cat': {'learning_rate': 0.03222222222222222, 'depth': 6, 'l2_leaf_reg': 0.15555555555555556},
+    'fit_xgb': {'min_child_weight': 3, 'subsample': 0.9747368421052631, 'gamma': 0.6842105263157894, 'eta': 0.37894736842105264},
+}
+
+# Ordinal categories (same order as the FastAPI ordinalencoder.pkl)
+relevant_experience_cats = [False, True]
+enrolled_university_cats = ['No Enroll', 'Part Time', 'Full Time']
+education_level_cats = ['Primary School', 'High School', 'Graduate', 'Masters', 'Phd']
+experience_cats = ['<1', '1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20', '>20']
+company_size_cats = ['<10', '10-49', '50-99', '100-500', '500-999', '1000-4999', '5000-9999', '10000+']
+last_new_job_cats = ['never', '1', '2', '3', '4', '>4']
+categories = [relevant_experience_cats, enrolled_university_cats, education_level_cats, experience_cats, company_size_cats, last_new_job_cats]
+
+cats_oe = ['relevant_experience', 'enrolled_university', 'education_level', 'experience', 'company_size', 'last_new_job']
+cats_ohe = ['gender', 'major_discipline', 'company_type']
+
+# Choices for experiments
+ENCODINGS = ['ordinal_ohe', 'ohe']
+MICE_ESTIMATORS = ['linear', 'bayesian_ridge', 'decision_tree', 'knn']
+SCALERS = ['minmax', 'standard', 'robust']
+
+
+# Cache
+def file_hash(path):
+    """
+    Hash the content of a file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file
+
+    Returns
+    -------
+    str
+        The sha256 hex digest of the file content
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def stage_key(name, params, input_keys):
+    """
+    Build the cache key of a stage from its name, parameters and the keys of its inputs.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage
+    params : dict
+        The parameters of the stage
+    input_keys : list
+        The cache keys (or file hashes) of the stage inputs
+
+    Returns
+    -------
+    str
+        The sha256 hex digest identifying the stage output
+    """
+    payload = json.dumps({'stage': name, 'params': params, 'inputs': list(input_keys)}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class StageCache:
+    """
+    On-disk cache of stage outputs keyed by stage_key().
+
+    Every call to run() is recorded in timings so it can be written to the manifest.
+    """
+
+    def __init__(self, cache_dir, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.timings = []
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, name, key):
+        return os.path.join(self.cache_dir, f'{name}-{key[:16]}.joblib')
+
+    def compute_seconds(self, name, key):
+        """Seconds the stage took when it was computed, None if unknown"""
+        try:
+            with open(f'{self.path(name, key)}.json') as f:
+                return json.load(f)['seconds']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def run(self, name, func, params, inputs, input_keys):
+        """
+        Return the output of func(*inputs, **params), loading it from disk when it was already computed.
+
+        Parameters
+        ----------
+        name : str
+            The name of the stage
+        func : callable
+            The stage function
+        params : dict
+            Keyword arguments for func, part of the cache key
+        inputs : list
+            Positional arguments for func
+        input_keys : list
+            The cache keys of inputs
+
+        Returns
+        -------
+        tuple
+            (output, key) of the stage
+        """
+        key = stage_key(name, params, input_keys)
+        path = self.path(name, key)
+        start = time.perf_counter()
+        if self.enabled and os.path.exists(path):
+            output = joblib.load(path)
+            cached = True
+            compute_seconds = self.compute_seconds(name, key)
+        else:
+            output = func(*inputs, **params)
+            compute_seconds = round(time.perf_counter() - start, 4)
+            if self.enabled:
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                joblib.dump(output, tmp_path)
+                os.replace(tmp_path, path)
+                with open(f'{path}.json', 'w') as f:
+                    json.dump({'stage': name, 'params': params, 'seconds': compute_seconds}, f, default=str)
+            cached = False
+        self.timings.append({
+            'stage': name,
+            'key': key,
+            'cached': cached,
+            'seconds': round(time.perf_counter() - start, 4),
+            'compute_seconds': compute_seconds,
+        })
+        return output, key
+
+
+# Stages
+def clean(df, drop_threshold=4):
+    """
+    Feature selection, feature revision and row filter (sections A and B of the notebook).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The training data loaded by data.load() (values already normalized)
+    drop_threshold : int, optional
+        Rows with this many missing values or more are dropped (default is 4)
+
+    Returns
+    -------
+    pd.DataFrame
+        The cleaned training data
+    """
+    df = df.drop(['enrollee_id', 'city', 'training_hours'], axis=1)
+    # back to object columns with NaN, like pd.read_csv in the notebook
+    categorical = [col for col in df.columns if col not in ('city_development_index', 'target')]
+    df[categorical] = df[categorical].astype(object)
+    df[categorical] = df[categorical].where(df[categorical].notna(), np.nan)
+    df['major_discipline'] = np.where((df['education_level'].isin(['Graduate', 'Masters'])) & (df['major_discipline'] == 'No Major'), np.nan,
+                                      np.where((df['education_level'].isin(['Primary School', 'High School'])) & (df['major_discipline'].isnull()), 'No Major', df['major_discipline']))
+    df = df[df.isnull().sum(axis=1) < drop_threshold]
+    return df.reset_index(drop=True)
+
+
+def encode(df, encoding='ordinal_ohe'):
+    """
+    Ordinal encoding and one hot encoding, keeping missing values as NaN (section D of the notebook).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The cleaned training data
+    encoding : str, optional
+        'ordinal_ohe' (ordinal encoding for ordered features, one hot encoding for the rest) 
+        or 'ohe' (one hot encoding for every feature, dropping the first category) (default is 'ordinal_ohe')
+
+    Returns
+    -------
+    dict
+        'data' with the encoded dataframe and 'ordinalencoder' with the fitted OrdinalEncoder (None for 'ohe')
+    """
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder
+
+    if encoding == 'ohe':
+        return {'data': _encode_ohe(df), 'ordinalencoder': None}
+    elif encoding != 'ordinal_ohe':
+        raise ValueError(f"Unknown encoding: {encoding}")
+
+    df = df.copy()
+    oe = OrdinalEncoder(categories=categories, handle_unknown='use_encoded_value', unknown_value=np.nan)
+    oe.fit(df[cats_oe])
+    df[cats_oe] = oe.transform(df[cats_oe])
+
+    si_miss = SimpleImputer(strategy='constant', fill_value='missing')
+    df[cats_ohe] = si_miss.fit_transform(df[cats_ohe])
+    ohe = OneHotEncoder(sparse_output=False)
+    ohe_array = ohe.fit_transform(df[cats_ohe])
+    ohe_name = ohe.get_feature_names_out(cats_ohe)
+    df = df.drop(cats_ohe, axis=1)
+    for i, col in enumerate(ohe_name):
+        df[col] = ohe_array[:, i]
+    df.loc[df.gender_missing == 1, df.columns.str.startswith("gender_")] = np.nan
+    df.loc[df.major_discipline_missing == 1, df.columns.str.startswith("major_discipline_")] = np.nan
+    df.loc[df.company_type_missing == 1, df.columns.str.startswith("company_type_")] = np.nan
+    df = df.drop(columns=['gender_missing', 'gender_Other', 'major_discipline_missing', 'major_discipline_Other', 'company_type_missing', 'company_type_Other'])
+    return {'data': df, 'ordinalencoder': oe}
+
+
+def _encode_ohe(df):
+    df = df.copy()
+    for col, cats in zip(cats_oe + cats_ohe, categories + [None] * len(cats_ohe)):
+        values = df[col]
+        cats = cats if cats is not None else sorted(values.dropna().unique())
+        missing = values.isna()
+        for cat in cats[1:]:
+            df[f'{col}_{cat}'] = np.where(missing, np.nan, (values == cat).astype(float))
+        df = df.drop(columns=col)
+    return df
+
+
+def make_mice(estimator='linear', n_nearest_features=2, random_state=1):
+    """
+    Create the IterativeImputer used for MICE.
+
+    Parameters
+    ----------
+    estimator : str, optional
+        Estimator of IterativeImputer, one of MICE_ESTIMATORS (default is 'linear')
+    n_nearest_features : int, optional
+        n_nearest_features of IterativeImputer (default is 2)
+    random_state : int, optional
+        random_state of IterativeImputer (default is 1)
+
+    Returns
+    -------
+    IterativeImputer
+        The unfitted imputer
+    """
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    from sklearn.impute import IterativeImputer
+    from sklearn.linear_model import BayesianRidge, LinearRegression
+    from sklearn.neighbors import KNeighborsRegressor
+    from sklearn.tree import DecisionTreeRegressor
+
+    estimators = {
+        'linear': LinearRegression(),
+        'bayesian_ridge': BayesianRidge(),
+        'decision_tree': DecisionTreeRegressor(max_features='sqrt', random_state=random_state),
+        'knn': KNeighborsRegressor(n_neighbors=15),
+    }
+    if estimator not in estimators:
+        raise ValueError(f"Unknown MICE estimator: {estimator}")
+    return IterativeImputer(estimator=estimators[estimator], random_state=random_state, n_nearest_features=n_nearest_features, imputation_order='roman')
+
+
+def impute(df, estimator='linear', n_nearest_features=2, random_state=1):
+    """
+    MICE imputation using LinearRegression (section E of the notebook).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The encoded training data (including target)
+    estimator : str, optional
+        Estimator of IterativeImputer, one of MICE_ESTIMATORS (default is 'linear')
+    n_nearest_features : int, optional
+        n_nearest_features of IterativeImputer (default is 2)
+    random_state : int, optional
+        random_state of IterativeImputer (default is 1)
+
+    Returns
+    -------
+    pd.DataFrame
+        The training data without missing values
+    """
+    mice = make_mice(estimator, n_nearest_features, random_state)
+    return pd.DataFrame(mice.fit_transform(df), columns=df.columns)
+
+
+def serve_imputer(df, estimator='linear', n_nearest_features=2, random_state=1):
+    """
+    Fit the MICE imputer used by the FastAPI application for incomplete employee records.
+
+    The target is unknown when scoring, so unlike impute() the imputer is fitted on the features only.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The encoded training data (including target)
+    estimator, n_nearest_features, random_state
+        Same as impute()
+
+    Returns
+    -------
+    IterativeImputer
+        The imputer fitted on the feature columns, in the model input order
+    """
+    mice = make_mice(estimator, n_nearest_features, random_state)
+    mice.fit(df.drop(columns='target'))
+    return mice
+
+
+def split(df, test_size=0.2, random_state=1):
+    """
+    Stratified train test split (section F of the notebook).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The imputed training data
+    test_size : float, optional
+        Proportion of the test data (default is 0.2)
+    random_state : int, optional
+        random_state of train_test_split (default is 1)
+
+    Returns
+    -------
+    dict
+        'X_train', 'X_test', 'y_train' and 'y_test'
+    """
+    from sklearn.model_selection import train_test_split
+
+    X = df.drop('target', axis=1)
+    y = df['target']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=y)
+    return {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+
+
+def smote(data, sampling_strategy=0.35, random_state=1):
+    """
+    Oversample the train data with SMOTE (section G of the notebook).
+
+    Parameters
+    ----------
+    data : dict
+        Output of split()
+    sampling_strategy : float, optional
+        sampling_strategy of SMOTE, None to skip oversampling (default is 0.35)
+    random_state : int, optional
+        random_state of SMOTE (default is 1)
+
+    Returns
+    -------
+    dict
+        Same keys as split() with resampled 'X_train' and 'y_train'
+    """
+    from imblearn.over_sampling import SMOTE
+
+    if sampling_strategy is None:
+        return data
+
+    sm = SMOTE(random_state=random_state, sampling_strategy=sampling_strategy)
+    X_train, y_train = sm.fit_resample(data['X_train'], data['y_train'])
+    return {**data, 'X_train': X_train, 'y_train': y_train}
+
+
+def scale(data, scaler='minmax'):
+    """
+    Fit MinMaxScaler on the train data and scale train and test data (section H of the notebook).
+
+    Parameters
+    ----------
+    data : dict
+        Output of smote()
+    scaler : str, optional
+        One of SCALERS (default is 'minmax')
+
+    Returns
+    -------
+    dict
+        Same keys as smote() with scaled 'X_train' and 'X_test', plus the fitted 'scaler'
+    """
+    from sklearn.preprocessing import MinMaxScaler, RobustScaler, StandardScaler
+
+    scalers = {'minmax': MinMaxScaler, 'standard': StandardScaler, 'robust': RobustScaler}
+    if scaler not in scalers:
+        raise ValueError(f"Unknown scaler: {scaler}")
+    scaler = scalers[scaler]()
+    scaler.fit(data['X_train'])
+    columns = data['X_train'].columns
+    X_train = pd.DataFrame(scaler.transform(data['X_train']), columns=columns)
+    X_test = pd.DataFrame(scaler.transform(data['X_test']), columns=columns)
+    return {**data, 'X_train': X_train, 'X_test': X_test, 'scaler': scaler}
+
+
+def fit(data, **params):
+    """
+    Fit LGBMClassifier and evaluate it on the test data (sections J and L of the notebook).
+
+    Parameters
+    ----------
+    data : dict
+        Output of scale()
+    **params
+        Parameters of LGBMClassifier
+
+    Returns
+    -------
+    dict
+        'model' with the fitted LGBMClassifier and 'metrics' with PR-AUC, recall and precision
+    """
+    from lightgbm import LGBMClassifier
+
+    model = LGBMClassifier(verbose=-1)
+    model.set_params(**params)
+    model.fit(data['X_train'], data['y_train'])
+    return {'model': model, 'metrics': evaluate(model, data)}
+
+
+def fit_cat(data, **params):
+    """
+    Fit the CatBoostClassifier ensemble member (lccat of the notebook) and evaluate it on the test data.
+
+    Parameters
+    ----------
+    data : dict
+        Output of scale()
+    **params
+        Parameters of CatBoostClassifier
+
+    Returns
+    -------
+    dict
+        'model' with the fitted CatBoostClassifier and 'metrics' with PR-AUC, recall and precision
+    """
+    from catboost import CatBoostClassifier
+
+    model = CatBoostClassifier(verbose=False)
+    model.set_params(**params)
+    model.fit(data['X_train'], data['y_train'])
+    return {'model': model, 'metrics': evaluate(model, data)}
+
+
+def fit_xgb(data, **params):
+    """
+    Fit the XGBClassifier ensemble member (lcxgb of the notebook) and evaluate it on the test data.
+
+    Parameters
+    ----------
+    data : dict
+        Output of scale()
+    **params
+        Parameters of XGBClassifier
+
+    Returns
+    -------
+    dict
+        'model' with the fitted XGBClassifier and 'metrics' with PR-AUC, recall and precision
+    """
+    from xgboost import XGBClassifier
+
+    model = XGBClassifier()
+    model.set_params(**params)
+    model.fit(data['X_train'], data['y_train'])
+    return {'model': model, 'metrics': evaluate(model, data)}
+
+
+def evaluate(model, data):
+    """
+    Compute the metrics of eval_model() in the notebook.
+
+    Parameters
+    ----------
+    model : estimator
+        A fitted classifier
+    data : dict
+        Output of scale()
+
+    Returns
+    -------
+    dict
+        PR-AUC, recall and precision on train and test data
+    """
+    from sklearn import metrics
+
+    y_pred = model.predict(data['X_test'])
+    y_pred_train = model.predict(data['X_train'])
+    return {
+        'pr_auc_test': metrics.average_precision_score(data['y_test'], y_pred),
+        'pr_auc_train': metrics.average_precision_score(data['y_train'], y_pred_train),
+        'recall_test': metrics.recall_score(data['y_test'], y_pred),
+        'recall_train': metrics.recall_score(data['y_train'], y_pred_train),
+        'precision_test': metrics.precision_score(data['y_test'], y_pred),
+        'precision_train': metrics.precision_score(data['y_train'], y_pred_train),
+    }
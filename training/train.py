@@ -0,0 +1,343 @@
+"""
+Reproducible training pipeline for the FastAPI artifacts.
+
+Runs the stages of 2_Preprocessing_and_ML.ipynb and writes ordinalencoder.pkl,
+minmaxscaler.pkl, lclgbm.pkl and iterativeimputer.pkl (MICE for incomplete
+records at serve time), holdout.npz (the scaled test split, the pool of the
+guarantee simulation), reference.json (training distributions of the drift
+monitor) plus manifest.json. Every stage output is cached
+under --cache-dir by a hash of its inputs and parameters, so changing only the
+LightGBM parameters reruns only the fit.
+
+Usage (from the repository root):
+    python -m training.train
+    python -m training.train --params '{"fit": {"num_leaves": 40}}'
+    python -m training.train --version 2026-10-19   (new version picked up by the running service)
+    python -m training.train --ensemble   (also lccat.pkl, lcxgb.pkl and ensemble.json)
+    python -m training.train --derived-only   (imputer, holdout.npz and reference.json of the pickles in fastapi/pickle)
+"""
+import argparse
+import copy
+import json
+import os
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from training import data, stages
+
+
+def merge_params(overrides=None):
+    """
+    Merge stage parameter overrides into DEFAULT_PARAMS.
+
+    Parameters
+    ----------
+    overrides : dict, optional
+        {stage name: {parameter: value}}
+
+    Returns
+    -------
+    dict
+        The parameters of every stage
+    """
+    params = copy.deepcopy(stages.DEFAULT_PARAMS)
+    for name, values in (overrides or {}).items():
+        if name not in params:
+            raise ValueError(f"Unknown stage: {name}")
+        params[name].update(values)
+    return params
+
+
+def prepare_data(data_path, params, cache):
+    """
+    Run every stage before the fit, reusing cached outputs.
+
+    Parameters
+    ----------
+    data_path : str
+        Path of aug_train.csv
+    params : dict
+        Output of merge_params()
+    cache : stages.StageCache
+        The stage cache
+
+    Returns
+    -------
+    dict
+        The outputs of the 'encode', 'serve_imputer' ('imputer') and 'scale' stages and 'scale_key', the cache key of the scaled data
+    """
+    raw, raw_key = data.load(data_path), data.source_key(data_path)
+    cleaned, cleaned_key = cache.run('clean', stages.clean, params['clean'], [raw], [raw_key])
+    encoded, encoded_key = cache.run('encode', stages.encode, params['encode'], [cleaned], [cleaned_key])
+    imputed, imputed_key = cache.run('impute', stages.impute, params['impute'], [encoded['data']], [encoded_key])
+    imputer, _ = cache.run('serve_imputer', stages.serve_imputer, params['impute'], [encoded['data']], [encoded_key])
+    splitted, split_key = cache.run('split', stages.split, params['split'], [imputed], [imputed_key])
+    sampled, sampled_key = cache.run('smote', stages.smote, params['smote'], [splitted], [split_key])
+    scaled, scaled_key = cache.run('scale', stages.scale, params['scale'], [sampled], [sampled_key])
+    return {'encode': encoded, 'imputer': imputer, 'scale': scaled, 'scale_key': scaled_key}
+
+
+def run_pipeline(data_path, params, cache, ensemble=False):
+    """
+    Run every stage, reusing cached outputs.
+
+    Parameters
+    ----------
+    data_path : str
+        Path of aug_train.csv
+    params : dict
+        Output of merge_params()
+    cache : stages.StageCache
+        The stage cache
+    ensemble : bool, optional
+        Also fit the CatBoost and XGBoost members of the soft voting ensemble (default is False)
+
+    Returns
+    -------
+    dict
+        The outputs of prepare_data() and the 'fit' stage (and 'fit_cat' and 'fit_xgb' with ensemble)
+    """
+    outputs = prepare_data(data_path, params, cache)
+    fitted, _ = cache.run('fit', stages.fit, params['fit'], [outputs['scale']], [outputs['scale_key']])
+    outputs = {**outputs, 'fit': fitted}
+    if ensemble:
+        for name, func in (('fit_cat', stages.fit_cat), ('fit_xgb', stages.fit_xgb)):
+            outputs[name], _ = cache.run(name, func, params[name], [outputs['scale']], [outputs['scale_key']])
+    return outputs
+
+
+def reference_edges(values, max_categories=32, n_bins=10):
+    """
+    Bin edges of a feature for the drift monitor.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values of the feature
+    max_categories : int, optional
+        Features with at most this many distinct values get one bin per value (default is 32)
+    n_bins : int, optional
+        Number of quantile bins of the other features (default is 10)
+
+    Returns
+    -------
+    np.ndarray
+        Inner edges, a value falls in bin np.searchsorted(edges, value, side='right')
+    """
+    distinct = np.unique(values)
+    if len(distinct) <= max_categories:
+        return (distinct[1:] + distinct[:-1]) / 2
+    return np.unique(np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1]))
+
+
+def drift_reference(outputs):
+    """
+    Training distributions of the model features and predicted probabilities.
+
+    The encoded aug_train.csv (before SMOTE) goes through the serve-time imputer and the scaler,
+    like the rows scored by the service, so the drift monitor compares like with like. The
+    probabilities are those of the held out test split (the pool of holdout.npz): on the rows the
+    model was fitted on they are sharper than on any served row, which would read as drift.
+
+    Parameters
+    ----------
+    outputs : dict
+        Output of run_pipeline()
+
+    Returns
+    -------
+    dict
+        'rows', 'probability_rows', and 'features' (per column) and 'probability' with the bin 'edges' and 'counts'
+    """
+    X = outputs['encode']['data'].drop(columns='target')
+    X = pd.DataFrame(outputs['imputer'].transform(X), columns=X.columns)
+    X = pd.DataFrame(outputs['scale']['scaler'].transform(X), columns=X.columns)
+    probabilities = outputs['fit']['model'].predict_proba(outputs['scale']['X_test'])[:, 1]
+
+    def distribution(values):
+        edges = reference_edges(values)
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+    return {
+        'rows': len(X),
+        'probability_rows': len(probabilities),
+        'features': {column: distribution(X[column].to_numpy(dtype=float)) for column in X.columns},
+        'probability': distribution(probabilities),
+    }
+
+
+def write_derived(outputs, out_dir):
+    """
+    Write the holdout pool and the drift reference of the model in outputs['fit'].
+
+    Parameters
+    ----------
+    outputs : dict
+        Output of run_pipeline()
+    out_dir : str
+        Output directory (fastapi/pickle)
+
+    Returns
+    -------
+    dict
+        {artifact name: sha256 of the written file}
+    """
+    hashes = {}
+    # Test split for the guarantee program simulation of the service
+    path = os.path.join(out_dir, 'holdout.npz')
+    np.savez_compressed(path, X=outputs['scale']['X_test'].to_numpy(dtype=float),
+                        y=np.asarray(outputs['scale']['y_test'], dtype=np.int8))
+    hashes['holdout.npz'] = stages.file_hash(path)
+    # Training distributions for the drift monitor of the service
+    path = os.path.join(out_dir, 'reference.json')
+    with open(path, 'w') as f:
+        json.dump(drift_reference(outputs), f)
+    hashes['reference.json'] = stages.file_hash(path)
+    return hashes
+
+
+def existing_model_outputs(data_path, params, cache, out_dir):
+    """
+    Outputs of prepare_data() with the model already in out_dir (e.g. the pickles of the notebook) as the fit.
+
+    Parameters
+    ----------
+    data_path : str
+        Path of aug_train.csv
+    params : dict
+        Output of merge_params()
+    cache : stages.StageCache
+        The stage cache
+    out_dir : str
+        Directory with ordinalencoder.pkl, minmaxscaler.pkl and lclgbm.pkl
+
+    Returns
+    -------
+    dict
+        Like run_pipeline(), 'fit' has only the 'model'
+
+    Raises
+    ------
+    ValueError
+        If the encoder or scaler in out_dir differ from those of the pipeline, the holdout pool
+        and the reference would not be encoded like the rows the model is served
+    """
+    outputs = prepare_data(data_path, params, cache)
+    encoder = joblib.load(os.path.join(out_dir, 'ordinalencoder.pkl'))
+    scaler = joblib.load(os.path.join(out_dir, 'minmaxscaler.pkl'))
+    pipeline_encoder, pipeline_scaler = outputs['encode']['ordinalencoder'], outputs['scale']['scaler']
+    same_encoder = all(list(a) == list(b) for a, b in zip(encoder.categories_, pipeline_encoder.categories_))
+    same_scaler = (list(scaler.feature_names_in_) == list(pipeline_scaler.feature_names_in_)
+                   and np.allclose(scaler.data_min_, pipeline_scaler.data_min_)
+                   and np.allclose(scaler.data_max_, pipeline_scaler.data_max_))
+    if not (same_encoder and same_scaler):
+        raise ValueError(f"The encoder or scaler in {out_dir} differ from those of the pipeline, run a full training")
+    return {**outputs, 'fit': {'model': joblib.load(os.path.join(out_dir, 'lclgbm.pkl'))}}
+
+
+def write_artifacts(outputs, out_dir):
+    """
+    Write the pickles loaded by the FastAPI application, the holdout pool and the drift reference
+    (plus the ensemble members and ensemble.json when the pipeline ran with ensemble).
+
+    Parameters
+    ----------
+    outputs : dict
+        Output of run_pipeline()
+    out_dir : str
+        Output directory (fastapi/pickle)
+
+    Returns
+    -------
+    dict
+        {artifact name: sha256 of the written file}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    artifacts = {
+        'ordinalencoder.pkl': outputs['encode']['ordinalencoder'],
+        'minmaxscaler.pkl': outputs['scale']['scaler'],
+        'lclgbm.pkl': outputs['fit']['model'],
+        'iterativeimputer.pkl': outputs['imputer'],
+    }
+    hashes = {}
+    for name, obj in artifacts.items():
+        path = os.path.join(out_dir, name)
+        joblib.dump(obj, path)
+        hashes[name] = stages.file_hash(path)
+    # Soft voting ensemble of the notebook (VotingClassifier of lclgbm, lccat and lcxgb)
+    if 'fit_cat' in outputs:
+        members = {'lgbm': 'lclgbm.pkl', 'cat': 'lccat.pkl', 'xgb': 'lcxgb.pkl'}
+        for name in ('cat', 'xgb'):
+            path = os.path.join(out_dir, members[name])
+            joblib.dump(outputs[f'fit_{name}']['model'], path)
+            hashes[members[name]] = stages.file_hash(path)
+        path = os.path.join(out_dir, 'ensemble.json')
+        with open(path, 'w') as f:
+            json.dump({'voting': 'soft', 'members': members, 'weights': {name: 1.0 for name in members}}, f, indent=2)
+        hashes['ensemble.json'] = stages.file_hash(path)
+    hashes.update(write_derived(outputs, out_dir))
+    return hashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the job change model and write the FastAPI artifacts")
+    parser.add_argument('--data', default=os.path.join('Data', 'aug_train.csv'), help="Path of aug_train.csv")
+    parser.add_argument('--out-dir', default=os.path.join('fastapi', 'pickle'), help="Directory for the pickles and manifest.json")
+    parser.add_argument('--cache-dir', default=os.path.join('.cache', 'stages'), help="Directory for cached stage outputs")
+    parser.add_argument('--params', default=None, help='JSON with stage parameter overrides, e.g. \'{"fit": {"num_leaves": 40}}\'')
+    parser.add_argument('--no-cache', action='store_true', help="Recompute every stage")
+    parser.add_argument('--ensemble', action='store_true',
+                        help="Also fit and write the CatBoost and XGBoost members of the voting ensemble")
+    parser.add_argument('--version', default=None,
+                        help="Write to <out-dir>/versions/<version>/ for the model registry of the service")
+    parser.add_argument('--derived-only', action='store_true',
+                        help="Keep the model, encoder and scaler in --out-dir (e.g. the notebook's pickles) and only "
+                             "write iterativeimputer.pkl, holdout.npz and reference.json for them")
+    args = parser.parse_args()
+    if args.version:
+        args.out_dir = os.path.join(args.out_dir, 'versions', args.version)
+
+    params = merge_params(json.loads(args.params) if args.params else None)
+    cache = stages.StageCache(args.cache_dir, enabled=not args.no_cache)
+    start = time.perf_counter()
+    if args.derived_only:
+        outputs = existing_model_outputs(args.data, params, cache, args.out_dir)
+        path = os.path.join(args.out_dir, 'iterativeimputer.pkl')
+        joblib.dump(outputs['imputer'], path)
+        hashes = {'iterativeimputer.pkl': stages.file_hash(path), **write_derived(outputs, args.out_dir)}
+        for name, value in hashes.items():
+            print(f"{name}: {value}")
+        return
+    outputs = run_pipeline(args.data, params, cache, ensemble=args.ensemble)
+    hashes = write_artifacts(outputs, args.out_dir)
+
+    manifest = {
+        'version': args.version,
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'data': args.data,
+        'params': params,
+        'metrics': outputs['fit']['metrics'],
+        'member_metrics': {name: outputs[f'fit_{name}']['metrics'] for name in ('cat', 'xgb') if f'fit_{name}' in outputs},
+        'stages': cache.timings,
+        'total_seconds': round(time.perf_counter() - start, 4),
+        'artifacts': hashes,
+    }
+    # manifest.json is written last, the service only loads versions that have one
+    tmp_path = os.path.join(args.out_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(args.out_dir, 'manifest.json'))
+
+    for timing in cache.timings:
+        print(f"{timing['stage']:<8} {'cached' if timing['cached'] else 'ran':<7} {timing['seconds']:.3f}s")
+    for name, value in manifest['metrics'].items():
+        print(f"{name}: {value:.4f}")
+
+
+if __name__ == '__main__':
+    main()
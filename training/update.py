@@ -0,0 +1,239 @@
+"""
+Incremental update of the job change model from observed outcomes.
+
+Continues boosting the LightGBM model of a served version (init_model) on the
+outcomes stored by POST /feedback of the service, reusing the encoder, imputer
+and scaler of that version (outcomes with missing fields are skipped when the
+version has no imputer), so folding in who actually left takes seconds
+instead of a full run of training.train (MICE over all rows, SMOTE, refit).
+Only outcomes recorded after the base version was built are boosted on. A fixed
+share of the feedback rows (chosen by a hash of the row, so it stays the same
+across updates) is held out together with the test split of holdout.npz, and
+the updated model is written as a new version for the model registry only if
+its PR-AUC on those rows doesn't regress.
+
+Usage (from the repository root):
+    python -m training.update
+    python -m training.update --rounds 20 --base 2026-10-19 --version 2026-11-02
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import zlib
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from training import stages
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fastapi'))
+import registry  # noqa: E402
+import result_store  # noqa: E402
+import scoring  # noqa: E402
+
+COPIED_ARTIFACTS = ['ordinalencoder.pkl', 'minmaxscaler.pkl', 'iterativeimputer.pkl', 'holdout.npz', 'reference.json']
+ITERATION_ALIASES = {'n_estimators', 'num_iterations', 'num_iteration', 'n_iter', 'num_tree', 'num_trees', 'num_round',
+                     'num_rounds', 'num_boost_round'}
+
+
+def holdout_mask(outcomes, percent):
+    """
+    Feedback rows kept out of the update, by a hash of (result_id, row_index).
+
+    Parameters
+    ----------
+    outcomes : pd.DataFrame
+        Output of result_store.load_outcomes()
+    percent : int
+        Share of the rows held out (0-100)
+
+    Returns
+    -------
+    np.ndarray
+        True for held out rows
+    """
+    keys = outcomes['result_id'].astype(str) + ':' + outcomes['row_index'].astype(str)
+    return np.array([zlib.crc32(key.encode()) % 100 < percent for key in keys], dtype=bool)
+
+
+def continue_boosting(model, X, y, rounds, learning_rate=None):
+    """
+    Add boosting rounds to a fitted LGBMClassifier.
+
+    Parameters
+    ----------
+    model : LGBMClassifier
+        The model of the base version
+    X : pd.DataFrame
+        Scaled features of the new labeled rows
+    y : np.ndarray
+        Observed targets
+    rounds : int
+        Number of trees added
+    learning_rate : float, optional
+        Learning rate of the added trees (default is that of the base model)
+
+    Returns
+    -------
+    LGBMClassifier
+        A new model with the trees of the base model followed by the added trees
+    """
+    from lightgbm import LGBMClassifier
+
+    params = {key: value for key, value in model.get_params().items() if key not in ITERATION_ALIASES}
+    updated = LGBMClassifier(**params)
+    updated.set_params(n_estimators=rounds)
+    if learning_rate is not None:
+        updated.set_params(learning_rate=learning_rate)
+    updated.fit(X, y, init_model=model.booster_)
+    return updated
+
+
+def pr_auc(model, X, y):
+    """PR-AUC (average precision of the predicted probabilities) of a model, None without a leaver in y."""
+    from sklearn import metrics
+
+    if len(y) == 0 or not y.any():
+        return None
+    return float(metrics.average_precision_score(y, model.predict_proba(X)[:, 1]))
+
+
+def write_version(out_dir, base_dir, model):
+    """
+    Write an updated version: the new lclgbm.pkl plus the other artifacts of the base version.
+
+    Parameters
+    ----------
+    out_dir : str
+        <versions dir>/<version>
+    base_dir : str
+        Directory of the base version
+    model : LGBMClassifier
+        The updated model
+
+    Returns
+    -------
+    dict
+        {artifact name: sha256 of the written file}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    hashes = {}
+    # The ensemble members are not updated, so the new version serves LightGBM alone
+    for name in COPIED_ARTIFACTS:
+        path = os.path.join(base_dir, name)
+        if os.path.exists(path):
+            shutil.copy2(path, os.path.join(out_dir, name))
+            hashes[name] = stages.file_hash(path)
+    path = os.path.join(out_dir, 'lclgbm.pkl')
+    joblib.dump(model, path)
+    hashes['lclgbm.pkl'] = stages.file_hash(path)
+    return hashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Continue boosting the served model on observed outcomes")
+    parser.add_argument('--base', default=None, help="Version to update (default is the active, else the newest version)")
+    parser.add_argument('--version', default=None, help="Name of the new version (default is the current time)")
+    parser.add_argument('--rounds', type=int, default=10, help="Number of trees added")
+    parser.add_argument('--learning-rate', type=float, default=None, help="Learning rate of the added trees")
+    parser.add_argument('--holdout-percent', type=int, default=20, help="Share of the feedback rows held out")
+    parser.add_argument('--min-rows', type=int, default=20, help="Fewest new labeled rows worth an update")
+    parser.add_argument('--tolerance', type=float, default=0.0, help="Largest accepted PR-AUC drop")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    models = registry.ModelRegistry()
+    versions = models.available()
+    base = args.base or models.saved_active() or models.latest(versions)
+    if base not in versions:
+        sys.exit(f"Unknown version {base}, available: {sorted(versions)}")
+    base_dir = versions[base]
+    manifest_path = os.path.join(base_dir, registry.READY_FILE)
+    base_manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            base_manifest = json.load(f)
+    artifacts = scoring.load_artifacts(base_dir, artifact_format='pickle')
+    base_model = artifacts['model']
+
+    # Outcomes: held out rows of any update, new rows since the base version for the update
+    outcomes = result_store.load_outcomes()
+    if artifacts['imputer'] is None:
+        # Rows with a missing field can't be encoded without the serve-time imputer of that version
+        complete = outcomes[scoring.numerical_columns + scoring.oe_columns + scoring.ohe_columns].notna().all(axis=1)
+        if not complete.all():
+            print(f"Version {base} has no iterativeimputer.pkl, {int((~complete).sum())} outcomes with missing fields are skipped")
+            outcomes = outcomes[complete.to_numpy()]
+    held_out = holdout_mask(outcomes, args.holdout_percent)
+    after_id = base_manifest.get('update', {}).get('last_outcome_id', 0)
+    new_rows = outcomes[~held_out & (outcomes['outcome_id'] > after_id).to_numpy()]
+    y_new = new_rows['target'].to_numpy(dtype=int)
+    if len(new_rows) < args.min_rows or len(np.unique(y_new)) < 2:
+        sys.exit(f"{len(new_rows)} new labeled rows ({int(y_new.sum())} leavers) since version {base}, "
+                 f"need {args.min_rows} with both outcomes")
+    X_new = scoring.preprocess_frame(new_rows.reset_index(drop=True), artifacts)
+
+    holdout_rows = outcomes[held_out]
+    X_holdout = [scoring.preprocess_frame(holdout_rows.reset_index(drop=True), artifacts)] if len(holdout_rows) else []
+    y_holdout = [holdout_rows['target'].to_numpy(dtype=int)]
+    holdout_path = os.path.join(base_dir, 'holdout.npz')
+    if os.path.exists(holdout_path):
+        with np.load(holdout_path) as pool:
+            X_holdout.append(pd.DataFrame(pool['X'], columns=scoring.features_columns))
+            y_holdout.append(pool['y'].astype(int))
+    if not X_holdout:
+        sys.exit(f"No held out rows: version {base} has no holdout.npz and no feedback row is held out")
+    X_holdout = pd.concat(X_holdout, ignore_index=True)
+    y_holdout = np.concatenate(y_holdout)
+
+    model = continue_boosting(base_model, X_new, y_new, args.rounds, args.learning_rate)
+    metrics = {
+        'pr_auc_holdout_base': pr_auc(base_model, X_holdout, y_holdout),
+        'pr_auc_holdout': pr_auc(model, X_holdout, y_holdout),
+        'pr_auc_new_rows_base': pr_auc(base_model, X_new, y_new),
+        'pr_auc_new_rows': pr_auc(model, X_new, y_new),
+    }
+    for name, value in metrics.items():
+        print(f"{name}: {'n/a' if value is None else f'{value:.4f}'}")
+    if metrics['pr_auc_holdout'] is None:
+        sys.exit("No leaver among the held out rows, PR-AUC can't be compared")
+    if metrics['pr_auc_holdout'] < metrics['pr_auc_holdout_base'] - args.tolerance:
+        sys.exit(f"Not promoted: held out PR-AUC {metrics['pr_auc_holdout']:.4f} < {metrics['pr_auc_holdout_base']:.4f} of version {base}")
+
+    version = args.version or datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    out_dir = os.path.join(models.versions_dir, version)
+    if os.path.exists(out_dir):
+        sys.exit(f"Version {version} already exists: {out_dir}")
+    hashes = write_version(out_dir, base_dir, model)
+    manifest = {
+        'version': version,
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'base_version': base,
+        'params': base_manifest.get('params'),
+        'update': {
+            'rounds': args.rounds,
+            'learning_rate': args.learning_rate,
+            'rows': len(new_rows),
+            'leavers': int(y_new.sum()),
+            'holdout_rows': len(y_holdout),
+            'last_outcome_id': int(outcomes['outcome_id'].max()),
+            'metrics': metrics,
+        },
+        'total_seconds': round(time.perf_counter() - start, 4),
+        'artifacts': hashes,
+    }
+    # manifest.json is written last, the service only loads versions that have one
+    tmp_path = os.path.join(out_dir, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(out_dir, registry.READY_FILE))
+    print(f"Version {version} ({base} + {args.rounds} trees on {len(new_rows)} rows) in {manifest['total_seconds']:.2f}s: {out_dir}")
+
+
+if __name__ == '__main__':
+    main()